@@ -18,8 +18,11 @@ from app.services.auth_service import (
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 KAKAO_CLIENT_ID = os.getenv("KAKAO_CLIENT_ID")
-KAKAO_TOKEN_URL = "https://kauth.kakao.com/oauth/token"
-KAKAO_USERINFO_URL = "https://kapi.kakao.com/v2/user/me"
+# 부하 테스트 시 bench/fake_providers로 돌릴 수 있도록 호스트만 env로 분리
+KAKAO_AUTH_BASE = os.getenv("KAKAO_AUTH_BASE", "https://kauth.kakao.com")
+KAKAO_API_BASE = os.getenv("KAKAO_API_BASE", "https://kapi.kakao.com")
+KAKAO_TOKEN_URL = f"{KAKAO_AUTH_BASE}/oauth/token"
+KAKAO_USERINFO_URL = f"{KAKAO_API_BASE}/v2/user/me"
 
 async def get_user_by_email(db: AsyncSession, email: str):
     q = select(User).where(User.email == email)
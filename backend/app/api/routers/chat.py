@@ -1,14 +1,19 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy import insert, select, update, delete, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any, Optional
-from app.db import get_db
+from app.db import get_db, async_session_maker
 from sqlalchemy.orm import selectinload, joinedload
 from app.models import ConversationMessage, Session, SessionPatientIntake, TherapistManualInputs, SessionPrompt, User
-from app.services.openai_chat import chat_complete, analyze_dialog_for_mood
+from app.services.openai_chat import chat_complete, chat_complete_stream
 from app.services.intent_detector import is_compose_request
+from app.services.chat_context import count_tokens, load_history, needs_fold, schedule_fold
+from app.services import dialog_analysis
 from app.services.openai_client import generate_prompt_from_guideline
 from app.services.prompt_from_guideline import generate_first_counseling_message
 from app.services.prompt_from_guideline import (
@@ -17,6 +22,7 @@ from app.services.prompt_from_guideline import (
 )
 
 from app.services.auth_service import get_current_user
+from app.services import idempotency
 from app.models import User
 from app.schemas import SimpleChatMessage
 
@@ -33,10 +39,129 @@ class ChatSendResp(BaseModel):
 
 @router.post("/send", response_model=ChatSendResp)
 async def chat_send(
-    req: ChatSendReq, 
+    req: ChatSendReq,
+    response: Response,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    # 재시도된 요청은 메시지 저장/LLM 호출 없이 첫 응답을 그대로 돌려준다
+    return await idempotency.run_idempotent(
+        idempotency_key,
+        user_id=current_user.id,
+        scope="chat.send",
+        body=req,
+        response=response,
+        handler=lambda: _chat_send(req, db, current_user),
+    )
+
+
+async def _chat_send(req: ChatSendReq, db: AsyncSession, current_user: User) -> ChatSendResp:
+    session, history = await _start_turn(req, db, current_user)
+    analysis = _start_speculative_analysis(req, session, history)
+    try:
+        # 4) OpenAI 대화 응답 생성 (음악 요청이면 대화 분석과 동시에)
+        assistant_text = await chat_complete(history, summary=session.context_summary)
+
+        composed_prompt = await _finish_turn(req, db, session, history, assistant_text, analysis)
+    finally:
+        _drop_analysis(analysis)
+    return ChatSendResp(assistant=assistant_text, composed_prompt=composed_prompt)
+
+
+@router.post("/send/stream")
+async def chat_send_stream(
+    req: ChatSendReq,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
 ):
+    """
+    /chat/send 의 스트리밍 버전 (application/x-ndjson, 한 줄에 JSON 하나).
+      {"type": "delta", "content": "..."}                           토큰이 생성되는 대로
+      {"type": "done", "assistant": "...", "composed_prompt": ...}  저장 + 음악 의도 처리 후 마지막 한 줄
+      {"type": "error", "detail": "..."}                            생성 실패 시
+    클라이언트가 중간에 끊어도 생성은 끝까지 진행되어 어시스턴트 메시지가 저장된다.
+    """
+    # 세션/권한 오류는 스트림을 열기 전에 일반 HTTP 에러로
+    session, history = await _start_turn(req, db, current_user)
+
+    events: asyncio.Queue = asyncio.Queue()
+    turn = asyncio.create_task(_stream_turn(req, session, history, events))
+    _background_turns.add(turn)
+    turn.add_done_callback(_background_turns.discard)
+
+    async def ndjson():
+        while True:
+            event = await events.get()
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+            if event["type"] in ("done", "error"):
+                break
+
+    return StreamingResponse(
+        ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# 응답 스트림과 분리해서 끝까지 돌리는 스트리밍 턴 (GC 방지용 참조)
+_background_turns: set[asyncio.Task] = set()
+
+
+async def _stream_turn(req: ChatSendReq, session: Session, history: List[Dict[str, Any]], events: asyncio.Queue) -> None:
+    analysis = _start_speculative_analysis(req, session, history)
+    done = False
+    try:
+        parts: List[str] = []
+        async for delta in chat_complete_stream(history, summary=session.context_summary):
+            parts.append(delta)
+            events.put_nowait({"type": "delta", "content": delta})
+        assistant_text = "".join(parts).strip()
+
+        # 요청 DB 세션은 응답 시작 시 닫히므로 별도 세션으로 마무리
+        async with async_session_maker() as db:
+            composed_prompt = await _finish_turn(req, db, session, history, assistant_text, analysis)
+        events.put_nowait({"type": "done", "assistant": assistant_text, "composed_prompt": composed_prompt})
+        done = True
+    except Exception as e:
+        print(f"[chat] 💥 스트리밍 응답 생성 실패 (session_id={req.session_id}): {e}")
+    finally:
+        _drop_analysis(analysis)
+        # 예외뿐 아니라 취소(종료/분석 태스크 취소 전파)로 끝나도 마지막 줄을 보내
+        # ndjson()이 events.get()에서 영원히 기다리며 연결을 잡고 있지 않게 한다
+        if not done:
+            events.put_nowait({"type": "error", "detail": "응답 생성 중 오류가 발생했습니다."})
+
+
+def _start_speculative_analysis(
+    req: ChatSendReq, session: Session, history: List[Dict[str, Any]]
+) -> Optional[asyncio.Task]:
+    """
+    사용자 메시지만으로 음악 생성 의도가 확실하면(환자 세션 + 가이드라인 있음) 대화 분석을
+    어시스턴트 응답과 동시에 시작한다. 분석 입력은 응답 전 history라 순차 실행과 결과가 같다.
+    의도가 어시스턴트 응답에서야 드러나는 경우는 기존처럼 _finish_turn 에서 순차로 분석한다.
+    """
+    if session.initiator_type != "patient" or not req.guideline_json or not is_compose_request(req.message):
+        return None
+    return asyncio.create_task(_analyze(session, history))
+
+
+def _analyze(session: Session, history: List[Dict[str, Any]]):
+    # 세션별 분석 캐시: 마지막 분석 이후 새 메시지만 반영 (없으면 LLM 호출 없이 이전 결과)
+    return dialog_analysis.analyze_session(
+        session.id, history,
+        summary=session.context_summary, summary_upto_id=session.summary_upto_id,
+    )
+
+
+def _drop_analysis(analysis: Optional[asyncio.Task]) -> None:
+    # 응답 생성이 실패하는 등 쓰이지 않은 분석은 취소 (LLM 슬롯 반납)
+    if analysis is not None and not analysis.done():
+        analysis.cancel()
+
+
+async def _start_turn(req: ChatSendReq, db: AsyncSession, current_user: User):
+    """세션/권한 확인 + 사용자 메시지 저장 후 (session, 대화 히스토리)를 돌려준다."""
     # 1) 세션 확인
     session = await db.get(Session, req.session_id)
     if not session:
@@ -47,10 +172,10 @@ async def chat_send(
     
     intake = await db.get(SessionPatientIntake, req.session_id)
 
-    # 2) 사용자 메시지 저장
+    # 2) 사용자 메시지 저장 (토큰 수도 같이 → 컨텍스트 만들 때 다시 세지 않음)
     await db.execute(
         insert(ConversationMessage).values(
-            session_id=req.session_id, role="user", content=req.message
+            session_id=req.session_id, role="user", content=req.message, tokens=count_tokens(req.message)
         )
     )
     
@@ -63,36 +188,50 @@ async def chat_send(
         
     await db.commit()
 
-    # 3) 최근 히스토리 로드 (최신 순 정렬 후 뒤에서 자르기)
-    q = select(ConversationMessage.role, ConversationMessage.content)\
-        .where(ConversationMessage.session_id == req.session_id)\
-        .order_by(ConversationMessage.created_at.asc())
-    rows = (await db.execute(q)).all()
-    history = [{"role": r[0], "content": r[1]} for r in rows]
+    # 3) 요약에 아직 반영되지 않은 히스토리만 로드 (그 앞은 session.context_summary)
+    history = await load_history(db, req.session_id, session.summary_upto_id)
+    return session, history
 
-    # 4) OpenAI 대화 응답 생성
-    assistant_text = await chat_complete(history)
 
+async def _finish_turn(
+    req: ChatSendReq,
+    db: AsyncSession,
+    session: Session,
+    history: List[Dict[str, Any]],
+    assistant_text: str,
+    analysis: Optional[asyncio.Task] = None,
+) -> Optional[str]:
+    """
+    어시스턴트 메시지 저장 + 음악 생성 의도면 프롬프트 생성. 생성된 프롬프트(없으면 None)를 돌려준다.
+    analysis: 미리 시작해 둔 대화 분석 태스크 (_start_speculative_analysis)
+    """
     # 5) 어시스턴트 메시지 저장
+    assistant_tokens = count_tokens(assistant_text)
     await db.execute(
         insert(ConversationMessage).values(
-            session_id=req.session_id, role="assistant", content=assistant_text
+            session_id=req.session_id, role="assistant", content=assistant_text, tokens=assistant_tokens
         )
     )
     await db.commit()
+    # 요약 안 된 대화가 예산을 넘었으면 오래된 부분을 요약으로 접는다 (응답은 기다리지 않음)
+    if needs_fold(history + [{"content": assistant_text, "tokens": assistant_tokens}]):
+        schedule_fold(req.session_id)
 
     # 6) 음악 생성 의도 감지
     composed_prompt = None
     if is_compose_request(req.message) or is_compose_request(assistant_text):
         if not req.guideline_json:
             # 가이드라인이 없으면 프롬프트 생성 불가 → 안내만
-            return ChatSendResp(assistant=assistant_text, composed_prompt=None)
+            return None
 
         # a) 환자 or 상담사 분기
         if session.initiator_type == "patient":
             intake = await db.get(SessionPatientIntake, req.session_id)
-            # 간단 분석값(샘플): 실제로는 OpenAI로 대화 요약/키워드 뽑아 넣기
-            analyzed = await analyze_dialog_for_mood(history)
+            # 미리 시작한 분석이 있으면 그 결과를, 없으면 지금 분석
+            analyzed = (
+                await analysis if analysis is not None
+                else await _analyze(session, history)
+            )
             if not analyzed.get("target") and intake and intake.goal:
                  analyzed["target"] = intake.goal
                  
@@ -139,7 +278,7 @@ async def chat_send(
         )
         await db.commit()
 
-    return ChatSendResp(assistant=assistant_text, composed_prompt=composed_prompt)
+    return composed_prompt
 
 class ChatHistoryResp(BaseModel):
     """대화 기록 응답을 위한 스키마"""
@@ -229,6 +368,14 @@ async def delete_chat_history(session_id: int, db: AsyncSession = Depends(get_db
         .where(SessionPatientIntake.session_id == session_id)
         .values(has_dialog=False)
     )
+    # 4. 삭제된 대화의 요약도 초기화
+    await db.execute(
+        update(Session)
+        .where(Session.id == session_id)
+        .values(context_summary=None, summary_upto_id=None)
+    )
+    # 5. 삭제된 대화로 만든 분석 결과는 캐시로 쓰지 않도록
+    await dialog_analysis.invalidate(db, session_id)
     
     await db.commit()
     
@@ -1,23 +1,46 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends, HTTPException, Query, status # 💡 1. status 추가
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status # 💡 1. status 추가
+from fastapi.responses import RedirectResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from sqlalchemy import select, update, insert, desc
+from sqlalchemy import select, update, insert, desc, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Literal, Optional
+from typing import AsyncIterator, List, Literal, Optional, Tuple
 import json
 from app.schemas import MusicTrackInfo, MusicTrackDetail, SimpleChatMessage, SimpleIntakeData, TherapistManualInput, TrackUpdate
 from app.db import get_db
 # 💡 2. Connection, SessionPatientIntake 모델 import 추가
 from app.models import Session, SessionPrompt, Track, User, Connection, SessionPatientIntake, ConversationMessage, TherapistManualInputs
-from app.services.auth_service import get_current_user
+from app.services.auth_service import get_current_user, get_current_user_header_or_query
 from sqlalchemy.orm import joinedload, selectinload
 # 1. 함수 이름을 'compose_and_save'으로 변경합니다.
 from app.services.elevenlabs_client import compose_and_save, ElevenLabsError
 from app.api.routers.therapist import check_counselor_patient_access
-import app.kafka as kafka
-import os, uuid, datetime as dt
+from app.services.generation_cache import (
+    generation_key, cache_allowed, find_reusable_track, find_inflight_track,
+)
+from app.services import outbox, idempotency
+from app.services.music_lanes import lane_for, lane_topic
+from app.services.track_events import hub as track_event_hub, notify_track_status
+from app.services.music_eta import estimator as eta_estimator
+from app.services.audio_store import live_path
+import os, uuid, asyncio, hashlib, datetime as dt
 router = APIRouter(prefix="/music", tags=["music"])
 
+SSE_KEEPALIVE_S = 15
+MAX_STATUS_IDS = 50  # /tracks/status 한 번에 조회 가능한 트랙 수
+PENDING_STATUSES = ("QUEUED", "PROCESSING")  # 취소 가능한 상태
+# /track/{id}/stream: 생성 중 파일 따라 읽기
+LIVE_CHUNK_BYTES = 32 * 1024
+LIVE_POLL_S = 0.25
+LIVE_IDLE_TIMEOUT_S = float(os.getenv("MUSIC_LIVE_IDLE_TIMEOUT_S", "60"))
+LIVE_RETRY_AFTER_S = 2
+STATUS_RETRY_MIN_S, STATUS_RETRY_MAX_S = 2, 30  # /tracks/status Retry-After 범위
+# 세션 소유자(=워커 스케줄러의 사용자 키)별 동시 대기/생성 트랙 상한 (0이면 제한 없음).
+# 워커는 토픽당 MUSIC_WORKER_BUFFER_PER_TOPIC 건만 미리 가져와 사용자별로 섞으므로, 한 사용자가
+# 토픽에 쌓을 수 있는 양을 그 이하로 묶어야 나머지 backlog(Kafka FIFO)에서도 다른 사용자가 밀리지 않는다.
+MAX_PENDING_PER_USER = int(os.getenv("MUSIC_MAX_PENDING_PER_USER", "4"))
+PENDING_LOCK_NS = 0x6D75  # pg_advisory_xact_lock(ns, user_id) 네임스페이스
+
 # --- (ComposeReq, ComposeResp 클래스는 변경 없음) ---
 class ComposeReq(BaseModel):
     session_id: int
@@ -28,8 +51,10 @@ class ComposeReq(BaseModel):
 class ComposeResp(BaseModel):
     session_id: int
     track_id: int
-    status: Literal["QUEUED", "PROCESSING", "READY", "FAILED"]
+    status: Literal["QUEUED", "PROCESSING", "READY", "FAILED", "CANCELLED"]
     track_url: Optional[str] = None
+    # 큐 깊이 + 길이별 처리 시간 모델로 추정한 완료 예상 시각 (QUEUED/PROCESSING 일 때만)
+    estimated_ready_at: Optional[dt.datetime] = None
 
 @router.delete("/track/{track_id}")
 async def delete_track(
@@ -53,6 +78,10 @@ async def delete_track(
     if track.session.created_by != current_user.id:
         raise HTTPException(403, "삭제 권한 없음")
 
+    # 생성 중이면 먼저 취소 알림 → 워커가 provider 호출을 끊는다 (삭제와 같은 트랜잭션으로 커밋)
+    if track.status in PENDING_STATUSES:
+        await _mark_cancelled(db, track_id)
+
     # 삭제
     await db.delete(track)
     await db.commit()
@@ -60,14 +89,106 @@ async def delete_track(
     return {"success": True, "track_id": track_id}
 
 
+async def _mark_cancelled(db: AsyncSession, track_id: int) -> bool:
+    """QUEUED/PROCESSING 트랙을 CANCELLED로 바꾸고 알림을 건다 (커밋은 호출하는 쪽에서)."""
+    res = await db.execute(
+        update(Track)
+        .where(Track.id == track_id, Track.status.in_(PENDING_STATUSES))
+        .values(status="CANCELLED", error="cancelled by user", finished_at=func.now())
+        .returning(Track.id)
+        .execution_options(synchronize_session=False)
+    )
+    if res.scalar_one_or_none() is None:
+        return False
+    await notify_track_status(db, track_id)
+    return True
+
+
+@router.post("/track/{track_id}/cancel", response_model=ComposeResp)
+async def cancel_track(
+    track_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    대기/생성 중인 트랙 취소. 대기 중이면 워커가 꺼내도 선점하지 않고,
+    생성 중이면 담당 워커가 취소 알림을 받아 provider 요청을 끊고 슬롯을 반납한다.
+    이미 끝난(READY/FAILED) 트랙은 409.
+    """
+    row = (await db.execute(
+        select(Track.session_id, Track.status, Session.created_by)
+        .join(Session, Track.session_id == Session.id)
+        .where(Track.id == track_id)
+    )).first()
+    if not row:
+        raise HTTPException(404, "Track not found")
+    if row.created_by != current_user.id:
+        raise HTTPException(403, "취소 권한 없음")
+
+    if row.status != "CANCELLED":
+        if not await _mark_cancelled(db, track_id):
+            # 조회와 갱신 사이에 워커가 끝냈을 수도 있다
+            await db.rollback()
+            current = await db.scalar(select(Track.status).where(Track.id == track_id))
+            raise HTTPException(409, f"이미 처리가 끝난 트랙입니다 (status={current}).")
+        await db.commit()
+
+    return {"session_id": row.session_id, "track_id": track_id, "status": "CANCELLED", "track_url": None}
+
+
 # --- 💡 4. [핵심 수정] /compose API 권한 검사 로직 변경 ---
 @router.post("/compose", response_model=ComposeResp)
 async def compose_music(
     req: ComposeReq,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     # [핵심 추가] 인증된 사용자만 호출하도록 추가 (변경 없음)
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
+    # 네트워크 재시도로 같은 요청이 다시 와도 Track/생성 요청은 한 번만 만든다
+    return await idempotency.run_idempotent(
+        idempotency_key,
+        user_id=current_user.id,
+        scope="music.compose",
+        body=req,
+        response=response,
+        handler=lambda: _compose_music(req, db, current_user),
+    )
+
+
+async def _enforce_pending_cap(db: AsyncSession, owner_id: int) -> None:
+    """
+    owner_id(세션 소유자)의 QUEUED/PROCESSING 트랙이 MAX_PENDING_PER_USER 이상이면 429 + Retry-After.
+    같은 사용자의 동시 compose는 advisory lock으로 직렬화한다 (커밋/롤백 시 해제).
+    """
+    if MAX_PENDING_PER_USER <= 0:
+        return
+    await db.execute(select(func.pg_advisory_xact_lock(PENDING_LOCK_NS, owner_id)))
+    pending = (await db.execute(
+        select(Track.id, Track.status, Track.duration_sec, Track.request_payload["lane"].astext.label("lane"))
+        .join(Session, Track.session_id == Session.id)
+        .where(Session.created_by == owner_id, Track.status.in_(PENDING_STATUSES))
+    )).all()
+    if len(pending) < MAX_PENDING_PER_USER:
+        return
+
+    # 가장 먼저 끝날 트랙의 예상 시각까지 기다렸다 다시 시도하라고 알려준다
+    etas = await eta_estimator.estimate(
+        db,
+        [{"id": r.id, "status": r.status, "duration_sec": r.duration_sec, "lane": r.lane} for r in pending],
+    )
+    wait_s = STATUS_RETRY_MAX_S
+    if etas:
+        wait_s = (min(etas.values()) - dt.datetime.now(dt.timezone.utc)).total_seconds()
+    raise HTTPException(
+        429,
+        f"생성 대기 중인 곡이 {len(pending)}개 있습니다. 앞의 곡이 완성된 뒤 다시 요청하세요 (최대 {MAX_PENDING_PER_USER}개).",
+        headers={"Retry-After": str(int(min(max(wait_s, STATUS_RETRY_MIN_S), STATUS_RETRY_MAX_S)))},
+    )
+
+
+async def _compose_music(req: ComposeReq, db: AsyncSession, current_user: User):
     # 1) 세션 확인
     session = await db.get(Session, req.session_id)
     if not session:
@@ -129,7 +250,55 @@ Constraints:
 - Follow the requested mood, tempo, and style.
 - Do NOT invent new lyrics. If lyrics are empty, generate instrumental only.
 """
-    
+
+    # 2-2) 생성 캐시: 같은 요청이 최근에 만들어졌으면 provider 호출 없이 재사용
+    gen_hash = generation_key(
+        full_prompt_text, lyrics_text, req.music_length_ms, req.force_instrumental, req.extra
+    )
+    use_cache = cache_allowed(req.extra)
+    if use_cache:
+        # (a) 같은 세션에서 이미 생성 중이면 그 트랙을 그대로 돌려준다 (더블클릭/재시도)
+        inflight = await find_inflight_track(db, gen_hash, req.session_id)
+        if inflight:
+            eta = await eta_estimator.estimate(db, [{
+                "id": inflight.id,
+                "status": inflight.status,
+                "duration_sec": inflight.duration_sec,
+                "lane": (inflight.request_payload or {}).get("lane"),
+            }])
+            return {
+                "session_id": req.session_id,
+                "track_id": inflight.id,
+                "status": inflight.status,
+                "track_url": None,
+                "estimated_ready_at": eta.get(inflight.id),
+            }
+
+        # (b) 완료된 동일 요청이 있으면 새 Track을 기존 오디오에 연결
+        cached = await find_reusable_track(db, gen_hash)
+        if cached:
+            new_track = Track(
+                session_id=req.session_id,
+                status="READY",
+                provider=cached.provider,
+                prompt=full_prompt_text,
+                duration_sec=duration_sec,
+                quality=(req.extra or {}).get("preset") if req.extra else None,
+                track_url=cached.track_url,
+                gen_hash=gen_hash,
+            )
+            db.add(new_track)
+            await db.commit()
+            return {
+                "session_id": req.session_id,
+                "track_id": new_track.id,
+                "status": new_track.status,
+                "track_url": new_track.track_url,
+            }
+
+    # 한 사용자가 대량으로 넣어 다른 사용자가 그 뒤에 줄 서지 않도록 대기 중 트랙 수를 묶는다
+    await _enforce_pending_cap(db, session.created_by)
+
     # 2) Track 레코드 생성
     new_track = Track(
         session_id=req.session_id,
@@ -138,37 +307,286 @@ Constraints:
         prompt=full_prompt_text,     # 🔥 여기: 가사까지 포함된 최종 프롬프트
         duration_sec=duration_sec,
         quality=(req.extra or {}).get("preset") if req.extra else None,
+        gen_hash=gen_hash,
     )
     db.add(new_track)
     await db.flush()  # new_track.id 확보
 
-    # 3) Kafka 메시지 발행
-    if not kafka.producer:
-        raise HTTPException(503, "music queue not available")
+    # 3) Kafka 메시지는 outbox에 기록 → Track과 같은 트랜잭션으로 커밋되고 relay가 발행
+    #    상담사 처방/짧은 클립은 별도 레인 토픽으로 보내 긴 렌더링 뒤에 밀리지 않게 한다
+    lane = lane_for(session.initiator_type, req.music_length_ms)
     payload = {
         "task_id": new_track.id,
         "session_id": req.session_id,
+        "user_id": session.created_by,
+        "lane": lane,
         "prompt": full_prompt_text,
         "music_length_ms": req.music_length_ms,
         "force_instrumental": req.force_instrumental,
         "extra": req.extra or {},
         "lyrics_text": lyrics_text,
     }
-    await kafka.producer.send_and_wait(
-        os.getenv("KAFKA_TOPIC_REQUESTS", "music.gen.requests"),
-        key=new_track.id,
-        value=payload,
-    )
+    # 워커가 죽어 lease가 만료되면 리퍼가 이 원본 요청으로 재발행한다
+    new_track.request_payload = {k: v for k, v in payload.items() if k != "task_id"}
+    outbox.enqueue(db, lane_topic(lane), new_track.id, payload)
 
     await db.commit()
+    outbox.wake()
 
+    eta = await eta_estimator.estimate(db, [{
+        "id": new_track.id, "status": "QUEUED", "duration_sec": duration_sec, "lane": lane,
+    }])
     return {
         "session_id": req.session_id,
         "track_id": new_track.id,
         "status": new_track.status,
         "track_url": None,
+        "estimated_ready_at": eta.get(new_track.id),
     }
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.get("/events")
+async def track_status_events(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_header_or_query),
+):
+    """
+    내 트랙들의 상태 변경(QUEUED → PROCESSING → READY/FAILED/CANCELLED)을 Server-Sent Events로 push.
+    연결 직후 진행 중인 트랙들의 현재 상태를 snapshot으로 한 번 보내고, 이후 변경분만 보낸다.
+    (EventSource는 헤더를 못 붙이므로 ?access_token= 으로도 인증 가능)
+    """
+    user_id = current_user.id
+    # 먼저 구독해 두어야 snapshot 조회와 구독 사이의 변경을 놓치지 않는다
+    queue = track_event_hub.subscribe(user_id)
+    try:
+        rows = (await db.execute(
+            select(Track.id, Track.session_id, Track.status, Track.track_url, Track.error)
+            .join(Session, Track.session_id == Session.id)
+            .where(
+                Session.created_by == user_id,
+                Track.status.in_(("QUEUED", "PROCESSING")),
+            )
+        )).all()
+    except Exception:
+        track_event_hub.unsubscribe(user_id, queue)
+        raise
+    snapshot = [
+        {"track_id": r[0], "session_id": r[1], "status": r[2], "track_url": r[3], "error": r[4]}
+        for r in rows
+    ]
+
+    async def stream():
+        try:
+            yield _sse("snapshot", {"tracks": snapshot})
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse("track", {k: v for k, v in event.items() if k != "user_id"})
+        finally:
+            track_event_hub.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+class TrackStatusItem(BaseModel):
+    id: int
+    status: str
+    track_url: Optional[str] = None
+    error: Optional[str] = None
+    estimated_ready_at: Optional[dt.datetime] = None
+
+class TrackStatusResp(BaseModel):
+    tracks: List[TrackStatusItem]
+
+
+@router.get("/tracks/status", response_model=TrackStatusResp)
+async def get_tracks_status(
+    request: Request,
+    response: Response,
+    ids: str = Query(..., description="콤마로 구분한 트랙 ID 목록 (예: 1,2,3)"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    생성 중인 트랙 여러 개의 상태만 가볍게 조회 (세션/인테이크 조인 없음).
+    권한 없는/없는 트랙은 결과에서 빠진다. ETag가 같으면 304를 돌려준다.
+    진행 중인 트랙에는 estimated_ready_at 을 붙이고, Retry-After 로 다음 폴링 간격을 알려준다.
+    """
+    try:
+        track_ids = sorted({int(x) for x in ids.split(",") if x.strip()})
+    except ValueError:
+        raise HTTPException(400, "ids는 콤마로 구분한 정수여야 합니다.")
+    if not track_ids:
+        raise HTTPException(400, "ids가 비어 있습니다.")
+    if len(track_ids) > MAX_STATUS_IDS:
+        raise HTTPException(400, f"한 번에 최대 {MAX_STATUS_IDS}개까지 조회할 수 있습니다.")
+
+    # 1) 트랙 상태 + 세션 소유자를 PK 조회 한 번으로
+    rows = (await db.execute(
+        select(
+            Track.id, Track.status, Track.track_url, Track.error, Track.duration_sec,
+            Track.request_payload["lane"].astext.label("lane"), Session.created_by,
+        )
+        .join(Session, Track.session_id == Session.id)
+        .where(Track.id.in_(track_ids))
+        .order_by(Track.id)
+    )).all()
+
+    # 2) 권한 확인도 일괄로: 본인 소유 + (상담사라면) 연결된 환자 소유
+    allowed_owners = {current_user.id}
+    other_owners = {r.created_by for r in rows if r.created_by != current_user.id}
+    if other_owners and current_user.role == "therapist":
+        connected = (await db.execute(
+            select(Connection.patient_id).where(
+                Connection.therapist_id == current_user.id,
+                Connection.patient_id.in_(other_owners),
+                Connection.status == "ACCEPTED",
+            )
+        )).scalars().all()
+        allowed_owners.update(connected)
+
+    rows = [r for r in rows if r.created_by in allowed_owners]
+    etas = await eta_estimator.estimate(
+        db,
+        [{"id": r.id, "status": r.status, "duration_sec": r.duration_sec, "lane": r.lane} for r in rows],
+    )
+    tracks = [
+        TrackStatusItem(
+            id=r.id, status=r.status, track_url=r.track_url, error=r.error,
+            estimated_ready_at=etas.get(r.id),
+        )
+        for r in rows
+    ]
+
+    # 3) ETag: 상태가 그대로면 304 (폴링 트래픽 절감).
+    #    estimated_ready_at은 추정치라 상태 변화 없이도 흔들리므로 ETag에 넣지 않는다
+    body = TrackStatusResp(tracks=tracks)
+    state = [[t.id, t.status, t.track_url, t.error] for t in tracks]
+    etag = 'W/"' + hashlib.sha1(json.dumps(state).encode()).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etas:
+        # 가장 먼저 끝날 트랙의 예상 시각까지 기다리라고 알려준다 (너무 짧거나 길지 않게)
+        wait_s = (min(etas.values()) - dt.datetime.now(dt.timezone.utc)).total_seconds()
+        headers["Retry-After"] = str(int(min(max(wait_s, STATUS_RETRY_MIN_S), STATUS_RETRY_MAX_S)))
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return body
+
+
+def _parse_range(value: Optional[str]) -> Optional[Tuple[int, Optional[int]]]:
+    """
+    'bytes=N-' / 'bytes=N-M' 단일 구간만 지원 → (N, M 또는 None).
+    Safari/iOS <audio>는 먼저 'bytes=0-1'로 확인하므로 닫힌 구간도 받아야 한다.
+    """
+    if not value or not value.startswith("bytes="):
+        return None
+    start, sep, end = value[len("bytes="):].partition("-")
+    start, end = start.strip(), end.strip()
+    if not sep or not start.isdigit() or (end and not end.isdigit()) or (end and int(end) < int(start)):
+        raise HTTPException(416, "생성 중인 트랙은 'bytes=N-' 또는 'bytes=N-M' 형태의 Range만 지원합니다.")
+    return int(start), (int(end) if end else None)
+
+
+async def _tail_live_file(f, link: str) -> AsyncIterator[bytes]:
+    """
+    워커가 쓰고 있는 .part를 따라 읽는다.
+    - 링크가 사라지면 쓰기가 끝난 것(완성본으로 rename) → 남은 바이트까지 보내고 종료
+    - 파일 링크 수가 0이면 생성 실패/취소로 삭제된 것 → 종료
+    """
+    loop = asyncio.get_running_loop()
+    idle_deadline = loop.time() + LIVE_IDLE_TIMEOUT_S
+    try:
+        while True:
+            chunk = await asyncio.to_thread(f.read, LIVE_CHUNK_BYTES)
+            if chunk:
+                idle_deadline = loop.time() + LIVE_IDLE_TIMEOUT_S
+                yield chunk
+                continue
+            if os.fstat(f.fileno()).st_nlink == 0:
+                break
+            if not os.path.lexists(link):
+                rest = await asyncio.to_thread(f.read)
+                if rest:
+                    yield rest
+                break
+            if loop.time() >= idle_deadline:
+                break
+            await asyncio.sleep(LIVE_POLL_S)
+    finally:
+        f.close()
+
+
+@router.get("/track/{track_id}/stream")
+async def stream_track(
+    track_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_header_or_query),
+):
+    """
+    생성 중에도 들을 수 있는 오디오 스트림 (<audio src>용이라 ?access_token= 인증 허용).
+    - READY: 완성된 파일로 307 redirect (일반 정적 파일 Range 지원)
+    - PROCESSING: 워커가 받고 있는 MP3를 chunked로 따라 보내고, 생성이 끝나면 응답도 끝난다.
+      'Range: bytes=N-' 이면 지금까지 쓰인 [N, 현재 크기) 구간을, 'bytes=N-M' 이면 M을 현재 크기로
+      자른 [N, M] 구간을 206으로 돌려준다. N이 지금까지 쓰인 크기 이상이면 416.
+    - 아직 첫 오디오가 없으면 425 + Retry-After, 실패/취소된 트랙은 409.
+    """
+    row = (await db.execute(
+        select(Track.status, Track.track_url, Session.created_by)
+        .join(Session, Track.session_id == Session.id)
+        .where(Track.id == track_id)
+    )).first()
+    if not row:
+        raise HTTPException(404, "Track not found")
+    if row.created_by != current_user.id:
+        if current_user.role != "therapist":
+            raise HTTPException(403, "권한 없음")
+        await check_counselor_patient_access(row.created_by, current_user.id, db)
+
+    if row.status == "READY" and row.track_url:
+        return RedirectResponse(row.track_url, status_code=307)
+    if row.status not in PENDING_STATUSES:
+        raise HTTPException(409, f"재생할 수 없는 트랙입니다 (status={row.status}).")
+
+    byte_range = _parse_range(request.headers.get("range"))
+    link = live_path(track_id)
+    try:
+        f = open(link, "rb")
+    except FileNotFoundError:
+        raise HTTPException(425, "아직 생성된 오디오가 없습니다.", headers={"Retry-After": str(LIVE_RETRY_AFTER_S)})
+
+    headers = {"Cache-Control": "no-store", "X-Accel-Buffering": "no", "Accept-Ranges": "bytes"}
+    if byte_range is None or byte_range == (0, None):
+        return StreamingResponse(_tail_live_file(f, link), media_type="audio/mpeg", headers=headers)
+
+    start, end = byte_range
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if start >= size:
+            raise HTTPException(
+                416, "아직 쓰이지 않은 위치입니다.",
+                headers={"Content-Range": "bytes */*", "Retry-After": str(LIVE_RETRY_AFTER_S)},
+            )
+        stop = size if end is None else min(end + 1, size)
+        f.seek(start)
+        data = await asyncio.to_thread(f.read, stop - start)
+    headers["Content-Range"] = f"bytes {start}-{start + len(data) - 1}/*"
+    return Response(data, status_code=206, media_type="audio/mpeg", headers=headers)
+
+
 @router.patch("/track/{track_id}", response_model=MusicTrackInfo)
 async def update_track_title(
     track_id: int,
@@ -519,6 +937,14 @@ async def get_track_details(
         else:
             final_title = f"AI 트랙 (세션 {session.id})"
 
+    # (F) 진행 중인 트랙이면 완료 예상 시각 (/tracks/status와 같은 추정기)
+    etas = await eta_estimator.estimate(db, [{
+        "id": track.id,
+        "status": track.status,
+        "duration_sec": track.duration_sec,
+        "lane": (track.request_payload or {}).get("lane"),
+    }])
+
     return MusicTrackDetail(
         id=track.id,
         title=final_title,
@@ -534,5 +960,6 @@ async def get_track_details(
         lyrics=lyrics,
         intake_data=intake_data,        
         therapist_manual=therapist_manual,
-        chat_history=chat_history       
+        chat_history=chat_history,
+        estimated_ready_at=etas.get(track.id),
     )
\ No newline at end of file
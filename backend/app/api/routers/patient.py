@@ -9,7 +9,8 @@ from app.models import Session, SessionPatientIntake, ConversationMessage, Sessi
 from app.db import get_db
 from app.services.openai_client import generate_prompt_from_guideline
 from app.services.prompt_from_guideline import build_extra_requirements_for_patient
-from app.services.openai_chat import analyze_dialog_for_mood
+from app.services.chat_context import load_history
+from app.services.dialog_analysis import analyze_session
 
 from app.services.auth_service import get_current_user
 from app.models import User
@@ -77,54 +78,14 @@ async def analyze_and_generate(
     if not session or session.created_by != current_user.id:
         raise HTTPException(403, "Not authorized for this session")
 
-    # 2. 대화 기록 로드
-    q_dialog = select(ConversationMessage.role, ConversationMessage.content)\
-        .where(ConversationMessage.session_id == req.session_id)\
-        .order_by(ConversationMessage.created_at.asc())
-    
-    
-    
-    dialog_rows = (await db.execute(q_dialog)).all()
-    history = [{"role": r[0], "content": r[1]} for r in dialog_rows]
-
-    # 💡 [핵심 수정] AI 분석가에게 '접수 내용(Intake)'도 전달하여 분석 정확도 향상
-    intake_summary = [
-        {"role": "system", "content": "--- [환자 사전 접수 내용] ---"},
-        {
-            "role": "user",
-            "content": f"상담 목표: {s_intake.goal.get('text') if s_intake.goal else 'N/A'}",
-        },
-        {
-            "role": "user",
-            "content": f"선호 장르: {s_intake.prefs.get('preferredMusicGenres') if s_intake.prefs else 'N/A'}",
-        },
-        {
-            "role": "user",
-            "content": f"비선호 장르: {s_intake.prefs.get('dislikedMusicGenres') if s_intake.prefs else 'N/A'}",
-        },
-        {"role": "system", "content": "--- [AI 상담 대화 내용] ---"},
-    ]
-    
-    # 💡 Intake 요약 + 실제 대화 기록
-    full_history = intake_summary + history 
+    # 2. 대화 기록 로드 (요약에 반영된 앞부분은 session.context_summary로 대신)
+    history = await load_history(db, req.session_id, session.summary_upto_id)
 
-    # 3. 💡 [수정] OpenAI 대화 분석 호출 (full_history 사용)
-    analyzed = await analyze_dialog_for_mood(full_history)
-    
-    raw_conf = analyzed.get("confidence", 0.0)
-    try:
-        conf_val = float(raw_conf)
-    except (TypeError, ValueError):
-        conf_val = 0.0
-    
-    # 4. 💡 [수정] 분석 결과 스냅샷 저장 (주석 해제)
-    await db.execute(
-         insert(SessionPrompt).values(
-            session_id=req.session_id,
-            stage="analyzed",
-            data=analyzed,          # JSONB
-            confidence=conf_val,    # 🔥 여기 이제 무조건 float
-        )
+    # 3~4. 대화 분석 (접수 내용 포함). 마지막 분석 이후 새 메시지가 없으면 캐시된 결과,
+    #    있으면 그 뒤 대화만 반영해 갱신 → analyzed 스냅샷도 여기서 저장된다
+    analyzed = await analyze_session(
+        req.session_id, history,
+        summary=session.context_summary, summary_upto_id=session.summary_upto_id,
     )
 
     # 5. 💡 [수정] 환자 흐름용 '추가 요구사항' 텍스트 구성 (주석 해제)
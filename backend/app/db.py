@@ -5,6 +5,9 @@ load_dotenv()
 
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import event
+
+from app import metrics
 
 ASYNC_DB_URL = os.getenv("ASYNC_DATABASE_URL")
 
@@ -12,6 +15,11 @@ class Base(DeclarativeBase):
     pass
 
 engine = create_async_engine(ASYNC_DB_URL, echo=False, pool_pre_ping=True)
+# 요청별 DB 쿼리 수 집계 (/metrics 의 api_db_queries_per_request)
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    metrics.count_db_query()
+
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 async_session_maker = SessionLocal
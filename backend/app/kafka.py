@@ -1,21 +1,152 @@
 # app/kafka.py
-import json, os
+"""
+Kafka producer 공용 모듈.
+
+- publish(): 호출 즉시 전달 결과 future를 돌려준다. 메시지는 내부 큐 → 단일 drain 태스크가
+  producer.send()로 배치 버퍼에 넣으므로 순서가 유지되고, 동시 요청들이 linger_ms 동안 한 배치로 묶인다.
+- 값은 orjson으로 직렬화하고 dict에는 스키마 버전 필드 "v"를 붙인다 (소비자는 없으면 1로 간주).
+- 압축은 KAFKA_COMPRESSION (기본 zstd). 코덱 라이브러리(cramjam)가 없으면 압축 없이 보낸다.
+"""
+import os
+import time
+import asyncio
+from typing import Any, Optional
+
+import orjson
 from aiokafka import AIOKafkaProducer # type: ignore
+from aiokafka import codec # type: ignore
+from aiokafka.admin import AIOKafkaAdminClient, NewTopic # type: ignore
+from aiokafka.errors import TopicAlreadyExistsError # type: ignore
+
+from app import metrics
+
+BOOTSTRAP = os.getenv("KAFKA_BOOTSTRAP", "redpanda:9092")
+COMPRESSION = os.getenv("KAFKA_COMPRESSION", "zstd").lower()  # zstd | lz4 | snappy | gzip | none
+LINGER_MS = int(os.getenv("KAFKA_LINGER_MS", "20"))
+MAX_BATCH_BYTES = int(os.getenv("KAFKA_MAX_BATCH_BYTES", str(256 * 1024)))
+SCHEMA_VERSION = 1
 
 producer: AIOKafkaProducer | None = None
+_queue: Optional[asyncio.Queue] = None
+_drain_task: Optional[asyncio.Task] = None
+
+_CODECS = {
+    "zstd": codec.has_zstd,
+    "lz4": codec.has_lz4,
+    "snappy": codec.has_snappy,
+    "gzip": codec.has_gzip,
+}
+
+
+def _compression_type() -> Optional[str]:
+    if COMPRESSION in ("", "none"):
+        return None
+    if COMPRESSION not in _CODECS:
+        raise ValueError(f"unsupported KAFKA_COMPRESSION={COMPRESSION!r}")
+    if not _CODECS[COMPRESSION]():
+        print(f"[kafka] ⚠️ {COMPRESSION} 코덱 라이브러리가 없어 압축 없이 발행합니다 (pip install 'aiokafka[{COMPRESSION}]')")
+        return None
+    return COMPRESSION
+
+
+def serialize_value(value: Any) -> bytes:
+    if isinstance(value, dict) and "v" not in value:
+        value = {"v": SCHEMA_VERSION, **value}
+    return orjson.dumps(value)
+
+
+def deserialize_value(raw: bytes) -> Any:
+    return orjson.loads(raw)
+
 
 async def start_kafka():
-    global producer
+    global producer, _queue, _drain_task
     producer = AIOKafkaProducer(
-        bootstrap_servers=os.getenv("KAFKA_BOOTSTRAP", "redpanda:9092"),
-        value_serializer=lambda v: json.dumps(v).encode(),
+        bootstrap_servers=BOOTSTRAP,
+        value_serializer=serialize_value,
         key_serializer=lambda v: str(v).encode(),
-        linger_ms=5,
+        linger_ms=LINGER_MS,
+        max_batch_size=MAX_BATCH_BYTES,
+        compression_type=_compression_type(),
         acks="all",
         enable_idempotence=True,
     )
     await producer.start()
+    _queue = asyncio.Queue()
+    _drain_task = asyncio.create_task(_drain())
 
 async def stop_kafka():
+    global _drain_task
+    if _queue is not None and _drain_task is not None:
+        # 이미 publish()된 메시지는 배치 버퍼까지 넣고 종료
+        await _queue.join()
+        _drain_task.cancel()
+        await asyncio.gather(_drain_task, return_exceptions=True)
+        _drain_task = None
     if producer:
         await producer.stop()
+
+
+def publish(topic: str, value: Any, key: Any = None) -> asyncio.Future:
+    """
+    기다리지 않는 발행. 브로커 ack(또는 실패)로 완료되는 future를 돌려준다.
+    결과가 필요 없으면 버려도 되고, 전달 보장이 필요하면 await 한다.
+    """
+    if _queue is None:
+        raise RuntimeError("start_kafka()가 호출되지 않았습니다")
+    fut = asyncio.get_running_loop().create_future()
+    _queue.put_nowait((topic, key, value, fut, time.perf_counter()))
+    return fut
+
+
+def _settle(fut: asyncio.Future, topic: str, enqueued: float, delivery: asyncio.Future) -> None:
+    metrics.KAFKA_PUBLISH_SECONDS.labels(topic=topic).observe(time.perf_counter() - enqueued)
+    if fut.done():
+        return
+    if delivery.cancelled():
+        fut.cancel()
+    elif delivery.exception() is not None:
+        metrics.KAFKA_PUBLISH_FAILURES.labels(topic=topic).inc()
+        fut.set_exception(delivery.exception())
+    else:
+        fut.set_result(delivery.result())
+
+
+async def _drain() -> None:
+    while True:
+        topic, key, value, fut, enqueued = await _queue.get()
+        try:
+            # send()는 배치 버퍼 여유/메타데이터가 없을 때만 대기하고, 전달 future를 돌려준다
+            delivery = await producer.send(topic, key=key, value=value)
+            delivery.add_done_callback(
+                lambda d, fut=fut, topic=topic, enqueued=enqueued: _settle(fut, topic, enqueued, d)
+            )
+        except asyncio.CancelledError:
+            if not fut.done():
+                fut.cancel()
+            raise
+        except Exception as e:
+            metrics.KAFKA_PUBLISH_FAILURES.labels(topic=topic).inc()
+            if not fut.done():
+                fut.set_exception(e)
+        finally:
+            _queue.task_done()
+
+
+async def ensure_topics(names: list[str], *, partitions: int = 1, replication: int = 1):
+    """토픽 자동 생성이 꺼진 브로커를 위해, 없으면 만든다 (이미 있으면 무시)."""
+    admin = AIOKafkaAdminClient(bootstrap_servers=BOOTSTRAP)
+    await admin.start()
+    try:
+        existing = set(await admin.list_topics())
+        missing = [n for n in names if n not in existing]
+        if not missing:
+            return
+        try:
+            await admin.create_topics(
+                [NewTopic(name=n, num_partitions=partitions, replication_factor=replication) for n in missing]
+            )
+        except TopicAlreadyExistsError:
+            pass
+    finally:
+        await admin.close()
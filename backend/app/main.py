@@ -5,24 +5,45 @@ import os
 from dotenv import load_dotenv
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
 
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import get_db
 from app.api.routers import patient, therapist, chat, music, auth, sessions, user, connection, board, messenger
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
 from app.kafka import start_kafka, stop_kafka
+from app.services.provider_http import start_http_clients, close_http_clients
+from app.workers.outbox_relay import run_relay
+from app.services.track_events import hub as track_event_hub
+from app.services.idempotency import run_cleanup as run_idempotency_cleanup
+from app import metrics
+from prometheus_client import make_asgi_app
+
+# outbox relay를 API 프로세스 안에서 돌릴지 (별도 프로세스로 돌린다면 false)
+OUTBOX_RELAY_IN_API = os.getenv("OUTBOX_RELAY_IN_API", "true").lower() == "true"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 앱 시작 시
     await start_kafka()
+    await start_http_clients()
+    relay_task = asyncio.create_task(run_relay()) if OUTBOX_RELAY_IN_API else None
+    await track_event_hub.start()
+    idempotency_cleanup = asyncio.create_task(run_idempotency_cleanup())
     try:
         # 여기가 실제 앱이 돌아가는 구간
         yield
     finally:
         # 앱 종료 시
+        idempotency_cleanup.cancel()
+        await asyncio.gather(idempotency_cleanup, return_exceptions=True)
+        await track_event_hub.stop()
+        if relay_task:
+            relay_task.cancel()
+            await asyncio.gather(relay_task, return_exceptions=True)
+        await close_http_clients()
         await stop_kafka()
 
 app = FastAPI(
@@ -48,8 +69,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 요청마다 실행된 SQL 수를 엔드포인트(라우트 템플릿)별로 기록
+@app.middleware("http")
+async def count_db_queries(request: Request, call_next):
+    with metrics.track_db_queries() as counter:
+        response = await call_next(request)
+    route = request.scope.get("route")
+    if route is not None and hasattr(route, "methods"):
+        metrics.API_DB_QUERIES.labels(endpoint=f"{request.method} {route.path}").observe(counter.count)
+    return response
+
 os.makedirs("static/audio", exist_ok=True) # 폴더가 없으면 생성
 app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/metrics", make_asgi_app())
 
 # 💡 2. 그 다음에 API 라우터들을 등록합니다.
 app.include_router(chat.router)
@@ -0,0 +1,156 @@
+# app/metrics.py
+"""
+Prometheus 메트릭 정의 (prometheus_client).
+
+music_worker는 MUSIC_WORKER_METRICS_PORT로 별도 HTTP 엔드포인트를 띄워 노출하고,
+API는 /metrics 로 노출한다.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+from prometheus_client import Counter, Gauge, Histogram
+
+# --- music_worker: 레인별 대기열 ---
+WORKER_LANE_BUFFERED = Gauge(
+    "music_worker_lane_buffered",
+    "Messages fetched from Kafka and waiting for a worker slot, per lane",
+    ["lane"],
+)
+WORKER_LANE_LAG = Gauge(
+    "music_worker_lane_lag",
+    "Kafka consumer lag (high watermark - position) over assigned partitions, per lane",
+    ["lane"],
+)
+WORKER_IN_FLIGHT = Gauge(
+    "music_worker_in_flight",
+    "Generations currently running in this worker process",
+)
+
+# --- music_worker: 생성 단계별 시간/크기 ---
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600, 1800)
+WORKER_STAGE_SECONDS = Histogram(
+    "music_worker_stage_seconds",
+    "Time spent per generation stage: queue, claim, rate_wait, provider, first_audio, download, write, total",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+WORKER_AUDIO_BYTES = Histogram(
+    "music_worker_audio_bytes",
+    "Size of generated audio files",
+    buckets=(64e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6, 16e6, 32e6, 64e6),
+)
+WORKER_GENERATIONS = Counter(
+    "music_worker_generations",
+    "Finished generation attempts by outcome (ready, cached, failed, retried, lease_lost, cancelled)",
+    ["outcome"],
+)
+
+# --- 음악 생성 provider 라우팅 ---
+PROVIDER_LATENCY = Histogram(
+    "music_provider_latency_seconds",
+    "Provider generate() latency, per provider and outcome",
+    ["provider", "outcome"],
+    buckets=(1, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300),
+)
+PROVIDER_HEDGES = Counter(
+    "music_provider_hedges_total",
+    "Hedged requests fired because the primary exceeded its latency percentile",
+    ["provider"],
+)
+PROVIDER_FALLBACKS = Counter(
+    "music_provider_fallbacks_total",
+    "Requests retried on the next provider after the previous one failed",
+    ["provider"],
+)
+
+# --- Kafka 발행 (app.kafka.publish) ---
+KAFKA_PUBLISH_SECONDS = Histogram(
+    "kafka_publish_seconds",
+    "Time from publish() to broker ack, per topic",
+    ["topic"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+KAFKA_PUBLISH_FAILURES = Counter(
+    "kafka_publish_failures",
+    "Messages whose delivery failed, per topic",
+    ["topic"],
+)
+
+# --- outbox relay (app.workers.outbox_relay) ---
+OUTBOX_PUBLISH_FAILURES = Counter(
+    "outbox_publish_failures",
+    "Outbox events whose publish attempt failed (retried with backoff), per topic",
+    ["topic"],
+)
+OUTBOX_DEAD = Counter(
+    "outbox_dead_events",
+    "Outbox events given up after OUTBOX_MAX_ATTEMPTS failed publishes, per topic",
+    ["topic"],
+)
+
+# --- OpenAI 호출 (app.services.openai_pool) ---
+OPENAI_WAIT_SECONDS = Histogram(
+    "openai_wait_seconds",
+    "Time spent waiting for a per-process OpenAI concurrency slot, per purpose",
+    ["purpose"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+OPENAI_IN_FLIGHT = Gauge(
+    "openai_in_flight",
+    "OpenAI calls currently in flight in this process",
+)
+OPENAI_CALL_SECONDS = Histogram(
+    "openai_call_seconds",
+    "OpenAI call latency after acquiring a slot, per purpose and outcome",
+    ["purpose", "outcome"],
+    buckets=(0.25, 0.5, 1, 2, 3, 5, 8, 13, 21, 34),
+)
+OPENAI_FIRST_TOKEN_SECONDS = Histogram(
+    "openai_first_token_seconds",
+    "Streaming OpenAI calls: time from slot acquisition to the first chunk, per purpose",
+    ["purpose"],
+    buckets=(0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 8),
+)
+
+# --- 대화 분석 캐시 (app.services.dialog_analysis) ---
+DIALOG_ANALYSIS = Counter(
+    "dialog_analysis_total",
+    "Dialog mood analyses by how they were served: cached (no LLM call), incremental (delta only) or full",
+    ["mode"],
+)
+
+# --- API: 요청당 DB 쿼리 수 ---
+API_DB_QUERIES = Histogram(
+    "api_db_queries_per_request",
+    "SQL statements executed while handling one API request, per endpoint",
+    ["endpoint"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+
+
+class _QueryCounter:
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+
+_db_queries: ContextVar[Optional[_QueryCounter]] = ContextVar("db_queries", default=None)
+
+
+@contextmanager
+def track_db_queries() -> Iterator[_QueryCounter]:
+    """이 컨텍스트(요청) 안에서 실행된 SQL 수를 센다. app.db의 엔진 이벤트가 count_db_query()를 호출."""
+    counter = _QueryCounter()
+    token = _db_queries.set(counter)
+    try:
+        yield counter
+    finally:
+        _db_queries.reset(token)
+
+
+def count_db_query() -> None:
+    counter = _db_queries.get()
+    if counter is not None:
+        counter.count += 1
@@ -3,7 +3,7 @@ from typing import Optional, Literal, List
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy import (
-    BigInteger, String, Text, Integer, DateTime, CheckConstraint,
+    BigInteger, String, Text, Integer, Float, DateTime, CheckConstraint,
     ForeignKey, Index, Boolean, JSON
 )
 from sqlalchemy.dialects.postgresql import JSONB, ARRAY
@@ -141,6 +141,10 @@ class Session(Base):
     track_url: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     provider: Mapped[Optional[str]] = mapped_column(String, nullable=True)
 
+    # 토큰 예산을 넘긴 오래된 대화의 누적 요약 (summary_upto_id 이하 메시지가 반영됨)
+    context_summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    summary_upto_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+
     created_at: Mapped[Optional["datetime"]] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
@@ -229,6 +233,8 @@ class SessionPrompt(Base):
     stage: Mapped[str] = mapped_column(String, nullable=False)
     data: Mapped[dict] = mapped_column(JSONB, nullable=False)
     confidence: Mapped[Optional[float]] = mapped_column(nullable=True)
+    # analyzed 스냅샷이 반영한 마지막 ConversationMessage.id (증분 분석 캐시 키)
+    upto_message_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
 
     created_at: Mapped[Optional["datetime"]] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
@@ -236,6 +242,11 @@ class SessionPrompt(Base):
 
     session: Mapped["Session"] = relationship(back_populates="prompts")
 
+    __table_args__ = (
+        # 세션의 최신 analyzed 스냅샷(분석 캐시) 조회용 부분 인덱스
+        Index("idx_session_prompts_analyzed", "session_id", "id", postgresql_where=text("stage = 'analyzed'")),
+    )
+
 
 class Track(Base):
     __tablename__ = "tracks"
@@ -261,11 +272,30 @@ class Track(Base):
 
     __table_args__ = (
         Index("idx_tracks_session_time", "session_id", "created_at"),
+        Index("idx_tracks_gen_hash_time", "gen_hash", "created_at"),
+        # 리퍼가 PROCESSING 트랙만 훑도록 하는 부분 인덱스
+        Index("idx_tracks_processing_lease", "claimed_at", postgresql_where=text("status = 'PROCESSING'")),
     )
     status: Mapped[str] = mapped_column(String, default="QUEUED", nullable=False)
     task_external_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     prompt: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # 생성 요청(프롬프트/가사/길이/instrumental/extra)을 정규화한 sha256 → 동일 요청 오디오 재사용
+    gen_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    # provider 호출 시도 횟수 (재시도 토픽 경유 포함)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False, server_default='0')
+    # 처리 lease: 선점한 워커와 마지막 heartbeat 시각 (만료되면 리퍼가 회수)
+    worker_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    claimed_at: Mapped[Optional["datetime"]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # 재발행(리퍼 회수)에 필요한 원본 생성 요청 (task_id 제외 Kafka payload)
+    request_payload: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
+    # 단계별 계측 (마지막 시도 기준). 대기 시간 = started_at - created_at
+    started_at: Mapped[Optional["datetime"]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional["datetime"]] = mapped_column(DateTime(timezone=True), nullable=True)
+    provider_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)   # 요청 ~ 응답 헤더
+    download_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)   # 바디 수신
+    write_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)      # 디스크 쓰기/fsync
+    audio_bytes: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
 
 class CounselorNote(Base):
     __tablename__ = "counselor_notes"
@@ -367,4 +397,76 @@ class Message(Base):
     receiver: Mapped["User"] = relationship("User", foreign_keys=[receiver_id])
 
     is_read: Mapped[bool] = mapped_column(Boolean, default=False) # 읽음 여부
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+class OutboxEvent(Base):
+    """
+    Kafka로 보낼 메시지를 비즈니스 데이터와 같은 DB 트랜잭션에 기록하는 outbox.
+    outbox_relay가 미발행 행을 배치로 읽어 Kafka에 발행하고 published_at을 채운다.
+    """
+    __tablename__ = "outbox_events"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    topic: Mapped[str] = mapped_column(String, nullable=False)
+    key: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False, server_default='0')
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    published_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # 발행 실패 후 다시 시도할 시각 (지수 backoff). NULL이면 바로 대상
+    next_attempt_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # 재시도 상한을 넘겨 포기한 시각 → relay가 더 이상 읽지 않는다
+    dead_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # 발행 대기 중인 행만 담는 부분 인덱스 → relay 폴링이 테이블 크기와 무관하게 가볍다
+        Index("idx_outbox_unpublished", "id", postgresql_where=text("published_at IS NULL AND dead_at IS NULL")),
+    )
+
+
+class ProviderRateLimit(Base):
+    """
+    외부 provider 호출 token bucket (모든 워커 레플리카가 공유).
+    provider_limiter가 행을 FOR UPDATE로 잠그고 토큰을 계산/차감한다.
+    """
+    __tablename__ = "provider_rate_limits"
+
+    provider: Mapped[str] = mapped_column(String, primary_key=True)
+    tokens: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default='0')
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # 429/503의 Retry-After로 정해진 시각까지는 아무도 호출하지 않는다
+    blocked_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class ProviderSlot(Base):
+    """
+    provider 동시 호출 슬롯 lease. (provider, slot) 행 수가 곧 전체 동시 호출 한도.
+    holder가 비었거나 leased_until이 지난 슬롯만 새로 잡을 수 있다 (워커가 죽어도 자동 회수).
+    """
+    __tablename__ = "provider_slots"
+
+    provider: Mapped[str] = mapped_column(String, primary_key=True)
+    slot: Mapped[int] = mapped_column(Integer, primary_key=True)
+    holder: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    leased_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class IdempotencyKey(Base):
+    """
+    Idempotency-Key 헤더 처리 기록. (user_id, scope, key)마다 첫 실행의 응답을 저장해 재시도에 그대로 돌려준다.
+    response가 NULL이면 아직 첫 요청이 실행 중(동시 중복 요청은 완료될 때까지 대기).
+    """
+    __tablename__ = "idempotency_keys"
+
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    scope: Mapped[str] = mapped_column(String(64), primary_key=True)   # 예: "music.compose"
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    response: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
+    locked_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("idx_idempotency_expires", "expires_at"),
+    )
@@ -235,6 +235,8 @@ class MusicTrackDetail(MusicTrackInfo):
     intake_data: Optional[SimpleIntakeData] = None # (환자 접수용)
     therapist_manual: Optional[TherapistManualInput] = None # 👈 [추가] (처방/작곡용)
     chat_history: List[SimpleChatMessage] = []
+    # QUEUED/PROCESSING 트랙의 완료 예상 시각 (music_eta)
+    estimated_ready_at: Optional[datetime] = None
 # 💡 [핵심 추가] 프로필 '수정' 시 받을 데이터 스키마
 class UserUpdate(BaseModel):
     # (name은 수정 불가로 가정, age만 받음)
@@ -0,0 +1,169 @@
+# app/services/audio_store.py
+"""
+provider 응답(오디오 바디)을 메모리에 모으지 않고 청크 단위로 디스크에 쓰는 유틸.
+
+- 같은 디렉터리의 임시 파일(.part)에 쓰고 fsync 후 os.replace로 원자적으로 교체
+  → 정적 파일 서버가 반쯤 쓰인 mp3를 내보내는 일이 없다.
+- 기존 `len(audio_bytes) < 1000` 검사는 스트리밍 중에 누적 크기로 수행하고,
+  상한(MAX)을 넘으면 즉시 중단한다. 워커 메모리는 트랙 길이와 무관하게 일정하다.
+- live_path를 주면 오디오가 확인된 첫 청크부터 .part를 가리키는 심볼릭 링크
+  (LIVE_DIR/<track_id>.mp3)를 만들고 청크마다 flush 한다. API는 이 링크로 생성 중인
+  파일을 따라 읽고(/music/track/{id}/stream), 링크가 사라지면 쓰기가 끝난 것으로 본다.
+"""
+from __future__ import annotations
+import os
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import httpx
+
+AUDIO_DIR = os.getenv("AUDIO_SAVE_DIR", "/app/static/audio")
+LIVE_DIR = os.path.join(AUDIO_DIR, "live")
+CHUNK_SIZE = int(os.getenv("AUDIO_STREAM_CHUNK_BYTES", str(64 * 1024)))
+MIN_AUDIO_BYTES = 1000
+MAX_AUDIO_BYTES = int(os.getenv("AUDIO_MAX_BYTES", str(50 * 1024 * 1024)))
+
+
+class AudioValidationError(ValueError):
+    """오디오 바디가 비었거나, 너무 작거나/크거나, 오디오가 아닌(에러 JSON 등) 경우."""
+    pass
+
+
+@dataclass
+class WriteResult:
+    size: int
+    write_s: float   # 디스크 쓰기 + fsync + rename 에 쓴 시간 (네트워크 대기 제외)
+    first_chunk_at: Optional[float] = None  # 첫 오디오 청크를 쓴 시각 (perf_counter)
+
+
+def live_path(track_id: int) -> str:
+    """생성 중인 트랙의 부분 오디오 링크 경로 (워커와 API가 같은 볼륨을 본다)."""
+    return os.path.join(LIVE_DIR, f"{track_id}.mp3")
+
+
+def _link_live(tmp_path: str, link: str) -> bool:
+    """link → tmp_path 심볼릭 링크를 만든다. 다른 시도(hedge)가 이미 쓰고 있으면 False."""
+    os.makedirs(os.path.dirname(link), exist_ok=True)
+    target = os.path.relpath(tmp_path, os.path.dirname(link))
+    for _ in range(2):
+        try:
+            os.symlink(target, link)
+            return True
+        except FileExistsError:
+            if os.path.exists(link):
+                return False
+            # 죽은 워커가 남긴 끊어진 링크 → 교체
+            try:
+                os.unlink(link)
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def _check_head(head: bytes) -> None:
+    # 200 응답인데 바디가 JSON/HTML 에러인 경우를 초기에 걸러낸다
+    stripped = head.lstrip()
+    if stripped[:1] in (b"{", b"[", b"<"):
+        preview = stripped[:200].decode("utf-8", errors="ignore")
+        raise AudioValidationError(f"non_audio_body: {preview}")
+
+
+async def write_stream_atomic(
+    chunks: AsyncIterator[bytes],
+    file_path: str,
+    live_path: Optional[str] = None,
+) -> WriteResult:
+    """
+    chunks를 file_path로 원자적으로 저장하고 저장된 바이트 수와 디스크 시간을 반환한다.
+    검증 실패/예외/취소 시 임시 파일은 삭제되고 file_path는 생성되지 않는다.
+    live_path가 있으면 쓰는 동안 .part를 그 경로에 노출한다 (끝나면 링크 삭제).
+    """
+    save_dir = os.path.dirname(file_path) or "."
+    os.makedirs(save_dir, exist_ok=True)
+    tmp_path = os.path.join(save_dir, f".{os.path.basename(file_path)}.part")
+
+    size = 0
+    head = b""
+    write_s = 0.0
+    first_chunk_at: Optional[float] = None
+    linked = False
+    try:
+        with open(tmp_path, "wb") as f:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                if len(head) < 16:
+                    head += chunk[: 16 - len(head)]
+                    if len(head) >= 16:
+                        _check_head(head)
+                size += len(chunk)
+                if size > MAX_AUDIO_BYTES:
+                    raise AudioValidationError(f"audio_too_large len>{MAX_AUDIO_BYTES}")
+                t = time.perf_counter()
+                f.write(chunk)
+                if live_path:
+                    # 읽는 쪽이 바로 볼 수 있게 (fsync는 하지 않음)
+                    f.flush()
+                if first_chunk_at is None and len(head) >= 16:
+                    first_chunk_at = time.perf_counter()
+                    if live_path:
+                        linked = _link_live(tmp_path, live_path)
+                write_s += time.perf_counter() - t
+
+            _check_head(head)
+            if size < MIN_AUDIO_BYTES:
+                raise AudioValidationError(f"empty_or_too_small_audio len={size}")
+
+            t = time.perf_counter()
+            f.flush()
+            await asyncio.to_thread(os.fsync, f.fileno())
+
+        os.replace(tmp_path, file_path)
+        _fsync_dir(save_dir)
+        write_s += time.perf_counter() - t
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    finally:
+        if linked:
+            try:
+                os.unlink(live_path)
+            except FileNotFoundError:
+                pass
+    return WriteResult(size, write_s, first_chunk_at)
+
+
+async def save_response_audio(
+    resp: httpx.Response, file_path: str, live_path: Optional[str] = None
+) -> WriteResult:
+    """httpx 스트리밍 응답(client.stream(...))의 바디를 file_path로 저장."""
+    return await write_stream_atomic(resp.aiter_bytes(CHUNK_SIZE), file_path, live_path)
+
+
+async def read_error_preview(resp: httpx.Response, limit: int = 300) -> str:
+    """에러 응답 바디의 앞부분만 읽어서 문자열로 반환 (바이너리일 수도 있으므로 전체를 읽지 않음)."""
+    raw = b""
+    async for chunk in resp.aiter_bytes():
+        raw += chunk
+        if len(raw) >= limit:
+            break
+    return raw[:limit].decode("utf-8", errors="ignore")
+
+
+def _fsync_dir(path: str) -> None:
+    # rename 자체를 디스크에 반영 (일부 플랫폼은 디렉터리 fsync 미지원)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -1,7 +1,7 @@
 import os
 from datetime import datetime, timedelta, timezone
 from typing import Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -18,6 +18,7 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
 
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login") # 4단계에서 만들 라우터 경로
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
 def verify_password(plain_password, password_hash):
     return pwd_context.verify(plain_password, password_hash)
@@ -112,4 +113,22 @@ async def get_current_user_optional(token: str = Depends(oauth2_scheme), db: Asy
     try:
         return await get_current_user(token, db)
     except:
-        return None
\ No newline at end of file
+        return None
+
+async def get_current_user_header_or_query(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    access_token: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    EventSource(SSE)처럼 Authorization 헤더를 붙일 수 없는 클라이언트용.
+    헤더가 없으면 ?access_token= 쿼리 파라미터로 받은 토큰을 검증한다.
+    """
+    jwt_token = token or access_token
+    if not jwt_token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_current_user(jwt_token, db)
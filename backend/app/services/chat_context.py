@@ -0,0 +1,210 @@
+# app/services/chat_context.py
+"""
+토큰 예산 기반 대화 컨텍스트 + 세션 누적 요약.
+
+- 메시지 토큰 수는 저장할 때 ConversationMessage.tokens에 기록하고, 컨텍스트를 만들 때는
+  그 값을 더하기만 한다 (tiktoken이 없으면 UTF-8 길이 기반 근사치).
+- build_messages: system + [이전 대화 요약] + 예산(CHAT_CONTEXT_TOKENS) 안에 들어가는 최근 대화 원문.
+- 요약되지 않은 대화가 예산을 넘으면, 최근 CHAT_KEEP_RECENT_TOKENS 만큼만 남기고 그 앞부분을
+  기존 요약에 접어 넣는다 (schedule_fold, 응답 경로 밖 백그라운드).
+  Session.summary_upto_id 이하 메시지는 요약에 반영된 것이므로 매 턴 다시 읽지 않는다.
+→ 세션이 길어져도 턴당 프롬프트 토큰이 일정하게 유지된다.
+"""
+from __future__ import annotations
+import os
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import async_session_maker
+from app.models import ConversationMessage, Session
+from app.services.openai_pool import chat_completion
+
+MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+TIMEOUT = float(os.getenv("OPENAI_TIMEOUT_S", "15"))
+# 요약 + 최근 대화 원문에 쓸 토큰 예산 (system 프롬프트 제외)
+CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "3000"))
+# 요약으로 접을 때 원문으로 남길 최근 대화 토큰
+KEEP_RECENT_TOKENS = int(os.getenv("CHAT_KEEP_RECENT_TOKENS", str(CONTEXT_TOKENS * 6 // 10)))
+MIN_RECENT_MESSAGES = 4
+SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "500"))
+MESSAGE_OVERHEAD_TOKENS = 4  # role/구분자
+
+SUMMARY_SYSTEM_PROMPT = (
+    "당신은 심리 상담 대화를 정리하는 기록 담당자입니다. 기존 요약과 그 뒤에 이어진 대화를 합쳐 "
+    "갱신된 요약을 한국어로 작성하세요. 환자의 상태와 감정 변화, 주요 사건/장면, 상담 목표, "
+    "음악 관련 선호/금기 사항은 빠뜨리지 말고, 인사말/반복 표현은 생략하세요. 요약 본문만 출력하세요."
+)
+
+_encoder: Any = None
+_encoder_loaded = False
+
+
+def _get_encoder():
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        try:
+            import tiktoken  # type: ignore
+            try:
+                _encoder = tiktoken.encoding_for_model(MODEL)
+            except KeyError:
+                _encoder = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # 미설치 또는 인코딩 파일을 받을 수 없는 환경 → 근사치 사용
+            print(f"[chat_context] ⚠️ tiktoken 사용 불가, 근사 토큰 수 사용: {e}")
+            _encoder = None
+    return _encoder
+
+
+def count_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    enc = _get_encoder()
+    if enc is not None:
+        return len(enc.encode(text))
+    # 한글 1자(3바이트) ≈ 1토큰, 영문 약 3~4자 ≈ 1토큰 → 약간 넉넉하게 잡힌다
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def _message_tokens(m: Dict[str, Any]) -> int:
+    tokens = m.get("tokens")
+    if tokens is None:
+        tokens = count_tokens(m.get("content"))
+    return tokens + MESSAGE_OVERHEAD_TOKENS
+
+
+def recent_within_budget(history: List[Dict[str, Any]], budget: int) -> List[Dict[str, Any]]:
+    """최신 메시지부터 budget 토큰 안에 들어가는 만큼 (시간순으로) 돌려준다. 마지막 메시지는 항상 포함."""
+    picked: List[Dict[str, Any]] = []
+    used = 0
+    for m in reversed(history):
+        t = _message_tokens(m)
+        if picked and used + t > budget:
+            break
+        picked.append(m)
+        used += t
+    picked.reverse()
+    return picked
+
+
+def build_messages(system_prompt: str, history: List[Dict[str, Any]], summary: Optional[str] = None) -> List[Dict[str, str]]:
+    messages = [{"role": "system", "content": system_prompt}]
+    budget = CONTEXT_TOKENS
+    if summary:
+        messages.append({"role": "system", "content": f"[이전 대화 요약]\n{summary}"})
+        budget -= count_tokens(summary)
+    messages.extend(
+        {"role": m["role"], "content": m["content"]}
+        for m in recent_within_budget(history, max(budget, 0))
+    )
+    return messages
+
+
+def history_tokens(history: List[Dict[str, Any]]) -> int:
+    return sum(_message_tokens(m) for m in history)
+
+
+def needs_fold(history: List[Dict[str, Any]]) -> bool:
+    return history_tokens(history) > CONTEXT_TOKENS
+
+
+def _messages_to_fold(history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if not needs_fold(history):
+        return []
+    keep = recent_within_budget(history, KEEP_RECENT_TOKENS)
+    if len(keep) < MIN_RECENT_MESSAGES:
+        keep = history[-MIN_RECENT_MESSAGES:]
+    return history[: len(history) - len(keep)]
+
+
+async def load_history(db: AsyncSession, session_id: int, after_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """요약에 아직 반영되지 않은(after_id 이후) 메시지만 시간순으로."""
+    q = (
+        select(ConversationMessage.id, ConversationMessage.role, ConversationMessage.content, ConversationMessage.tokens)
+        .where(ConversationMessage.session_id == session_id)
+        .order_by(ConversationMessage.id.asc())
+    )
+    if after_id is not None:
+        q = q.where(ConversationMessage.id > after_id)
+    rows = (await db.execute(q)).all()
+    return [{"id": r.id, "role": r.role, "content": r.content, "tokens": r.tokens} for r in rows]
+
+
+async def _summarize(previous: Optional[str], messages: List[Dict[str, Any]]) -> str:
+    dialog_text = "\n".join(f"[{m['role'].capitalize()}]: {m['content']}" for m in messages)
+    resp = await chat_completion(
+        "summary",
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": (
+                    f"[기존 요약]\n{previous or '(없음)'}\n\n"
+                    f"[이어진 대화]\n{dialog_text}\n\n"
+                    f"갱신된 요약을 {SUMMARY_MAX_TOKENS} 토큰 이내로 작성하세요."
+                ),
+            },
+        ],
+        max_tokens=SUMMARY_MAX_TOKENS,
+        timeout=TIMEOUT,
+    )
+    return (resp.choices[0].message.content or "").strip()
+
+
+async def fold_session(session_id: int) -> bool:
+    """예산을 넘긴 오래된 대화를 요약에 접어 넣는다. 요약이 갱신되면 True."""
+    async with async_session_maker() as db:
+        row = (await db.execute(
+            select(Session.context_summary, Session.summary_upto_id).where(Session.id == session_id)
+        )).one_or_none()
+        if row is None:
+            return False
+        to_fold = _messages_to_fold(await load_history(db, session_id, row.summary_upto_id))
+    if not to_fold:
+        return False
+
+    # LLM 호출 동안 DB 커넥션을 잡고 있지 않도록 세션을 나눈다
+    summary = await _summarize(row.context_summary, to_fold)
+    if not summary:
+        return False
+
+    async with async_session_maker() as db:
+        # 다른 프로세스가 먼저 접었으면(커서가 바뀜) 이번 결과는 버린다
+        res = await db.execute(
+            update(Session)
+            .where(Session.id == session_id, Session.summary_upto_id.is_not_distinct_from(row.summary_upto_id))
+            .values(context_summary=summary, summary_upto_id=to_fold[-1]["id"])
+            .returning(Session.id)
+            .execution_options(synchronize_session=False)
+        )
+        folded = res.scalar_one_or_none() is not None
+        await db.commit()
+    return folded
+
+
+_folding: set[int] = set()
+_fold_tasks: set[asyncio.Task] = set()
+
+
+def schedule_fold(session_id: int) -> None:
+    """응답 경로 밖에서 요약 갱신 (같은 세션은 프로세스 안에서 한 번에 하나만)."""
+    if session_id in _folding:
+        return
+    _folding.add(session_id)
+
+    async def run():
+        try:
+            if await fold_session(session_id):
+                print(f"[chat_context] 🗜 세션 {session_id} 대화 요약 갱신")
+        except Exception as e:
+            print(f"[chat_context] ⚠️ 세션 {session_id} 요약 실패: {e}")
+        finally:
+            _folding.discard(session_id)
+
+    task = asyncio.create_task(run())
+    _fold_tasks.add(task)
+    task.add_done_callback(_fold_tasks.discard)
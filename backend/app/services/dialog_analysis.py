@@ -0,0 +1,127 @@
+# app/services/dialog_analysis.py
+"""
+세션별 대화 분석(analyze_dialog_for_mood) 캐시.
+
+- 분석 결과는 SessionPrompt(stage="analyzed")로 남기고, upto_message_id에 그 분석이 반영한
+  마지막 ConversationMessage.id를 적는다. 이 값이 캐시 키다.
+- 마지막 메시지가 그대로면 → 저장된 결과를 그대로 돌려준다 (LLM 호출 없음).
+- 뒤에 메시지가 더 붙었으면 → 이전 결과 + 그 뒤 대화(delta)만 보내 결과를 갱신한다.
+  delta 중 일부가 이미 세션 요약(context_summary)으로 접혔으면 요약도 같이 보낸다.
+- 캐시가 없으면 → 사전 접수 내용 + 요약 + 최근 대화로 전체 분석.
+- LLM 실패로 기본값이 나온 경우는 저장하지 않는다 (다음 호출에서 다시 분석).
+
+DB 조회/저장은 호출 측 세션과 분리된 자체 세션으로 한다 (채팅 응답과 동시에 도는 선분석에서도 호출되고,
+LLM 호출 동안 커넥션을 잡고 있지 않도록).
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import metrics
+from app.db import async_session_maker
+from app.models import SessionPatientIntake, SessionPrompt
+from app.services.chat_context import CONTEXT_TOKENS, history_tokens, recent_within_budget
+from app.services.openai_chat import ANALYSIS_FALLBACK, request_dialog_analysis
+
+
+def intake_preamble(intake: Optional[SessionPatientIntake]) -> List[Dict[str, Any]]:
+    """분석 정확도를 위해 대화 앞에 붙이는 '사전 접수 내용' 메시지들."""
+    if intake is None:
+        return []
+    return [
+        {"role": "system", "content": "--- [환자 사전 접수 내용] ---"},
+        {
+            "role": "user",
+            "content": f"상담 목표: {intake.goal.get('text') if intake.goal else 'N/A'}",
+        },
+        {
+            "role": "user",
+            "content": f"선호 장르: {intake.prefs.get('preferredMusicGenres') if intake.prefs else 'N/A'}",
+        },
+        {
+            "role": "user",
+            "content": f"비선호 장르: {intake.prefs.get('dislikedMusicGenres') if intake.prefs else 'N/A'}",
+        },
+        {"role": "system", "content": "--- [AI 상담 대화 내용] ---"},
+    ]
+
+
+def _confidence(analyzed: Dict[str, Any]) -> float:
+    try:
+        return float(analyzed.get("confidence", 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+async def analyze_session(
+    session_id: int,
+    history: List[Dict[str, Any]],
+    *,
+    summary: Optional[str] = None,
+    summary_upto_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    history: chat_context.load_history 결과 (요약 커서 이후 메시지, "id" 포함, 시간순)
+    summary / summary_upto_id: Session.context_summary / Session.summary_upto_id
+    """
+    upto = history[-1]["id"] if history else summary_upto_id
+
+    async with async_session_maker() as db:
+        cached = (await db.execute(
+            select(SessionPrompt.data, SessionPrompt.upto_message_id)
+            .where(
+                SessionPrompt.session_id == session_id,
+                SessionPrompt.stage == "analyzed",
+                SessionPrompt.upto_message_id.is_not(None),
+            )
+            .order_by(SessionPrompt.id.desc())
+            .limit(1)
+        )).one_or_none()
+        intake = await db.get(SessionPatientIntake, session_id)
+
+    if cached and upto is not None and cached.upto_message_id == upto:
+        metrics.DIALOG_ANALYSIS.labels(mode="cached").inc()
+        return dict(cached.data)
+
+    if cached and upto is not None and cached.upto_message_id < upto:
+        mode = "incremental"
+        delta = [m for m in history if m["id"] > cached.upto_message_id]
+        # 이전 분석 이후 대화 중 요약으로 접혀 history에 없는 부분이 있으면 요약으로 대신
+        folded = summary_upto_id is not None and cached.upto_message_id < summary_upto_id
+        analyzed = await request_dialog_analysis(delta, summary if folded else None, previous=cached.data)
+    else:
+        mode = "full"
+        preamble = intake_preamble(intake)
+        # 접수 내용이 토큰 예산에서 잘리지 않도록 대화 쪽을 줄인다
+        dialog_budget = max(CONTEXT_TOKENS - history_tokens(preamble), 0)
+        analyzed = await request_dialog_analysis(
+            preamble + recent_within_budget(history, dialog_budget), summary
+        )
+    metrics.DIALOG_ANALYSIS.labels(mode=mode).inc()
+
+    if analyzed is None:
+        return dict(ANALYSIS_FALLBACK)
+
+    async with async_session_maker() as db:
+        await db.execute(
+            insert(SessionPrompt).values(
+                session_id=session_id,
+                stage="analyzed",
+                data=analyzed,
+                confidence=_confidence(analyzed),
+                upto_message_id=upto,
+            )
+        )
+        await db.commit()
+    return analyzed
+
+
+async def invalidate(db: AsyncSession, session_id: int) -> None:
+    """대화 기록이 지워지면 기존 분석은 캐시로 쓰지 않는다 (스냅샷 자체는 남긴다). 커밋은 호출 측."""
+    await db.execute(
+        update(SessionPrompt)
+        .where(SessionPrompt.session_id == session_id, SessionPrompt.stage == "analyzed")
+        .values(upto_message_id=None)
+    )
@@ -0,0 +1,117 @@
+# app/services/generation_cache.py
+"""
+음악 생성 결과 캐시 (content-addressed).
+
+같은 세션 프롬프트/가사/길이/instrumental 조합이 짧은 시간 안에 다시 요청되면
+(더블클릭, 재시도 등) provider를 다시 호출하지 않고 기존 오디오를 새 Track에 연결한다.
+
+정책 (env):
+  - MUSIC_CACHE_ENABLED  : 전체 on/off (기본 true)
+  - MUSIC_CACHE_WINDOW_S : READY 트랙 재사용 허용 시간(초), 0 이하면 재사용 안 함
+요청별 opt-out: extra={"cache": false} 또는 extra={"no_cache": true}
+(이 키들은 provider body에는 전달되지 않는다)
+"""
+from __future__ import annotations
+import os
+import re
+import json
+import hashlib
+import datetime as dt
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Track
+
+CACHE_ENABLED = os.getenv("MUSIC_CACHE_ENABLED", "true").lower() == "true"
+REUSE_WINDOW_S = int(os.getenv("MUSIC_CACHE_WINDOW_S", "3600"))
+
+# extra 안에서 캐시 정책만 제어하는 키 (provider에는 보내지 않음)
+CACHE_CONTROL_KEYS = ("cache", "no_cache")
+
+_WS = re.compile(r"\s+")
+
+
+def _normalize_text(s: Optional[str]) -> str:
+    return _WS.sub(" ", (s or "").strip())
+
+
+def provider_extra(extra: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """provider body에 병합할 extra (캐시 제어 키 제거)."""
+    if not isinstance(extra, dict):
+        return {}
+    return {k: v for k, v in extra.items() if k not in CACHE_CONTROL_KEYS}
+
+
+def cache_allowed(extra: Optional[Dict[str, Any]]) -> bool:
+    if not CACHE_ENABLED or REUSE_WINDOW_S <= 0:
+        return False
+    if isinstance(extra, dict):
+        if extra.get("cache") is False or extra.get("no_cache"):
+            return False
+    return True
+
+
+def generation_key(
+    prompt: str,
+    lyrics_text: Optional[str],
+    music_length_ms: int,
+    force_instrumental: bool,
+    extra: Optional[Dict[str, Any]] = None,
+) -> str:
+    """생성 요청을 정규화해서 sha256 hex로 만든다. 같은 결과를 낼 요청이면 같은 키."""
+    normalized = {
+        "prompt": _normalize_text(prompt),
+        "lyrics": _normalize_text(lyrics_text),
+        "music_length_ms": int(music_length_ms),
+        "force_instrumental": bool(force_instrumental),
+        "extra": provider_extra(extra),
+    }
+    raw = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def find_reusable_track(
+    db: AsyncSession,
+    gen_hash: str,
+    *,
+    exclude_track_id: Optional[int] = None,
+) -> Optional[Track]:
+    """재사용 윈도우 안에서 같은 키로 READY 된 가장 최근 트랙."""
+    since = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=REUSE_WINDOW_S)
+    q = (
+        select(Track)
+        .where(
+            Track.gen_hash == gen_hash,
+            Track.status == "READY",
+            Track.track_url.is_not(None),
+            Track.created_at >= since,
+        )
+        .order_by(Track.created_at.desc())
+        .limit(1)
+    )
+    if exclude_track_id is not None:
+        q = q.where(Track.id != exclude_track_id)
+    return (await db.execute(q)).scalar_one_or_none()
+
+
+async def find_inflight_track(
+    db: AsyncSession,
+    gen_hash: str,
+    session_id: int,
+) -> Optional[Track]:
+    """같은 세션에서 같은 키로 아직 생성 중인 트랙 (더블클릭/재시도 중복 방지)."""
+    since = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=REUSE_WINDOW_S)
+    q = (
+        select(Track)
+        .where(
+            Track.gen_hash == gen_hash,
+            Track.session_id == session_id,
+            Track.status.in_(("QUEUED", "PROCESSING")),
+            Track.created_at >= since,
+        )
+        .order_by(Track.created_at.desc())
+        .limit(1)
+    )
+    return (await db.execute(q)).scalar_one_or_none()
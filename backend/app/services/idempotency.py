@@ -0,0 +1,183 @@
+# app/services/idempotency.py
+"""
+Idempotency-Key 헤더 처리 (POST /music/compose, /chat/send).
+
+- 첫 요청: (user_id, scope, key) 행을 INSERT 해서 실행권을 잡고, 끝나면 응답 JSON을 저장.
+- 재시도(같은 키 + 같은 바디): 저장된 응답을 그대로 돌려준다 (Track/LLM 호출 재실행 없음).
+- 동시 중복: 첫 요청이 끝날 때까지 poll 하며 기다린다 (WAIT_S 초과 시 409).
+- 같은 키에 다른 바디: 422.
+- 첫 실행이 예외로 끝나면 행을 지워 재시도가 다시 실행할 수 있게 한다.
+- 실행 중 프로세스가 죽으면 LOCK_TTL_S 뒤 다음 요청이 실행권을 넘겨받는다.
+- 만료(TTL_H)된 행은 run_cleanup()이 주기적으로 지운다.
+
+행 갱신은 핸들러의 DB 세션과 분리된 자체 세션으로 한다 (핸들러가 중간에 commit/rollback 해도 무관).
+"""
+from __future__ import annotations
+import os
+import json
+import asyncio
+import hashlib
+import datetime as dt
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, update, delete, func, and_, null
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db import async_session_maker
+from app.models import IdempotencyKey
+
+TTL_H = float(os.getenv("IDEMPOTENCY_TTL_H", "24"))
+WAIT_S = float(os.getenv("IDEMPOTENCY_WAIT_S", "60"))
+LOCK_TTL_S = float(os.getenv("IDEMPOTENCY_LOCK_TTL_S", "180"))
+POLL_S = 0.25
+CLEANUP_EVERY_S = 600
+MAX_KEY_LEN = 255
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+def request_hash(body: Any) -> str:
+    raw = json.dumps(jsonable_encoder(body), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _pk(user_id: int, scope: str, key: str):
+    return and_(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key == key,
+    )
+
+
+async def _acquire(user_id: int, scope: str, key: str, req_hash: str) -> bool:
+    """실행권을 잡으면 True. 기존 행이 만료됐거나 실행 중 버려진(lock 만료) 경우에도 넘겨받는다."""
+    now = func.now()
+    async with async_session_maker() as db:
+        stmt = pg_insert(IdempotencyKey).values(
+            user_id=user_id,
+            scope=scope,
+            key=key,
+            request_hash=req_hash,
+            locked_at=now,
+            expires_at=now + dt.timedelta(hours=TTL_H),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "scope", "key"],
+            set_={
+                "request_hash": stmt.excluded.request_hash,
+                "response": null(),
+                "locked_at": now,
+                "expires_at": stmt.excluded.expires_at,
+            },
+            where=(
+                (IdempotencyKey.expires_at < now)
+                | (
+                    IdempotencyKey.response.is_(None)
+                    & (IdempotencyKey.request_hash == stmt.excluded.request_hash)
+                    & (IdempotencyKey.locked_at < now - dt.timedelta(seconds=LOCK_TTL_S))
+                )
+            ),
+        ).returning(IdempotencyKey.key)
+        acquired = (await db.execute(stmt)).scalar_one_or_none() is not None
+        await db.commit()
+        return acquired
+
+
+async def _wait_for_response(user_id: int, scope: str, key: str, req_hash: str) -> Optional[dict]:
+    """먼저 실행 중인 요청의 응답을 기다린다. 첫 실행이 실패(행 삭제)했거나 lock이 만료되면 None."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + WAIT_S
+    while True:
+        async with async_session_maker() as db:
+            row = (
+                await db.execute(
+                    select(
+                        IdempotencyKey.request_hash,
+                        IdempotencyKey.response,
+                        (IdempotencyKey.locked_at < func.now() - dt.timedelta(seconds=LOCK_TTL_S)).label("stale"),
+                    ).where(_pk(user_id, scope, key))
+                )
+            ).one_or_none()
+        if row is None:
+            return None
+        if row.request_hash != req_hash:
+            raise HTTPException(422, "Idempotency-Key가 다른 요청 본문에 이미 사용되었습니다.")
+        if row.response is not None:
+            return row.response
+        if row.stale:
+            # 먼저 실행하던 프로세스가 죽은 것으로 보고 실행권을 넘겨받으러 간다
+            return None
+        if loop.time() >= deadline:
+            raise HTTPException(409, "같은 Idempotency-Key 요청이 아직 처리 중입니다. 잠시 후 다시 시도하세요.")
+        await asyncio.sleep(POLL_S)
+
+
+async def _store(user_id: int, scope: str, key: str, response: dict) -> None:
+    async with async_session_maker() as db:
+        await db.execute(update(IdempotencyKey).where(_pk(user_id, scope, key)).values(response=response))
+        await db.commit()
+
+
+async def _release(user_id: int, scope: str, key: str) -> None:
+    async with async_session_maker() as db:
+        await db.execute(
+            delete(IdempotencyKey).where(_pk(user_id, scope, key), IdempotencyKey.response.is_(None))
+        )
+        await db.commit()
+
+
+async def run_idempotent(
+    key: Optional[str],
+    *,
+    user_id: int,
+    scope: str,
+    body: Any,
+    response: Response,
+    handler: Callable[[], Awaitable[Any]],
+) -> Any:
+    """
+    key가 없으면 handler를 그냥 실행. 있으면 같은 (user, scope, key)에 대해 handler가 한 번만 실행되도록 한다.
+    재생된 응답에는 Idempotent-Replayed: true 헤더를 붙인다.
+    """
+    if not key:
+        return await handler()
+    if len(key) > MAX_KEY_LEN:
+        raise HTTPException(400, f"Idempotency-Key는 {MAX_KEY_LEN}자 이하여야 합니다.")
+
+    req_hash = request_hash(body)
+    while not await _acquire(user_id, scope, key, req_hash):
+        stored = await _wait_for_response(user_id, scope, key, req_hash)
+        if stored is not None:
+            response.headers[REPLAY_HEADER] = "true"
+            return stored
+        # 먼저 실행하던 요청이 실패했거나 버려짐 → 다시 실행권을 시도
+
+    try:
+        result = await handler()
+    except BaseException:
+        # 실패(예외/취소)는 저장하지 않는다 → 같은 키로 재시도하면 다시 실행
+        await asyncio.shield(_release(user_id, scope, key))
+        raise
+    await _store(user_id, scope, key, jsonable_encoder(result))
+    return result
+
+
+async def purge_expired() -> int:
+    async with async_session_maker() as db:
+        res = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < func.now()))
+        await db.commit()
+        return res.rowcount or 0
+
+
+async def run_cleanup() -> None:
+    while True:
+        await asyncio.sleep(CLEANUP_EVERY_S)
+        try:
+            purged = await purge_expired()
+            if purged:
+                print(f"[idempotency] 🧹 만료된 Idempotency-Key {purged}건 삭제")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[idempotency] ⚠️ 정리 중 예외: {e}")
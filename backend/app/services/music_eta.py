@@ -0,0 +1,172 @@
+# app/services/music_eta.py
+"""
+음악 생성 완료 예상 시각(estimated_ready_at) 추정.
+
+  ETA = now + (앞에 밀린 작업량 / 동시 처리 슬롯) + 이 트랙의 예상 처리 시간
+
+- 처리 시간 모델: 최근 완료된 트랙(finished_at - started_at)을 길이(duration_sec) 버킷별로
+  모아 중앙값을 쓴다. MODEL_REFRESH_S 마다 다시 읽고, 표본이 없는 버킷은 기본 추정식을 쓴다.
+- 큐 깊이: Kafka lag 대신 DB의 QUEUED/PROCESSING 트랙으로 계산한다 (워커가 선점하기 전까지
+  QUEUED 로 남으므로 같은 값이고, API 프로세스에서 consumer group offset을 조회하지 않아도 된다).
+  같은 레인이나 더 높은 우선순위 레인에서 먼저 들어온 트랙만 "앞"으로 센다.
+- 스냅샷은 QUEUE_REFRESH_S 동안 캐시해 상태 폴링마다 큐를 다시 읽지 않는다.
+  ETA도 스냅샷 시각 기준이라 갱신 사이에는 같은 값을 돌려준다.
+"""
+from __future__ import annotations
+import os
+import time
+import asyncio
+import statistics
+import datetime as dt
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Track
+from app.services.music_lanes import LANES, DEFAULT_LANE
+
+# 전체 워커의 동시 생성 슬롯 수 (워커 수 × MUSIC_WORKER_CONCURRENCY)
+WORKER_SLOTS = max(int(os.getenv("MUSIC_ETA_WORKER_SLOTS", os.getenv("MUSIC_WORKER_CONCURRENCY", "4"))), 1)
+MODEL_WINDOW_H = float(os.getenv("MUSIC_ETA_WINDOW_H", "24"))
+MODEL_SAMPLES = int(os.getenv("MUSIC_ETA_SAMPLES", "500"))
+MODEL_REFRESH_S = 60.0
+QUEUE_REFRESH_S = 2.0
+MAX_QUEUE_ROWS = 5000
+# 표본이 없을 때: 고정 오버헤드 + 곡 길이 1초당 처리 시간
+DEFAULT_BASE_S = float(os.getenv("MUSIC_ETA_DEFAULT_BASE_S", "20"))
+DEFAULT_PER_AUDIO_S = float(os.getenv("MUSIC_ETA_DEFAULT_PER_AUDIO_S", "0.5"))
+# ETag가 매 폴링마다 바뀌지 않도록 ETA를 이 단위(초)로 올림
+ROUND_S = 5
+
+# 길이 버킷 상한(초). 마지막은 그 이상 전부
+BUCKETS_S = (30, 60, 120, 180, 240)
+
+
+def bucket_of(duration_sec: Optional[int]) -> int:
+    d = duration_sec or 0
+    for upper in BUCKETS_S:
+        if d <= upper:
+            return upper
+    return BUCKETS_S[-1] + 1
+
+
+def _default_service_s(duration_sec: Optional[int]) -> float:
+    return DEFAULT_BASE_S + DEFAULT_PER_AUDIO_S * bucket_of(duration_sec)
+
+
+def _lane_rank(lane: Optional[str]) -> int:
+    return LANES.index(lane) if lane in LANES else LANES.index(DEFAULT_LANE)
+
+
+@dataclass
+class _QueueSnapshot:
+    # QUEUED: (track_id, duration_sec, lane 순위)
+    queued: List[tuple] = field(default_factory=list)
+    # PROCESSING: (track_id, duration_sec, 진행 초)
+    processing: List[tuple] = field(default_factory=list)
+    taken_at: float = 0.0
+    # 스냅샷 시점의 wall clock. ETA를 이 시각 기준으로 계산해 다음 갱신 전까지 결과가 바뀌지 않게 한다
+    taken_wall: float = 0.0
+
+
+class EtaEstimator:
+    def __init__(self):
+        self._service_s: Dict[int, float] = {}
+        self._model_at = 0.0
+        self._queue = _QueueSnapshot()
+        self._lock = asyncio.Lock()
+
+    def service_s(self, duration_sec: Optional[int]) -> float:
+        return self._service_s.get(bucket_of(duration_sec)) or _default_service_s(duration_sec)
+
+    async def _refresh_model(self, db: AsyncSession) -> None:
+        since = func.now() - dt.timedelta(hours=MODEL_WINDOW_H)
+        rows = (await db.execute(
+            select(Track.duration_sec, func.extract("epoch", Track.finished_at - Track.started_at))
+            .where(
+                Track.status == "READY",
+                Track.started_at.is_not(None),
+                Track.finished_at >= since,
+            )
+            .order_by(Track.finished_at.desc())
+            .limit(MODEL_SAMPLES)
+        )).all()
+        samples: Dict[int, List[float]] = defaultdict(list)
+        for duration_sec, seconds in rows:
+            if seconds is not None and seconds > 0:
+                samples[bucket_of(duration_sec)].append(float(seconds))
+        self._service_s = {b: statistics.median(v) for b, v in samples.items()}
+        self._model_at = time.monotonic()
+
+    async def _refresh_queue(self, db: AsyncSession) -> None:
+        queued = (await db.execute(
+            select(Track.id, Track.duration_sec, Track.request_payload["lane"].astext)
+            .where(Track.status == "QUEUED")
+            .order_by(Track.id)
+            .limit(MAX_QUEUE_ROWS)
+        )).all()
+        processing = (await db.execute(
+            select(Track.id, Track.duration_sec, func.extract("epoch", func.now() - Track.started_at))
+            .where(Track.status == "PROCESSING")
+        )).all()
+        self._queue = _QueueSnapshot(
+            queued=[(r[0], r[1], _lane_rank(r[2])) for r in queued],
+            processing=[(r[0], r[1], float(r[2] or 0)) for r in processing],
+            taken_at=time.monotonic(),
+            taken_wall=time.time(),
+        )
+
+    async def _ensure_fresh(self, db: AsyncSession) -> None:
+        now = time.monotonic()
+        if now - self._model_at < MODEL_REFRESH_S and now - self._queue.taken_at < QUEUE_REFRESH_S:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            if now - self._model_at >= MODEL_REFRESH_S:
+                await self._refresh_model(db)
+            if now - self._queue.taken_at >= QUEUE_REFRESH_S:
+                await self._refresh_queue(db)
+
+    def _estimate_s(self, track_id: int, status: str, duration_sec: Optional[int], lane: Optional[str]) -> float:
+        own = self.service_s(duration_sec)
+        if status == "PROCESSING":
+            elapsed = next((e for tid, _, e in self._queue.processing if tid == track_id), 0.0)
+            # 예상보다 오래 걸리는 중이면 남은 시간을 0이 아닌 최소값으로
+            return max(own - elapsed, ROUND_S)
+
+        rank = _lane_rank(lane)
+        backlog = sum(
+            max(self.service_s(d) - elapsed, 0.0)
+            for tid, d, elapsed in self._queue.processing
+            if tid != track_id
+        )
+        backlog += sum(
+            self.service_s(d)
+            for tid, d, r in self._queue.queued
+            if tid < track_id and r <= rank
+        )
+        return backlog / WORKER_SLOTS + own
+
+    async def estimate(self, db: AsyncSession, tracks: Iterable[dict]) -> Dict[int, dt.datetime]:
+        """
+        tracks: {"id", "status", "duration_sec", "lane"} 목록.
+        QUEUED/PROCESSING 트랙에 대해서만 {track_id: estimated_ready_at} 을 돌려준다.
+        """
+        pending = [t for t in tracks if t["status"] in ("QUEUED", "PROCESSING")]
+        if not pending:
+            return {}
+        await self._ensure_fresh(db)
+        # 진행 초(elapsed)가 스냅샷 시점 값이므로 기준 시각도 스냅샷 시각 (폴링마다 흔들리지 않음)
+        base = self._queue.taken_wall
+        out: Dict[int, dt.datetime] = {}
+        for t in pending:
+            ready = base + self._estimate_s(t["id"], t["status"], t.get("duration_sec"), t.get("lane"))
+            ready = (int(ready) // ROUND_S + 1) * ROUND_S
+            out[t["id"]] = dt.datetime.fromtimestamp(ready, tz=dt.timezone.utc)
+        return out
+
+
+estimator = EtaEstimator()
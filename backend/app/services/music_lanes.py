@@ -0,0 +1,45 @@
+# app/services/music_lanes.py
+"""
+음악 생성 요청 우선순위 레인.
+
+  priority    : 상담사가 처방한 세션(initiator_type == "therapist")
+  interactive : 짧은 클립 (music_length_ms <= MUSIC_SHORT_CLIP_MS)
+  bulk        : 그 외 (긴 렌더링)
+
+레인마다 토픽을 분리해 Kafka 파티션 안에서 긴 작업 뒤에 막히지 않게 하고,
+워커는 레인별 가중치로 스케줄링한다 (app/workers/scheduler.py).
+bulk 레인은 기존 토픽(music.gen.requests)을 그대로 써서 이전 메시지와 호환된다.
+"""
+from __future__ import annotations
+import os
+from typing import Optional
+
+TOPIC_REQ = os.getenv("KAFKA_TOPIC_REQUESTS", "music.gen.requests")
+SHORT_CLIP_MS = int(os.getenv("MUSIC_SHORT_CLIP_MS", "60000"))
+
+LANES = ("priority", "interactive", "bulk")
+DEFAULT_LANE = "bulk"
+
+
+def lane_for(initiator_type: Optional[str], music_length_ms: int) -> str:
+    if initiator_type == "therapist":
+        return "priority"
+    if music_length_ms <= SHORT_CLIP_MS:
+        return "interactive"
+    return "bulk"
+
+
+def lane_topic(lane: Optional[str]) -> str:
+    if lane not in LANES or lane == DEFAULT_LANE:
+        return TOPIC_REQ
+    return f"{TOPIC_REQ}.{lane}"
+
+
+LANE_TOPICS = {lane: lane_topic(lane) for lane in LANES}
+
+
+def lane_of_topic(topic: str) -> Optional[str]:
+    for lane, t in LANE_TOPICS.items():
+        if t == topic:
+            return lane
+    return None
@@ -0,0 +1,404 @@
+# app/services/music_providers.py
+"""
+음악 생성 provider 추상화 + 라우터 (hedging / fallback).
+
+- MusicProvider: generate(req, file_path) → ProviderCall (바이트 수 + 단계별 시간).
+  일시 장애는 RetryableGenerationError, 재시도해도 같은 실패는 GenerationFailedError.
+- ElevenLabsProvider: 공유 rate limiter(provider_limiter) 안에서 스트리밍 호출.
+  req.live_path가 있으면 받는 대로 .part에 이어 쓴다 (API가 생성 중 재생에 사용).
+  ELEVEN_MUSIC_STREAM을 지정한 경우에만 그 스트리밍 생성 엔드포인트로 바꿔 렌더링이 끝나기 전부터
+  MP3 프레임을 받는다 (opt-in, 기본은 기존 create 엔드포인트).
+- MockProvider: 네트워크 없이 지연/실패율을 흉내 내는 로컬 provider (오프라인 라우팅 테스트용).
+- ProviderRouter: MUSIC_PROVIDERS 순서대로 primary/secondary.
+    * primary가 자기 최근 지연의 p(MUSIC_HEDGE_PERCENTILE)를 넘기면 secondary에 hedge 요청
+      (hedge는 live 링크 없이 돌리고, primary가 이미 live 재생 중이면 hedge 하지 않거나 취소한다
+       → 생성 중 들은 오디오와 저장되는 트랙이 항상 같은 렌더링)
+    * primary가 실패하면 secondary로 fallback (MUSIC_PROVIDER_FALLBACK)
+    * 먼저 성공한 결과를 채택하고 나머지는 취소 (.part 임시 파일은 audio_store가 정리)
+
+워커(music_worker)와 동기 경로(elevenlabs_client.compose_and_save)가 모두 get_router()를 쓴다.
+"""
+from __future__ import annotations
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from app import metrics
+from app.services import provider_limiter
+from app.services.provider_http import eleven_client
+from app.services.generation_cache import provider_extra
+from app.services.audio_store import (
+    CHUNK_SIZE, AudioValidationError, save_response_audio, read_error_preview, write_stream_atomic,
+)
+
+PROVIDER_ORDER = [
+    x.strip() for x in os.getenv("MUSIC_PROVIDERS", "elevenlabs").split(",") if x.strip()
+]
+# 0이면 hedging 끔. 통계가 MIN_SAMPLES 미만인 동안에도 hedge 하지 않는다.
+HEDGE_PERCENTILE = float(os.getenv("MUSIC_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("MUSIC_HEDGE_MIN_SAMPLES", "20"))
+FALLBACK_ENABLED = os.getenv("MUSIC_PROVIDER_FALLBACK", "true").lower() == "true"
+STATS_WINDOW = 200
+# hedge 중 primary의 live 링크(생성 중 재생) 시작 여부를 확인하는 간격
+LIVE_CHECK_S = 0.5
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# provider 전체가 과부하라는 신호 → 다른 워커들도 Retry-After 동안 멈춘다
+THROTTLE_STATUS = {429, 503}
+
+
+class GenerationFailedError(Exception):
+    """재시도해도 결과가 같을 실패 (provider 4xx, 비정상 오디오) — 바로 FAILED."""
+    pass
+
+
+class RetryableGenerationError(Exception):
+    """provider 일시 장애 (429/5xx 등) — FAILED 대신 재시도 토픽으로 보낸다."""
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _clean(s: str, limit: int = 500) -> str:
+    """Postgres TEXT에 안전하게 넣을 수 있도록 NUL 제거 + 길이 제한."""
+    return s.replace("\x00", "")[:limit]
+
+
+def _retry_after_seconds(resp: httpx.Response) -> float | None:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
+
+
+@dataclass
+class GenerationRequest:
+    prompt: str
+    music_length_ms: int
+    force_instrumental: bool = False
+    extra: Dict[str, Any] = field(default_factory=dict)
+    live_path: Optional[str] = None   # 생성 중 부분 오디오를 노출할 링크 (audio_store.live_path)
+
+
+@dataclass
+class ProviderCall:
+    size: int
+    wait_s: float = 0.0    # 공유 rate limiter 대기
+    ttfb_s: float = 0.0    # 요청 전송 ~ 응답 헤더 (provider 생성 시간)
+    download_s: float = 0.0  # 바디 수신 (디스크 시간 제외)
+    write_s: float = 0.0   # 디스크 쓰기/fsync
+    first_audio_s: Optional[float] = None  # 요청 전송 ~ 첫 오디오 청크 저장
+
+
+@dataclass
+class GenerationResult:
+    provider: str
+    file_name: str
+    file_path: str
+    size: int
+    wait_s: float = 0.0
+    provider_s: float = 0.0
+    download_s: float = 0.0   # 바디 수신 (디스크 시간 제외)
+    write_s: float = 0.0
+    first_audio_s: Optional[float] = None
+
+
+class MusicProvider:
+    name = "base"
+    label = "base"   # Track.provider에 저장되는 표시 이름
+
+    def available(self) -> bool:
+        return True
+
+    async def generate(self, req: GenerationRequest, file_path: str) -> ProviderCall:
+        raise NotImplementedError
+
+
+class ElevenLabsProvider(MusicProvider):
+    name = "elevenlabs"
+    label = "ElevenLabs"
+
+    def __init__(self):
+        self.api_key = os.getenv("ELEVEN_API_KEY", "")
+        self.create_path = os.getenv("ELEVEN_MUSIC_CREATE", "/v1/music/generate")  # /v1/music/compose 계열
+        # 예: /v1/music/stream. 지정하지 않으면(기본) 항상 create_path로 받는다
+        self.stream_path = os.getenv("ELEVEN_MUSIC_STREAM", "")
+
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    async def generate(self, req: GenerationRequest, file_path: str) -> ProviderCall:
+        headers = {
+            "xi-api-key": self.api_key,
+            "Content-Type": "application/json",
+        }
+        # 공식 문서 기준: prompt + music_length_ms
+        body: Dict[str, Any] = {
+            "prompt": req.prompt,
+            "music_length_ms": req.music_length_ms,
+        }
+        # 보수적으로 instrumental 옵션 힌트
+        if req.force_instrumental:
+            body["instrumental"] = True
+        # extra에 추가 파라미터가 있다면 body에 병합 (캐시 제어 키는 제외)
+        body.update(provider_extra(req.extra))
+
+        # 모든 워커 레플리카가 공유하는 rate/동시성 한도 안에서만 호출
+        started = time.perf_counter()
+        try:
+            async with provider_limiter.acquire(self.name):
+                call = await self._call(body, headers, file_path, req.live_path)
+        except provider_limiter.ProviderBusyError as e:
+            raise RetryableGenerationError(str(e), e.retry_after) from e
+        call.wait_s = max(time.perf_counter() - started - call.ttfb_s - call.download_s - call.write_s, 0.0)
+        return call
+
+    async def _call(self, body: dict, headers: dict, file_path: str, live_path: Optional[str]) -> ProviderCall:
+        # 프로세스 공용 커넥션 풀 재사용 (keep-alive / HTTP2)
+        client = eleven_client()
+        path = self.stream_path if live_path and self.stream_path else self.create_path
+        sent = time.perf_counter()
+        async with client.stream("POST", path, json=body, headers=headers) as resp:
+            ttfb_s = time.perf_counter() - sent
+            if resp.is_error:
+                # 응답 바디는 바이너리일 수도 있으니 조심해서 preview만
+                preview = _clean(await read_error_preview(resp))
+                err_msg = _clean(f"create_http_error {resp.status_code}: {preview}")
+                print(f"[music_providers] ❌ ElevenLabs HTTP 에러: {err_msg}")
+                if resp.status_code in RETRYABLE_STATUS:
+                    retry_after = _retry_after_seconds(resp)
+                    # Retry-After는 재시도 토픽 지연이 아니라 공유 limiter로 지킨다 (music_worker 참고)
+                    if resp.status_code in THROTTLE_STATUS or retry_after is not None:
+                        await provider_limiter.report_throttled(self.name, retry_after)
+                    raise RetryableGenerationError(err_msg, retry_after)
+                raise GenerationFailedError(err_msg)
+
+            try:
+                written = await save_response_audio(resp, file_path, live_path)
+            except AudioValidationError as ve:
+                raise GenerationFailedError(_clean(str(ve))) from ve
+        total_s = time.perf_counter() - sent
+        call = ProviderCall(written.size, ttfb_s=ttfb_s, write_s=written.write_s)
+        call.download_s = max(total_s - ttfb_s - written.write_s, 0.0)
+        if written.first_chunk_at is not None:
+            call.first_audio_s = written.first_chunk_at - sent
+        return call
+
+
+class MockProvider(MusicProvider):
+    """네트워크 없이 동작하는 가짜 provider. 지연/실패율은 env로 조절한다."""
+    name = "mock"
+    label = "Mock"
+
+    def __init__(self):
+        self.latency_s = float(os.getenv("MOCK_PROVIDER_LATENCY_S", "2"))
+        self.jitter_s = float(os.getenv("MOCK_PROVIDER_JITTER_S", "1"))
+        self.fail_rate = float(os.getenv("MOCK_PROVIDER_FAIL_RATE", "0"))
+        self.audio_bytes = int(os.getenv("MOCK_PROVIDER_BYTES", str(256 * 1024)))
+
+    async def generate(self, req: GenerationRequest, file_path: str) -> ProviderCall:
+        latency = self.latency_s + random.uniform(0, self.jitter_s)
+        await asyncio.sleep(latency)
+        if random.random() < self.fail_rate:
+            raise RetryableGenerationError("mock_provider_error 503: simulated failure")
+        written = await write_stream_atomic(self._chunks(), file_path, req.live_path)
+        return ProviderCall(written.size, ttfb_s=latency, write_s=written.write_s, first_audio_s=latency)
+
+    async def _chunks(self) -> AsyncIterator[bytes]:
+        # ID3 헤더로 시작하는 더미 mp3 바디
+        remaining = self.audio_bytes
+        yield b"ID3\x04\x00\x00\x00\x00\x00\x00"
+        while remaining > 0:
+            n = min(CHUNK_SIZE, remaining)
+            remaining -= n
+            yield b"\x00" * n
+
+
+PROVIDERS = {
+    ElevenLabsProvider.name: ElevenLabsProvider,
+    MockProvider.name: MockProvider,
+}
+
+
+class ProviderStats:
+    """provider별 최근 성공 지연(초)과 성공/실패 횟수 (프로세스 로컬)."""
+
+    def __init__(self):
+        self.latencies: deque = deque(maxlen=STATS_WINDOW)
+        self.ok = 0
+        self.errors = 0
+
+    def record(self, latency_s: float, ok: bool) -> None:
+        if ok:
+            self.ok += 1
+            self.latencies.append(latency_s)
+        else:
+            self.errors += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        idx = min(int(len(ordered) * p / 100.0), len(ordered) - 1)
+        return ordered[idx]
+
+
+class ProviderRouter:
+    def __init__(self, providers: List[MusicProvider]):
+        self.providers = providers
+        self.stats: Dict[str, ProviderStats] = {p.name: ProviderStats() for p in providers}
+
+    def _hedge_delay(self, provider: MusicProvider) -> Optional[float]:
+        if HEDGE_PERCENTILE <= 0:
+            return None
+        return self.stats[provider.name].percentile(HEDGE_PERCENTILE)
+
+    async def _timed(self, provider: MusicProvider, req: GenerationRequest, save_dir: str, file_stem: str):
+        file_name = f"{file_stem}_{provider.name}.mp3"
+        file_path = os.path.join(save_dir, file_name)
+        started = time.perf_counter()
+        try:
+            call = await provider.generate(req, file_path)
+        except asyncio.CancelledError:
+            # hedge에서 진 요청 — 통계에 넣지 않는다
+            raise
+        except Exception:
+            elapsed = time.perf_counter() - started
+            self.stats[provider.name].record(elapsed, ok=False)
+            metrics.PROVIDER_LATENCY.labels(provider=provider.name, outcome="error").observe(elapsed)
+            raise
+        elapsed = time.perf_counter() - started
+        self.stats[provider.name].record(elapsed, ok=True)
+        metrics.PROVIDER_LATENCY.labels(provider=provider.name, outcome="ok").observe(elapsed)
+        return GenerationResult(
+            provider.label, file_name, file_path, call.size,
+            wait_s=call.wait_s,
+            provider_s=call.ttfb_s,
+            download_s=call.download_s,
+            write_s=call.write_s,
+            first_audio_s=call.first_audio_s,
+        )
+
+    async def generate(self, req: GenerationRequest, save_dir: str, file_stem: str) -> GenerationResult:
+        """먼저 성공한 provider의 결과를 돌려준다. 모두 실패하면 가장 의미 있는 예외를 다시 던진다."""
+        candidates = [p for p in self.providers if p.available()]
+        if not candidates:
+            names = ", ".join(p.name for p in self.providers) or "-"
+            raise GenerationFailedError(f"no music provider available (configured: {names}); check API keys")
+
+        loop = asyncio.get_running_loop()
+        running: Dict[asyncio.Task, MusicProvider] = {}
+        hedges: set = set()
+        errors: List[BaseException] = []
+        hedge_at: Optional[float] = None
+
+        def launch(provider: MusicProvider, hedge: bool = False) -> None:
+            nonlocal hedge_at
+            # hedge는 live 링크를 잡지 않는다 → 청취자는 항상 primary(또는 fallback)의 오디오를 듣는다
+            attempt_req = replace(req, live_path=None) if hedge else req
+            task = asyncio.create_task(self._timed(provider, attempt_req, save_dir, file_stem))
+            running[task] = provider
+            if hedge:
+                hedges.add(task)
+            delay = self._hedge_delay(provider) if candidates else None
+            hedge_at = loop.time() + delay if delay is not None else None
+
+        def live_started() -> bool:
+            return bool(req.live_path) and os.path.lexists(req.live_path)
+
+        launch(candidates.pop(0))
+        try:
+            while running:
+                timeout = max(hedge_at - loop.time(), 0.0) if hedge_at is not None else None
+                if hedges and req.live_path:
+                    # hedge 중 primary가 live 재생을 시작하는지 지켜본다
+                    timeout = LIVE_CHECK_S if timeout is None else min(timeout, LIVE_CHECK_S)
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if hedges and live_started():
+                        # 청취자가 이미 primary 오디오를 듣는 중 → hedge가 이기면 저장본과 달라지므로 hedge 취소
+                        for task in hedges:
+                            running.pop(task, None)
+                            task.cancel()
+                        await asyncio.gather(*hedges, return_exceptions=True)
+                        print("[music_providers] 🎧 primary가 live 재생 중 → hedge 취소")
+                        hedges.clear()
+                        continue
+                    if hedge_at is None or loop.time() < hedge_at:
+                        continue
+                    if live_started():
+                        # live 재생이 시작된 뒤에는 hedge 하지 않는다
+                        hedge_at = None
+                        continue
+                    # 지연 꼬리 → 다음 provider에 동시 요청, 먼저 끝나는 쪽 채택
+                    slow = next(iter(running.values())).name
+                    hedge = candidates.pop(0)
+                    print(f"[music_providers] 🏁 {slow} 지연 → {hedge.name} hedge 요청")
+                    metrics.PROVIDER_HEDGES.labels(provider=hedge.name).inc()
+                    launch(hedge, hedge=True)
+                    continue
+
+                winner: Optional[GenerationResult] = None
+                for task in done:
+                    provider = running.pop(task)
+                    hedges.discard(task)
+                    if task.exception() is not None:
+                        print(f"[music_providers] ⚠️ {provider.name} 실패: {task.exception()}")
+                        errors.append(task.exception())
+                    elif winner is None:
+                        winner = task.result()
+                    else:
+                        # 동시에 둘 다 끝남 → 하나만 쓰고 나머지 파일은 정리
+                        _discard(task.result().file_path)
+                if winner is not None:
+                    return winner
+
+                if not running and candidates and FALLBACK_ENABLED:
+                    fallback = candidates.pop(0)
+                    print(f"[music_providers] ↪️ {fallback.name} 로 fallback")
+                    metrics.PROVIDER_FALLBACKS.labels(provider=fallback.name).inc()
+                    launch(fallback)
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+        raise _most_relevant(errors)
+
+
+def _discard(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _most_relevant(errors: List[BaseException]) -> BaseException:
+    # 하나라도 일시 장애면 재시도할 가치가 있다
+    for e in errors:
+        if isinstance(e, (RetryableGenerationError, httpx.TransportError)):
+            return e
+    return errors[0]
+
+
+_router: Optional[ProviderRouter] = None
+
+
+def get_router() -> ProviderRouter:
+    global _router
+    if _router is None:
+        unknown = [n for n in PROVIDER_ORDER if n not in PROVIDERS]
+        if unknown:
+            raise RuntimeError(f"unknown MUSIC_PROVIDERS entries: {unknown}")
+        _router = ProviderRouter([PROVIDERS[n]() for n in PROVIDER_ORDER])
+    return _router
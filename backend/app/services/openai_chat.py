@@ -1,12 +1,13 @@
 from __future__ import annotations
-import os, asyncio, json
-from typing import List, Dict, Any
-from openai import OpenAI, APIConnectionError, RateLimitError, OpenAIError
+import os, json
+from typing import AsyncIterator, List, Dict, Any, Optional
+from openai import APIConnectionError, RateLimitError, OpenAIError
 from app.config import THERAPEUTIC_SYSTEM_PROMPT
+from app.services.openai_pool import chat_completion, chat_completion_stream
+from app.services.chat_context import CONTEXT_TOKENS, build_messages, recent_within_budget
 
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 TIMEOUT = float(os.getenv("OPENAI_TIMEOUT_S", "15")) # 💡 [추가] 타임아웃
-_client = OpenAI()
 
 ANALYSIS_SYSTEM_PROMPT = (
     "당신은 심리 치료 대화 분석 전문가입니다. 환자와 어시스턴트 간의 대화 내용을 분석하여 "
@@ -23,56 +24,84 @@ ANALYSIS_GUIDELINE = {
     "quote_like_phrase": "대화에서 중요한 의미를 가진 사용자의 표현을 안전하게 재구성한 한국어 문장 1개 (민감한 개인정보는 제거)",
     "confidence": "0.0 ~ 1.0 사이의 float"
 }
-def _messages_for_openai(system_prompt: str, history: List[Dict[str,str]]):
-    messages = [{"role":"system", "content": system_prompt}]
-    MAX_TURNS = 12 
-    truncated = history[-(MAX_TURNS*2):]
-    messages.extend(truncated)
-    return messages
+def _messages_for_openai(system_prompt: str, history: List[Dict[str,Any]], summary: Optional[str] = None):
+    # 💡 [수정] 고정 24개 대신 토큰 예산 안의 최근 대화 + 이전 대화 요약
+    return build_messages(system_prompt, history, summary)
 
 # 💡 1. [핵심 수정] chat_complete (AI 상담사) -> 최신 SDK V1.x로 수정
-async def chat_complete(history: List[Dict[str,str]], *, system_prompt: str = THERAPEUTIC_SYSTEM_PROMPT) -> str:
-    def _call():
-        # 💡 [수정] responses.create -> chat.completions.create
-        return _client.chat.completions.create(
-            model=MODEL,
-            messages=_messages_for_openai(system_prompt, history), # 👈 [수정] input -> messages
-            timeout=TIMEOUT
-        )
-    resp = await asyncio.to_thread(_call)
+async def chat_complete(
+    history: List[Dict[str,Any]], *, system_prompt: str = THERAPEUTIC_SYSTEM_PROMPT, summary: Optional[str] = None
+) -> str:
+    # 💡 [수정] 공유 AsyncOpenAI + 동시성 상한 (스레드 풀 대기 없음)
+    resp = await chat_completion(
+        "chat",
+        model=MODEL,
+        messages=_messages_for_openai(system_prompt, history, summary), # 👈 [수정] input -> messages
+        timeout=TIMEOUT
+    )
     # 💡 [수정] output_text -> choices[0].message.content
     return resp.choices[0].message.content.strip()
 
-async def analyze_dialog_for_mood(history: List[Dict[str,str]]) -> Dict[str, Any]:
+async def chat_complete_stream(
+    history: List[Dict[str,Any]], *, system_prompt: str = THERAPEUTIC_SYSTEM_PROMPT, summary: Optional[str] = None
+) -> AsyncIterator[str]:
+    """chat_complete의 스트리밍 버전: 생성되는 대로 텍스트 조각을 내보낸다."""
+    async for chunk in chat_completion_stream(
+        "chat",
+        model=MODEL,
+        messages=_messages_for_openai(system_prompt, history, summary),
+        timeout=TIMEOUT
+    ):
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+ANALYSIS_FALLBACK = {"mood": "calming", "keywords": [], "target": "n/a", "music_constraints": None, "confidence": 0.0}
+
+
+async def request_dialog_analysis(
+    history: List[Dict[str,Any]], summary: Optional[str] = None, previous: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
     """
-    (수정됨) 대화 기록을 기반으로 심리 상태를 분석하여 structured JSON(Dict)을 반환.
+    analyze_dialog_for_mood의 본체. 실패하면 기본값 대신 None (호출 측이 결과를 캐시할지 판단).
+    previous가 있으면 history는 그 분석 이후에 이어진 대화(증분)로 보고, 이전 결과를 갱신하게 한다.
     """
-    # 💡 [수정] history가 비어있어도(Intake 정보만 있어도) 분석 시도
-    # if not history:
-    #     return {"mood": "calming", "keywords": [], "target": "n/a", "confidence": 0.0}
-    dialog_text = "\n".join([f"[{m['role'].capitalize()}]: {m['content']}" for m in history])
-
-    user_prompt = (
-        f"다음 대화를 분석하고, 다음 JSON 스키마를 따르는 JSON 객체만 출력하세요.\n"
-        f"(대화 내용이 없다면 '사전 접수 내용'만이라도 분석하세요.)\n\n"
-        f"[분석 대상 대화 및 접수 내용]\n---\n{dialog_text}\n---\n\n"
-        f"[JSON 스키마 (필수)]\n{json.dumps(ANALYSIS_GUIDELINE, indent=2)}\n" # 👈 'constraints'가 포함된 새 스키마
-        f"※ 출력은 프롬프트 본문만. 따옴표/설명 금지. JSON만 출력해야 합니다."
+    dialog_text = "\n".join(
+        [f"[{m['role'].capitalize()}]: {m['content']}" for m in recent_within_budget(history, CONTEXT_TOKENS)]
     )
+    if summary:
+        dialog_text = f"[이전 대화 요약]: {summary}\n{dialog_text}"
+
+    if previous is not None:
+        user_prompt = (
+            f"아래는 이 대화의 앞부분을 분석한 기존 결과와, 그 뒤에 이어진 대화입니다. "
+            f"이어진 대화를 반영해 기존 결과를 갱신하고, 같은 JSON 스키마의 JSON 객체만 출력하세요. "
+            f"새 대화에서 바뀌지 않은 항목은 기존 값을 유지하세요.\n\n"
+            f"[기존 분석 결과]\n{json.dumps(previous, ensure_ascii=False)}\n\n"
+            f"[이어진 대화]\n---\n{dialog_text}\n---\n\n"
+            f"[JSON 스키마 (필수)]\n{json.dumps(ANALYSIS_GUIDELINE, indent=2)}\n"
+            f"※ JSON만 출력해야 합니다."
+        )
+    else:
+        user_prompt = (
+            f"다음 대화를 분석하고, 다음 JSON 스키마를 따르는 JSON 객체만 출력하세요.\n"
+            f"(대화 내용이 없다면 '사전 접수 내용'만이라도 분석하세요.)\n\n"
+            f"[분석 대상 대화 및 접수 내용]\n---\n{dialog_text}\n---\n\n"
+            f"[JSON 스키마 (필수)]\n{json.dumps(ANALYSIS_GUIDELINE, indent=2)}\n" # 👈 'constraints'가 포함된 새 스키마
+            f"※ 출력은 프롬프트 본문만. 따옴표/설명 금지. JSON만 출력해야 합니다."
+        )
     messages = [
         {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
         {"role": "user", "content": user_prompt}
     ]
 
     try:
-        def _call():
-            return _client.chat.completions.create(
-                model=MODEL,
-                messages=messages,
-                response_format={"type": "json_object"}, 
-                timeout=TIMEOUT
-            )
-        resp = await asyncio.to_thread(_call) 
+        resp = await chat_completion(
+            "analysis",
+            model=MODEL,
+            messages=messages,
+            response_format={"type": "json_object"}, 
+            timeout=TIMEOUT
+        )
         raw_json_text = resp.choices[0].message.content
         if not raw_json_text:
              raise json.JSONDecodeError("OpenAI returned empty content", "", 0)
@@ -87,7 +116,17 @@ async def analyze_dialog_for_mood(history: List[Dict[str,str]]) -> Dict[str, Any
         
     except (RateLimitError, APIConnectionError, OpenAIError) as e:
         print(f"OpenAI Analysis Error (falling back to default): {e}")
-        return {"mood": "calming", "keywords": [], "target": "n/a", "music_constraints": None, "confidence": 0.0}
+        return None
     except (json.JSONDecodeError, IndexError, AttributeError, TypeError) as e:
         print(f"OpenAI Response Parse Error (falling back to default): {e}")
-        return {"mood": "calming", "keywords": [], "target": "n/a", "music_constraints": None, "confidence": 0.0}
\ No newline at end of file
+        return None
+
+
+async def analyze_dialog_for_mood(history: List[Dict[str,Any]], summary: Optional[str] = None) -> Dict[str, Any]:
+    """
+    (수정됨) 대화 기록을 기반으로 심리 상태를 분석하여 structured JSON(Dict)을 반환.
+    summary가 있으면 그 앞부분 대화 대신 요약을 넣고, 원문은 토큰 예산 안의 최근 대화만 보낸다.
+    """
+    # 💡 [수정] history가 비어있어도(Intake 정보만 있어도) 분석 시도
+    analyzed = await request_dialog_analysis(history, summary)
+    return analyzed if analyzed is not None else dict(ANALYSIS_FALLBACK)
@@ -1,13 +1,12 @@
 from __future__ import annotations
-import os, asyncio, json
+import os, json
 from typing import List, Dict, Any
-from openai import OpenAI, APIConnectionError, RateLimitError, OpenAIError
+from openai import APIConnectionError, RateLimitError, OpenAIError
+from app.services.openai_pool import chat_completion  # 공유 AsyncOpenAI (OPENAI_API_KEY는 env로 자동 로딩)
 
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 TIMEOUT = float(os.getenv("OPENAI_TIMEOUT_S", "15"))
 
-_client = OpenAI()  # OPENAI_API_KEY는 env로 자동 로딩
-
 SYSTEM_BASE = (
     "당신은 상담 대화와 설문, 기본 가이드라인을 바탕으로 "
     "환자 맞춤 음악 프롬프트와 가사를 생성하는 AI입니다.\n"
@@ -172,14 +171,13 @@ async def generate_prompt_from_guideline(
     ]
 
     try:
-        def _call():
-            return _client.chat.completions.create(
-                model=MODEL,
-                messages=messages,
-                response_format={"type": "json_object"}, # 👈 JSON 모드 강제 (gpt-4o-mini 지원)
-                timeout=TIMEOUT
-            )
-        resp = await asyncio.to_thread(_call)
+        resp = await chat_completion(
+            "prompt",
+            model=MODEL,
+            messages=messages,
+            response_format={"type": "json_object"}, # 👈 JSON 모드 강제 (gpt-4o-mini 지원)
+            timeout=TIMEOUT
+        )
         raw_json_text = resp.choices[0].message.content
         if not raw_json_text:
              raise json.JSONDecodeError("OpenAI returned empty content", "", 0)
@@ -0,0 +1,71 @@
+# app/services/openai_pool.py
+"""
+OpenAI 호출 공용 진입점 (프로세스당 동시 호출 상한 + 메트릭).
+
+- 공유 AsyncOpenAI(provider_http.openai_client)로 호출해 기본 스레드 풀을 쓰지 않는다.
+- OPENAI_MAX_CONCURRENCY 세마포어로 동시 호출 수를 묶는다. 상한에 걸린 대기는
+  openai_wait_seconds, 진행 중 호출 수는 openai_in_flight로 보인다.
+- purpose 라벨: chat(상담 응답) / analysis(대화 분석) / prompt(음악 프롬프트 생성) / summary(대화 요약)
+- chat_completion_stream: 스트리밍 호출은 마지막 청크까지 슬롯을 잡고, 첫 토큰까지의
+  시간을 openai_first_token_seconds로 남긴다.
+"""
+from __future__ import annotations
+import os
+import time
+import asyncio
+from typing import Any, AsyncIterator
+
+from app import metrics
+from app.services.provider_http import openai_client
+
+MAX_CONCURRENCY = max(int(os.getenv("OPENAI_MAX_CONCURRENCY", "16")), 1)
+
+_slots = asyncio.Semaphore(MAX_CONCURRENCY)
+
+
+async def chat_completion(purpose: str, **kwargs: Any):
+    """chat.completions.create(**kwargs)를 동시성 상한 안에서 호출."""
+    queued = time.perf_counter()
+    async with _slots:
+        started = time.perf_counter()
+        metrics.OPENAI_WAIT_SECONDS.labels(purpose=purpose).observe(started - queued)
+        metrics.OPENAI_IN_FLIGHT.inc()
+        outcome = "error"
+        try:
+            resp = await openai_client().chat.completions.create(**kwargs)
+            outcome = "ok"
+            return resp
+        finally:
+            metrics.OPENAI_IN_FLIGHT.dec()
+            metrics.OPENAI_CALL_SECONDS.labels(purpose=purpose, outcome=outcome).observe(
+                time.perf_counter() - started
+            )
+
+
+async def chat_completion_stream(purpose: str, **kwargs: Any) -> AsyncIterator[Any]:
+    """chat.completions.create(stream=True, **kwargs)의 청크를 동시성 상한 안에서 흘려준다."""
+    queued = time.perf_counter()
+    async with _slots:
+        started = time.perf_counter()
+        metrics.OPENAI_WAIT_SECONDS.labels(purpose=purpose).observe(started - queued)
+        metrics.OPENAI_IN_FLIGHT.inc()
+        outcome = "error"
+        first = True
+        try:
+            stream = await openai_client().chat.completions.create(stream=True, **kwargs)
+            try:
+                async for chunk in stream:
+                    if first:
+                        first = False
+                        metrics.OPENAI_FIRST_TOKEN_SECONDS.labels(purpose=purpose).observe(
+                            time.perf_counter() - started
+                        )
+                    yield chunk
+            finally:
+                await stream.close()
+            outcome = "ok"
+        finally:
+            metrics.OPENAI_IN_FLIGHT.dec()
+            metrics.OPENAI_CALL_SECONDS.labels(purpose=purpose, outcome=outcome).observe(
+                time.perf_counter() - started
+            )
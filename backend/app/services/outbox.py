@@ -0,0 +1,39 @@
+# app/services/outbox.py
+"""
+Transactional outbox 헬퍼.
+
+API 요청 안에서는 Kafka에 직접 보내지 않고, 비즈니스 데이터(Track 등)와 같은
+트랜잭션으로 outbox_events에 한 줄을 쓴다. 커밋되면 outbox_relay가 발행한다.
+  → 요청 지연 = DB 커밋 1회, 커밋이 실패하면 메시지도 존재하지 않음.
+"""
+from __future__ import annotations
+import asyncio
+from typing import Any, Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import OutboxEvent
+
+# 같은 프로세스에서 도는 relay를 커밋 직후 바로 깨우기 위한 이벤트 (없으면 폴링 주기대로 발행)
+_wakeup = asyncio.Event()
+
+
+def enqueue(db: AsyncSession, topic: str, key: Optional[Any], payload: Dict[str, Any]) -> OutboxEvent:
+    """outbox에 메시지를 추가한다. 커밋은 호출하는 쪽 트랜잭션에서."""
+    event = OutboxEvent(topic=topic, key=None if key is None else str(key), payload=payload)
+    db.add(event)
+    return event
+
+
+def wake() -> None:
+    """커밋 후 호출: in-process relay가 폴링 대기 없이 바로 발행하도록 한다."""
+    _wakeup.set()
+
+
+async def wait_for_wakeup(timeout: float) -> None:
+    try:
+        await asyncio.wait_for(_wakeup.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        _wakeup.clear()
@@ -0,0 +1,107 @@
+# app/services/provider_http.py
+"""
+외부 provider(ElevenLabs, OpenAI) 호출용 프로세스 공용 비동기 클라이언트.
+
+요청마다 AsyncClient를 새로 만들면 매번 TCP+TLS 핸드셰이크가 발생하므로,
+프로세스당 하나의 커넥션 풀을 두고 keep-alive로 재사용한다.
+OpenAI는 AsyncOpenAI에 같은 방식의 httpx 풀을 물려 쓴다 (스레드 풀을 거치지 않음).
+FastAPI lifespan / music_worker 시작·종료 시 start/close를 호출한다.
+"""
+from __future__ import annotations
+import os
+import httpx
+from openai import AsyncOpenAI
+
+ELEVEN_BASE = os.getenv("ELEVEN_MUSIC_BASE", "https://api.elevenlabs.io")
+
+# 풀 설정 (워커 동시성보다 작으면 커넥션 대기가 생기므로 넉넉하게)
+MAX_CONNECTIONS = int(os.getenv("ELEVEN_HTTP_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE = int(os.getenv("ELEVEN_HTTP_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY_S = float(os.getenv("ELEVEN_HTTP_KEEPALIVE_EXPIRY_S", "60"))
+CONNECT_TIMEOUT_S = float(os.getenv("ELEVEN_HTTP_CONNECT_TIMEOUT_S", "10"))
+# 음악 생성은 응답까지 수 분이 걸릴 수 있으므로 read 타임아웃은 길게
+READ_TIMEOUT_S = float(os.getenv("ELEVEN_HTTP_READ_TIMEOUT_S", "300"))
+USE_HTTP2 = os.getenv("ELEVEN_HTTP2", "true").lower() == "true"
+
+# OpenAI 풀: 동시 호출 상한(OPENAI_MAX_CONCURRENCY)보다 약간 넉넉하게
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_HTTP_MAX_CONNECTIONS", "32"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_HTTP_MAX_KEEPALIVE", "16"))
+OPENAI_CONNECT_TIMEOUT_S = float(os.getenv("OPENAI_HTTP_CONNECT_TIMEOUT_S", "5"))
+OPENAI_TIMEOUT_S = float(os.getenv("OPENAI_TIMEOUT_S", "15"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+_eleven_client: httpx.AsyncClient | None = None
+_openai_client: AsyncOpenAI | None = None
+
+
+def _http2_available() -> bool:
+    """httpx[http2] (h2 패키지)가 설치되어 있을 때만 HTTP/2를 켠다."""
+    if not USE_HTTP2:
+        return False
+    try:
+        import h2  # type: ignore # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _build_eleven_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=ELEVEN_BASE,
+        http2=_http2_available(),
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY_S,
+        ),
+        timeout=httpx.Timeout(READ_TIMEOUT_S, connect=CONNECT_TIMEOUT_S),
+    )
+
+
+def _build_openai_client() -> AsyncOpenAI:
+    # OPENAI_API_KEY / OPENAI_BASE_URL은 SDK가 env에서 읽는다
+    return AsyncOpenAI(
+        timeout=OPENAI_TIMEOUT_S,
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=httpx.AsyncClient(
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                keepalive_expiry=KEEPALIVE_EXPIRY_S,
+            ),
+            timeout=httpx.Timeout(OPENAI_TIMEOUT_S, connect=OPENAI_CONNECT_TIMEOUT_S),
+        ),
+    )
+
+
+async def start_http_clients() -> None:
+    global _eleven_client
+    if _eleven_client is None or _eleven_client.is_closed:
+        _eleven_client = _build_eleven_client()
+
+
+async def close_http_clients() -> None:
+    global _eleven_client, _openai_client
+    if _eleven_client is not None:
+        await _eleven_client.aclose()
+        _eleven_client = None
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+
+
+def eleven_client() -> httpx.AsyncClient:
+    """공용 ElevenLabs 클라이언트. start 전에 호출되면(스크립트 등) 즉석에서 만든다."""
+    global _eleven_client
+    if _eleven_client is None or _eleven_client.is_closed:
+        _eleven_client = _build_eleven_client()
+    return _eleven_client
+
+
+def openai_client() -> AsyncOpenAI:
+    """공용 AsyncOpenAI. 첫 호출 때 만든다 (OpenAI를 쓰지 않는 워커에서는 만들지 않음)."""
+    global _openai_client
+    if _openai_client is None or _openai_client.is_closed():
+        _openai_client = _build_openai_client()
+    return _openai_client
@@ -0,0 +1,232 @@
+# app/services/provider_limiter.py
+"""
+외부 provider(ElevenLabs 등) 호출 한도를 모든 워커 레플리카가 공유하는 limiter.
+
+별도 서비스 없이 Postgres 두 테이블로 조정한다.
+- provider_rate_limits: token bucket (초당 rate, 최대 burst). 행 잠금(FOR UPDATE)으로 직렬화.
+- provider_slots: 동시 호출 슬롯 lease. 잡은 동안 heartbeat로 leased_until을 연장하고,
+  프로세스가 죽으면 만료 후 다른 워커가 가져간다.
+
+429/503 응답의 Retry-After는 report_throttled()로 기록 → blocked_until까지 모든 워커가 대기.
+레플리카를 늘려도 provider 실제 한도 이상으로는 호출하지 않는다.
+
+    async with provider_limiter.acquire("elevenlabs"):
+        ... provider 호출 ...
+"""
+from __future__ import annotations
+import os
+import uuid
+import random
+import socket
+import asyncio
+import datetime as dt
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from sqlalchemy import select, update, delete, func, or_, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db import async_session_maker
+from app.models import ProviderRateLimit, ProviderSlot
+
+SLOT_TTL_S = float(os.getenv("PROVIDER_SLOT_TTL_S", "60"))
+ACQUIRE_TIMEOUT_S = float(os.getenv("PROVIDER_ACQUIRE_TIMEOUT_S", "300"))
+# 슬롯이 모두 찼을 때 다시 확인하는 간격 (토큰 부족/차단은 정확한 대기 시간을 계산한다)
+SLOT_POLL_S = 1.0
+# 429인데 Retry-After가 없을 때 모든 워커를 멈출 시간
+DEFAULT_THROTTLE_S = float(os.getenv("PROVIDER_DEFAULT_THROTTLE_S", "10"))
+
+_HOLDER_PREFIX = f"{socket.gethostname()}:{os.getpid()}"
+
+
+@dataclass(frozen=True)
+class LimitConfig:
+    rate_per_s: float
+    burst: float
+    max_concurrency: int
+
+
+def _config_from_env(prefix: str, rate_per_min: str, burst: str, concurrency: str) -> LimitConfig:
+    return LimitConfig(
+        rate_per_s=float(os.getenv(f"{prefix}_RATE_PER_MIN", rate_per_min)) / 60.0,
+        burst=float(os.getenv(f"{prefix}_BURST", burst)),
+        max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", concurrency)),
+    )
+
+
+LIMITS: Dict[str, LimitConfig] = {
+    "elevenlabs": _config_from_env("ELEVEN", "30", "5", "4"),
+}
+
+
+class ProviderBusyError(Exception):
+    """ACQUIRE_TIMEOUT_S 안에 토큰/슬롯을 얻지 못함 — 호출하지 말고 나중에 재시도."""
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+_prepared: set[str] = set()
+
+
+async def _ensure_rows(provider: str, cfg: LimitConfig) -> None:
+    """bucket 행과 슬롯 행을 설정값에 맞춰 만든다 (프로세스당 provider별 1회)."""
+    if provider in _prepared:
+        return
+    async with async_session_maker() as db:
+        await db.execute(
+            pg_insert(ProviderRateLimit)
+            .values(provider=provider, tokens=cfg.burst)
+            .on_conflict_do_nothing(index_elements=["provider"])
+        )
+        await db.execute(
+            pg_insert(ProviderSlot)
+            .values([{"provider": provider, "slot": i} for i in range(cfg.max_concurrency)])
+            .on_conflict_do_nothing(index_elements=["provider", "slot"])
+        )
+        # 한도를 줄였으면 남는 슬롯 중 비어 있는 것만 정리 (사용 중인 것은 반납 후 다음 기동 때)
+        await db.execute(
+            delete(ProviderSlot).where(
+                ProviderSlot.provider == provider,
+                ProviderSlot.slot >= cfg.max_concurrency,
+                or_(ProviderSlot.holder.is_(None), ProviderSlot.leased_until < func.now()),
+            )
+        )
+        await db.commit()
+    _prepared.add(provider)
+
+
+async def _try_acquire(provider: str, cfg: LimitConfig, holder: str) -> Tuple[Optional[int], float]:
+    """토큰 1개 + 빈 슬롯 1개를 한 트랜잭션으로 잡는다. 실패하면 (None, 기다릴 초)."""
+    async with async_session_maker() as db:
+        bucket, now = (
+            await db.execute(
+                select(ProviderRateLimit, func.now())
+                .where(ProviderRateLimit.provider == provider)
+                .with_for_update()
+            )
+        ).one()
+
+        if bucket.blocked_until and bucket.blocked_until > now:
+            await db.rollback()
+            return None, (bucket.blocked_until - now).total_seconds()
+
+        elapsed = max((now - bucket.updated_at).total_seconds(), 0.0)
+        tokens = min(cfg.burst, bucket.tokens + elapsed * cfg.rate_per_s)
+        if tokens < 1.0:
+            await db.rollback()
+            return None, (1.0 - tokens) / cfg.rate_per_s
+
+        slot = (
+            await db.execute(
+                select(ProviderSlot.slot)
+                .where(
+                    ProviderSlot.provider == provider,
+                    ProviderSlot.slot < cfg.max_concurrency,
+                    or_(ProviderSlot.holder.is_(None), ProviderSlot.leased_until < now),
+                )
+                .order_by(ProviderSlot.slot)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+        ).scalar_one_or_none()
+        if slot is None:
+            await db.rollback()
+            return None, SLOT_POLL_S
+
+        bucket.tokens = tokens - 1.0
+        bucket.updated_at = now
+        await db.execute(
+            update(ProviderSlot)
+            .where(ProviderSlot.provider == provider, ProviderSlot.slot == slot)
+            .values(holder=holder, leased_until=now + dt.timedelta(seconds=SLOT_TTL_S))
+        )
+        await db.commit()
+        return slot, 0.0
+
+
+def _held(provider: str, slot: int, holder: str):
+    return and_(
+        ProviderSlot.provider == provider,
+        ProviderSlot.slot == slot,
+        ProviderSlot.holder == holder,
+    )
+
+
+async def _renew_slot(provider: str, slot: int, holder: str) -> None:
+    async with async_session_maker() as db:
+        await db.execute(
+            update(ProviderSlot)
+            .where(_held(provider, slot, holder))
+            .values(leased_until=func.now() + dt.timedelta(seconds=SLOT_TTL_S))
+        )
+        await db.commit()
+
+
+async def _release_slot(provider: str, slot: int, holder: str) -> None:
+    async with async_session_maker() as db:
+        await db.execute(
+            update(ProviderSlot)
+            .where(_held(provider, slot, holder))
+            .values(holder=None, leased_until=None)
+        )
+        await db.commit()
+
+
+@asynccontextmanager
+async def acquire(provider: str) -> AsyncIterator[int]:
+    """provider 호출 1건에 필요한 토큰과 동시 호출 슬롯을 잡는다. 슬롯 번호를 돌려준다."""
+    cfg = LIMITS[provider]
+    await _ensure_rows(provider, cfg)
+    holder = f"{_HOLDER_PREFIX}:{uuid.uuid4().hex[:8]}"
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + ACQUIRE_TIMEOUT_S
+
+    while True:
+        slot, wait = await _try_acquire(provider, cfg, holder)
+        if slot is not None:
+            break
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise ProviderBusyError(f"{provider} rate limit: no capacity within {ACQUIRE_TIMEOUT_S:.0f}s", wait)
+        # 여러 워커가 같은 순간에 몰리지 않도록 약간의 jitter
+        await asyncio.sleep(min(wait, remaining) + random.uniform(0, 0.2))
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(SLOT_TTL_S / 3)
+            try:
+                await _renew_slot(provider, slot, holder)
+            except Exception as e:
+                print(f"[provider_limiter] ⚠️ 슬롯 갱신 실패 ({provider}#{slot}): {e}")
+
+    hb = asyncio.create_task(heartbeat())
+    try:
+        yield slot
+    finally:
+        hb.cancel()
+        try:
+            # 취소 중에도 반납은 끝까지 (못 하면 TTL 만료로 회수된다)
+            await asyncio.shield(_release_slot(provider, slot, holder))
+        except Exception as e:
+            print(f"[provider_limiter] ⚠️ 슬롯 반납 실패 ({provider}#{slot}): {e}")
+
+
+async def report_throttled(provider: str, retry_after: float | None) -> None:
+    """provider가 429/503을 돌려주면 호출. 모든 워커가 Retry-After 동안 호출을 멈추고 토큰도 비운다."""
+    delay = retry_after if retry_after is not None else DEFAULT_THROTTLE_S
+    until = func.now() + dt.timedelta(seconds=delay)
+    async with async_session_maker() as db:
+        await db.execute(
+            update(ProviderRateLimit)
+            .where(ProviderRateLimit.provider == provider)
+            .values(
+                blocked_until=func.greatest(func.coalesce(ProviderRateLimit.blocked_until, until), until),
+                tokens=0.0,
+                updated_at=until,
+            )
+        )
+        await db.commit()
+    print(f"[provider_limiter] 🚦 {provider} 호출 일시 중단 {delay:.0f}s (Retry-After)")
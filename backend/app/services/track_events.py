@@ -0,0 +1,123 @@
+# app/services/track_events.py
+"""
+Track 상태 변경 push 채널 (Postgres LISTEN/NOTIFY).
+
+- 워커(또는 API)는 Track을 갱신하는 트랜잭션 안에서 notify_track_status()를 호출한다.
+  NOTIFY는 커밋될 때만 전달되므로 롤백된 상태가 새어나가지 않는다.
+- API 프로세스마다 TrackEventHub가 전용 asyncpg 커넥션 하나로 LISTEN 하고,
+  user_id별 구독 큐로 이벤트를 나눠준다 (/music/events SSE가 구독).
+- 워커는 add_listener()로 모든 이벤트를 받아 취소(CANCELLED)된 생성을 중단한다.
+"""
+from __future__ import annotations
+import os
+import json
+import asyncio
+from typing import Any, Callable, Dict, Optional
+
+import asyncpg  # type: ignore
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+CHANNEL = "track_status"
+QUEUE_SIZE = 100
+RECONNECT_DELAY_S = 3.0
+
+_NOTIFY_SQL = text(
+    """
+    SELECT pg_notify(:channel, json_build_object(
+        'track_id', t.id,
+        'session_id', t.session_id,
+        'user_id', s.created_by,
+        'status', t.status,
+        'track_url', t.track_url,
+        'error', t.error
+    )::text)
+    FROM tracks t JOIN sessions s ON s.id = t.session_id
+    WHERE t.id = :track_id
+    """
+)
+
+
+async def notify_track_status(db: AsyncSession, track_id: int) -> None:
+    """현재 트랜잭션에 상태 변경 알림을 추가한다 (커밋은 호출하는 쪽에서)."""
+    await db.execute(_NOTIFY_SQL, {"channel": CHANNEL, "track_id": track_id})
+
+
+def _listen_dsn() -> str:
+    # SQLAlchemy URL(postgresql+asyncpg://...) → asyncpg DSN
+    url = os.getenv("ASYNC_DATABASE_URL", "")
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+class TrackEventHub:
+    """LISTEN 커넥션 하나를 프로세스 내 여러 SSE 구독자에게 팬아웃."""
+
+    def __init__(self):
+        self._subscribers: Dict[int, set[asyncio.Queue]] = {}
+        self._listeners: list[Callable[[Dict[str, Any]], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, user_id: int, q: asyncio.Queue) -> None:
+        subs = self._subscribers.get(user_id)
+        if subs:
+            subs.discard(q)
+            if not subs:
+                del self._subscribers[user_id]
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """user_id와 상관없이 모든 이벤트를 받는 콜백 (이벤트 루프 안에서 동기 호출)."""
+        self._listeners.append(callback)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        for callback in self._listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"[track_events] ⚠️ 리스너 처리 중 예외: {e}")
+        for q in self._subscribers.get(event.get("user_id"), ()):
+            if q.full():
+                # 느린 클라이언트: 가장 오래된 이벤트를 버리고 최신 상태를 우선
+                q.get_nowait()
+            q.put_nowait(event)
+
+    def _on_notify(self, conn, pid, channel, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        self.publish(event)
+
+    async def _run(self) -> None:
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(_listen_dsn())
+                await conn.add_listener(CHANNEL, self._on_notify)
+                while not conn.is_closed():
+                    await asyncio.sleep(RECONNECT_DELAY_S)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[track_events] ⚠️ LISTEN 연결 오류, 재연결 시도: {e}")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(RECONNECT_DELAY_S)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+hub = TrackEventHub()
@@ -1,18 +1,72 @@
 # app/workers/music_worker.py
-import os, json, asyncio, httpx, time  # type: ignore
-from aiokafka import AIOKafkaConsumer  # type: ignore
+import os, asyncio, time, httpx  # type: ignore
+import datetime as dt
+from collections import deque, Counter
+from aiokafka import AIOKafkaConsumer, ConsumerRebalanceListener, TopicPartition  # type: ignore
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func
 from app.db import async_session_maker
 from app.models import Track
+import app.kafka as kafka
+from app.services.track_events import notify_track_status, hub as track_event_hub
+from app.workers.track_lease import (
+    claim_track, run_with_lease, run_reaper, cancel_inflight, LeaseLostError, GenerationCancelledError,
+)
+from app.workers.scheduler import LaneScheduler
+from app.services.music_lanes import LANES, LANE_TOPICS, DEFAULT_LANE, lane_of_topic
+from app import metrics
+from prometheus_client import start_http_server
+from app.kafka import start_kafka, stop_kafka, ensure_topics
+from app.services.provider_http import start_http_clients, close_http_clients
+from app.services.generation_cache import cache_allowed, find_reusable_track
+from app.services.audio_store import AUDIO_DIR, live_path
+from app.services.music_providers import (
+    GenerationRequest, GenerationFailedError, RetryableGenerationError, get_router,
+)
 
 KAFKA_BOOTSTRAP = os.getenv("KAFKA_BOOTSTRAP", "redpanda:9092")
 TOPIC_REQ = os.getenv("KAFKA_TOPIC_REQUESTS", "music.gen.requests")
 GROUP_ID = os.getenv("KAFKA_GROUP_MUSIC_WORKERS", "music-workers")
+# 워커 프로세스 하나가 동시에 진행할 수 있는 최대 생성 건수 (1이면 기존처럼 순차 처리)
+MAX_IN_FLIGHT = max(int(os.getenv("MUSIC_WORKER_CONCURRENCY", "4")), 1)
+# 슬롯이 모두 찬 동안에는 poll을 하지 않으므로, 한 건의 최대 생성 시간보다 넉넉하게 잡는다
+MAX_POLL_INTERVAL_MS = int(os.getenv("MUSIC_WORKER_MAX_POLL_INTERVAL_MS", "900000"))
+# 토픽별로 미리 가져와 스케줄러에 쌓아둘 최대 메시지 수 (넘으면 그 토픽만 잠시 pause)
+# API의 MUSIC_MAX_PENDING_PER_USER보다 크게 둬야 한 사용자가 버퍼를 혼자 채우지 못한다
+BUFFER_PER_TOPIC = int(os.getenv("MUSIC_WORKER_BUFFER_PER_TOPIC", str(MAX_IN_FLIGHT * 2)))
+# 레인 가중치 "priority:6,interactive:3,bulk:1" → 빈 슬롯이 생길 때 이 비율로 레인을 고른다
+LANE_WEIGHTS = {
+    name: int(w)
+    for name, w in (
+        x.split(":") for x in os.getenv("MUSIC_LANE_WEIGHTS", "priority:6,interactive:3,bulk:1").split(",")
+    )
+}
+METRICS_PORT = int(os.getenv("MUSIC_WORKER_METRICS_PORT", "9102"))
+# 생성 중인 오디오를 스트리밍으로 받아 API가 바로 재생할 수 있게 노출 (false면 완성본만)
+STREAM_PARTIAL = os.getenv("MUSIC_STREAM_PARTIAL", "true").lower() == "true"
+LAG_REFRESH_S = 5.0
+
+
 
-ELEVEN_BASE = os.getenv("ELEVEN_MUSIC_BASE", "https://api.elevenlabs.io")
-ELEVEN_CREATE = os.getenv("ELEVEN_MUSIC_CREATE", "/v1/music/generate")  # /v1/music/compose 계열
-ELEVEN_API_KEY = os.getenv("ELEVEN_API_KEY", "")
+def _parse_delays(spec: str) -> list[tuple[str, int]]:
+    """'30s,5m,1h' → [('30s', 30), ('5m', 300), ('1h', 3600)]"""
+    units = {"s": 1, "m": 60, "h": 3600}
+    delays = []
+    for label in (x.strip() for x in spec.split(",")):
+        if not label:
+            continue
+        if label[-1] in units:
+            delays.append((label, int(label[:-1]) * units[label[-1]]))
+        else:
+            delays.append((f"{label}s", int(label)))
+    return delays
+
+
+# 재시도 정책: 일시 장애는 지연 토픽(.retry.30s → .retry.5m ...)으로 순서대로 재발행하고,
+# 모두 소진하면 에러 메타데이터와 함께 DLQ로 보낸 뒤 FAILED 처리한다.
+RETRY_DELAYS = _parse_delays(os.getenv("MUSIC_RETRY_DELAYS", "30s,5m"))
+RETRY_TOPICS = [f"{TOPIC_REQ}.retry.{label}" for label, _ in RETRY_DELAYS]
+TOPIC_DLQ = os.getenv("KAFKA_TOPIC_DLQ", f"{TOPIC_REQ}.dlq")
 
 
 def _sanitize_for_db(s: str, limit: int = 500) -> str:
@@ -20,6 +74,103 @@ def _sanitize_for_db(s: str, limit: int = 500) -> str:
     return s.replace("\x00", "")[:limit]
 
 
+async def _set_track(db: AsyncSession, task_id: int, **values) -> bool:
+    """
+    Track 상태/필드 갱신 + 상태 변경 알림(NOTIFY)을 한 트랜잭션으로 커밋.
+    사용자가 이미 취소(CANCELLED)한 트랙은 덮어쓰지 않고 False.
+    """
+    res = await db.execute(
+        update(Track)
+        .where(Track.id == task_id, Track.status != "CANCELLED")
+        .values(**values)
+        .returning(Track.id)
+        .execution_options(synchronize_session=False)
+    )
+    updated = res.scalar_one_or_none() is not None
+    if updated:
+        await notify_track_status(db, task_id)
+    await db.commit()
+    return updated
+
+
+def _on_track_event(event: dict) -> None:
+    """API가 트랙을 취소/삭제하면(NOTIFY status=CANCELLED) 이 워커의 진행 중 생성을 바로 중단."""
+    if event.get("status") == "CANCELLED" and cancel_inflight(event.get("track_id")):
+        print(f"[music_worker] 🛑 취소 요청 수신 - Track(id={event.get('track_id')}) 생성 중단")
+
+
+async def _retry_or_dead_letter(db: AsyncSession, payload: dict, err_msg: str, retry_after: float | None = None):
+    """
+    재시도 여유가 남았으면 다음 지연 토픽으로, 아니면 DLQ로 보내고 FAILED 처리.
+
+    retry_at은 항상 그 토픽의 고정 지연으로만 잡는다 (메인 루프가 '뒤 메시지일수록 늦다'는 전제로
+    파티션을 멈추므로, 한 메시지만 늦추면 그 뒤 재시도가 전부 같이 밀린다).
+    provider의 Retry-After는 provider_limiter.report_throttled로 기록돼 있어, 재시도가 일찍 오더라도
+    acquire()가 차단 시각까지 기다린다. 여기서는 로그/에러 메시지에만 남긴다.
+    """
+    task_id = payload["task_id"]
+    attempt = int(payload.get("attempt") or 0)  # 지금까지 재시도된 횟수 (최초 요청 = 0)
+
+    try:
+        if attempt < len(RETRY_DELAYS):
+            label, delay = RETRY_DELAYS[attempt]
+            if retry_after and retry_after > delay:
+                err_msg = f"{err_msg} (Retry-After {retry_after:.0f}s, provider limiter가 대기)"
+            retry_payload = {
+                **payload,
+                "attempt": attempt + 1,
+                "retry_at": time.time() + delay,
+                "last_error": err_msg,
+            }
+            await kafka.publish(RETRY_TOPICS[attempt], retry_payload, key=task_id)
+            await _set_track(
+                db, task_id,
+                status="QUEUED",
+                worker_id=None,
+                claimed_at=None,
+                error=_sanitize_for_db(f"retry {attempt + 1}/{len(RETRY_DELAYS)} in {label}: {err_msg}"),
+            )
+            print(f"[music_worker] 🔁 재시도 예약 - Track(id={task_id}) {label} 후 ({RETRY_TOPICS[attempt]})")
+            return
+
+        dead_letter = {
+            "payload": payload,
+            "error": err_msg,
+            "attempts": attempt + 1,
+            "source_topic": RETRY_TOPICS[attempt - 1] if attempt else TOPIC_REQ,
+            "failed_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+        }
+        await kafka.publish(TOPIC_DLQ, dead_letter, key=task_id)
+        print(f"[music_worker] ☠️ 재시도 소진 → DLQ - Track(id={task_id}) ({TOPIC_DLQ})")
+    except Exception as e:
+        # 재발행 자체가 실패하면 기존처럼 FAILED로 남긴다
+        print(f"[music_worker] !!! 재시도/DLQ 발행 실패: {e}")
+
+    await _set_track(db, task_id, status="FAILED", error=err_msg, finished_at=func.now())
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"[music_worker] ⚠️ 파일 삭제 실패 ({path}): {e}")
+
+
+def _observe_stages(result, total_s: float) -> None:
+    stage = metrics.WORKER_STAGE_SECONDS
+    stage.labels(stage="rate_wait").observe(result.wait_s)
+    stage.labels(stage="provider").observe(result.provider_s)
+    stage.labels(stage="download").observe(result.download_s)
+    stage.labels(stage="write").observe(result.write_s)
+    stage.labels(stage="total").observe(total_s)
+    if result.first_audio_s is not None:
+        stage.labels(stage="first_audio").observe(result.first_audio_s)
+    metrics.WORKER_AUDIO_BYTES.observe(result.size)
+    metrics.WORKER_GENERATIONS.labels(outcome="ready").inc()
+
+
 async def handle_message(payload: dict):
     """Kafka에서 들어온 한 건의 음악 생성 요청을 처리 (동기 MP3 응답 방식)."""
 
@@ -44,168 +195,378 @@ async def handle_message(payload: dict):
                 print(f"[music_worker] ⚠️ Track(id={task_id})을 찾을 수 없습니다. payload={payload}")
                 return
 
-            if track.status in ("READY", "COMPLETED", "FAILED"):
+            if track.status in ("READY", "COMPLETED", "FAILED", "CANCELLED"):
                 print(f"[music_worker] ⏭ 이미 처리된 트랙 (status={track.status}), id={task_id}")
                 return
 
-            # PROCESSING로 전이
-            await db.execute(
-                update(Track)
-                .where(Track.id == task_id)
-                .values(status="PROCESSING")
-            )
-            await db.commit()
+            # PROCESSING로 조건부 선점 (+ lease, 시도 횟수 기록)
+            # 재전달된 메시지라도 다른 워커가 lease를 쥐고 있으면 여기서 빠진다
+            claim_started = time.perf_counter()
+            if not await claim_track(db, task_id):
+                print(f"[music_worker] ⏭ 다른 워커가 처리 중인 트랙 (status={track.status}), id={task_id}")
+                return
+            metrics.WORKER_STAGE_SECONDS.labels(stage="claim").observe(time.perf_counter() - claim_started)
+            if track.created_at:
+                queued_s = (dt.datetime.now(dt.timezone.utc) - track.created_at).total_seconds()
+                metrics.WORKER_STAGE_SECONDS.labels(stage="queue").observe(max(queued_s, 0.0))
 
             # 프롬프트 결정
             prompt_text = payload.get("prompt") or (track.prompt or "")
             if not prompt_text:
                 err = "empty prompt"
                 print(f"[music_worker] ❌ 프롬프트가 비어있습니다. id={task_id}")
-                await db.execute(
-                    update(Track)
-                    .where(Track.id == task_id)
-                    .values(status="FAILED", error=err)
-                )
-                await db.commit()
+                await _set_track(db, task_id, status="FAILED", error=err, finished_at=func.now())
                 return
 
-            if not ELEVEN_API_KEY:
-                err = "ELEVEN_API_KEY is not set in environment"
-                print(f"[music_worker] ❌ {err}")
-                await db.execute(
-                    update(Track)
-                    .where(Track.id == task_id)
-                    .values(status="FAILED", error=err)
-                )
-                await db.commit()
-                return
-
-            headers = {
-                "xi-api-key": ELEVEN_API_KEY,
-                "Content-Type": "application/json",
-            }
-
-            # 2) ElevenLabs에 직접 음악 생성 요청 (응답 = MP3 바이너리)
-            body = {
-                # 공식 문서 기준: prompt + music_length_ms
-                "prompt": prompt_text,
-                "music_length_ms": music_length_ms,
-            }
-            # 보수적으로 instrumental 옵션 힌트
-            if force_instrumental:
-                body["instrumental"] = True  # 실제 API에서 허용하는 필드면 사용됨
-
-            if isinstance(extra, dict):
-                # extra에 추가 파라미터가 있다면 body에 병합
-                body.update(extra)
-
-            print(
-                f"[music_worker] ▶️ ElevenLabs 생성 요청: {ELEVEN_CREATE}, "
-                f"duration={duration_sec}s, body keys={list(body.keys())}"
-            )
-
-            async with httpx.AsyncClient(base_url=ELEVEN_BASE, timeout=300) as client:
-                resp = await client.post(ELEVEN_CREATE, json=body, headers=headers)
-                # HTTP 에러면 여기서 먼저 처리
-                try:
-                    resp.raise_for_status()
-                except httpx.HTTPStatusError as he:
-                    # 응답 바디는 바이너리일 수도 있으니 조심해서 preview만
-                    raw = resp.content[:300]
-                    preview = _sanitize_for_db(raw.decode("utf-8", errors="ignore"))
-                    err_msg = _sanitize_for_db(
-                        f"create_http_error {he.response.status_code}: {preview}"
+            # 큐에서 기다리는 사이 같은 요청이 완료됐다면 provider 호출 없이 연결
+            if track.gen_hash and cache_allowed(extra):
+                cached = await find_reusable_track(db, track.gen_hash, exclude_track_id=task_id)
+                if cached:
+                    await _set_track(
+                        db, task_id,
+                        status="READY",
+                        track_url=cached.track_url,
+                        provider=cached.provider,
+                        finished_at=func.now(),
                     )
-                    print(f"[music_worker] ❌ ElevenLabs HTTP 에러: {err_msg}")
-                    await db.execute(
-                        update(Track)
-                        .where(Track.id == task_id)
-                        .values(status="FAILED", error=err_msg)
+                    metrics.WORKER_GENERATIONS.labels(outcome="cached").inc()
+                    print(
+                        f"[music_worker] ♻️ 캐시 재사용 - Track(id={task_id}) ← "
+                        f"Track(id={cached.id}) url={cached.track_url}"
                     )
-                    await db.commit()
                     return
 
-                audio_bytes = resp.content
-                if not audio_bytes or len(audio_bytes) < 1000:
-                    err_msg = _sanitize_for_db(
-                        f"empty_or_too_small_audio len={len(audio_bytes)}"
-                    )
-                    print(f"[music_worker] ❌ 오디오 데이터가 비정상: {err_msg}")
-                    await db.execute(
-                        update(Track)
-                        .where(Track.id == task_id)
-                        .values(status="FAILED", error=err_msg)
-                    )
-                    await db.commit()
-                    return
+            # 2) provider 라우터로 생성 (느리면 hedge, 실패하면 fallback) → MP3 파일 저장
+            gen_req = GenerationRequest(
+                prompt=prompt_text,
+                music_length_ms=music_length_ms,
+                force_instrumental=force_instrumental,
+                extra=extra,
+                live_path=live_path(task_id) if STREAM_PARTIAL else None,
+            )
+            print(
+                f"[music_worker] ▶️ 음악 생성 요청: duration={duration_sec}s, "
+                f"extra keys={list(extra.keys())}"
+            )
+
+            # 3) 생성 + 저장 (진행 중에는 lease heartbeat)
+            result = await run_with_lease(
+                task_id,
+                get_router().generate(gen_req, AUDIO_DIR, f"music_{int(time.time())}_{task_id}"),
+            )
+            public_url = f"/static/audio/{result.file_name}"
+            print(
+                f"[music_worker] 🎉 음악 파일 저장 완료: {result.file_path} ({result.size} bytes, {result.provider}) "
+                f"wait={result.wait_s:.2f}s provider={result.provider_s:.2f}s "
+                f"download={result.download_s:.2f}s write={result.write_s:.3f}s"
+            )
 
-            # 3) 파일로 저장
-            save_dir = "/app/static/audio"
-            os.makedirs(save_dir, exist_ok=True)
+            # 4) Track 업데이트 (READY + track_url + 단계별 계측)
+            updated = await _set_track(
+                db, task_id,
+                status="READY",
+                track_url=public_url,
+                provider=result.provider,
+                finished_at=func.now(),
+                provider_ms=int(result.provider_s * 1000),
+                download_ms=int(result.download_s * 1000),
+                write_ms=int(result.write_s * 1000),
+                audio_bytes=result.size,
+            )
+            if not updated:
+                # 저장 직전에 취소/삭제됨 → 아무도 쓰지 않을 파일은 지운다
+                metrics.WORKER_GENERATIONS.labels(outcome="cancelled").inc()
+                _remove_file(result.file_path)
+                print(f"[music_worker] 🛑 완료 직전 취소된 트랙 - Track(id={task_id}), 파일 삭제")
+                return
+            _observe_stages(result, time.perf_counter() - claim_started)
+            print(f"[music_worker] ✅ Track(id={task_id}) 상태 READY, url 저장 완료 ({public_url})")
 
-            file_name = f"music_{int(time.time())}_{task_id}.mp3"
-            file_path = os.path.join(save_dir, file_name)
+        except GenerationCancelledError:
+            # 사용자가 취소/삭제 → provider 요청을 끊고 슬롯을 반납 (상태는 API가 이미 CANCELLED로 바꿈)
+            metrics.WORKER_GENERATIONS.labels(outcome="cancelled").inc()
+            print(f"[music_worker] 🛑 취소로 생성 중단 - Track(id={task_id})")
 
-            with open(file_path, "wb") as f:
-                f.write(audio_bytes)
+        except LeaseLostError:
+            # 리퍼가 회수했거나 트랙이 삭제됨 → 이 트랙은 더 이상 이 워커 소관이 아니다
+            metrics.WORKER_GENERATIONS.labels(outcome="lease_lost").inc()
+            print(f"[music_worker] ⏹ lease 상실로 생성 중단 - Track(id={task_id})")
 
-            public_url = f"/static/audio/{file_name}"
-            print(f"[music_worker] 🎉 음악 파일 저장 완료: {file_path} (url={public_url})")
+        except GenerationFailedError as e:
+            # 재시도해도 소용없는 실패 (4xx, 비정상 오디오)
+            await db.rollback()
+            metrics.WORKER_GENERATIONS.labels(outcome="failed").inc()
+            await _set_track(db, task_id, status="FAILED", error=str(e), finished_at=func.now())
 
-            # 4) Track 업데이트 (READY + track_url)
-            await db.execute(
-                update(Track)
-                .where(Track.id == task_id)
-                .values(status="READY", track_url=public_url)
-            )
-            await db.commit()
-            print(f"[music_worker] ✅ Track(id={task_id}) 상태 READY, url 저장 완료")
+        except (RetryableGenerationError, httpx.TransportError) as e:
+            # provider 일시 장애 / 네트워크 오류 → 지연 재시도
+            await db.rollback()
+            err_msg = _sanitize_for_db(str(e) if isinstance(e, RetryableGenerationError) else f"transport_error: {e!r}")
+            metrics.WORKER_GENERATIONS.labels(outcome="retried").inc()
+            try:
+                await _retry_or_dead_letter(db, payload, err_msg, getattr(e, "retry_after", None))
+            except Exception as e2:
+                print(f"[music_worker] !!! 재시도 처리 중 추가 예외: {e2}")
 
         except Exception as e:
             # 트랜잭션이 이미 깨졌을 수 있으므로 롤백 후 에러 기록 시도
             await db.rollback()
             err_msg = _sanitize_for_db(f"exception: {e}")
             print(f"[music_worker] 💥 예외 발생: {err_msg}")
+            metrics.WORKER_GENERATIONS.labels(outcome="failed").inc()
             try:
-                await db.execute(
-                    update(Track)
-                    .where(Track.id == task_id)
-                    .values(status="FAILED", error=err_msg)
-                )
-                await db.commit()
+                await _set_track(db, task_id, status="FAILED", error=err_msg, finished_at=func.now())
             except Exception as e2:
                 # 여기서 또 실패해도 그냥 로그만 남기고 끝냄
                 print(f"[music_worker] !!! 에러 저장 중 추가 예외: {e2}")
 
 
+class _PartitionOffsets:
+    """
+    파티션 하나에 대해 '시작된 offset'과 '끝난 offset'을 추적한다.
+    병렬 처리 중에는 뒤 offset이 먼저 끝날 수 있으므로,
+    앞쪽 offset이 모두 끝난 연속 구간까지만 커밋 대상으로 올린다.
+    """
+
+    def __init__(self):
+        self.started: deque[int] = deque()
+        self.finished: set[int] = set()
+        self.commit_to: int | None = None   # 다음에 커밋할 offset (= 마지막 완료 offset + 1)
+        self.committed: int | None = None   # 실제로 커밋된 offset
+
+    def start(self, offset: int) -> None:
+        self.started.append(offset)
+
+    def finish(self, offset: int) -> None:
+        self.finished.add(offset)
+        while self.started and self.started[0] in self.finished:
+            done = self.started.popleft()
+            self.finished.discard(done)
+            self.commit_to = done + 1
+
+    def has_pending_commit(self) -> bool:
+        return self.commit_to is not None and self.commit_to != self.committed
+
+
+class _OffsetCommitter(ConsumerRebalanceListener):
+    """파티션별 offset 추적 + 커밋 직렬화 (커밋 순서가 뒤바뀌어 offset이 되돌아가는 것을 방지)."""
+
+    def __init__(self, consumer: AIOKafkaConsumer, scheduler: LaneScheduler):
+        self.consumer = consumer
+        self.scheduler = scheduler
+        self.partitions: dict[TopicPartition, _PartitionOffsets] = {}
+        # 재시도 토픽에서 아직 시간이 안 된 메시지를 만나 멈춰둔 파티션 → 재개 시각
+        self.paused_until: dict[TopicPartition, float] = {}
+        # 스케줄러 버퍼가 가득 차서 멈춰둔 파티션
+        self.throttled: set[TopicPartition] = set()
+        self._lock = asyncio.Lock()
+
+    def tracker(self, tp: TopicPartition) -> _PartitionOffsets:
+        return self.partitions.setdefault(tp, _PartitionOffsets())
+
+    async def commit(self) -> None:
+        async with self._lock:
+            offsets = {
+                tp: p.commit_to
+                for tp, p in self.partitions.items()
+                if p.has_pending_commit()
+            }
+            if not offsets:
+                return
+            try:
+                await self.consumer.commit(offsets)
+            except Exception as e:
+                # 리밸런스 중 커밋 실패 → 재전달되므로 로그만 남긴다
+                print(f"[music_worker] ⚠️ offset 커밋 실패: {e}")
+                return
+            for tp, offset in offsets.items():
+                self.partitions[tp].committed = offset
+
+    async def on_partitions_revoked(self, revoked):
+        # 넘겨주기 전에 끝난 구간까지는 커밋하고, 추적 정보는 버린다.
+        # (아직 진행 중인 메시지는 새 담당 워커에게 재전달된다)
+        await self.commit()
+        revoked = set(revoked)
+        for tp in revoked:
+            self.partitions.pop(tp, None)
+            self.paused_until.pop(tp, None)
+            self.throttled.discard(tp)
+        # 아직 시작 안 한(버퍼에 있던) 메시지도 새 담당 워커가 처리한다
+        self.scheduler.drop(lambda job: job.tp in revoked)
+
+    def defer(self, tp: TopicPartition, offset: int, until: float) -> None:
+        """아직 재시도 시각이 안 된 메시지: 그 offset으로 되감고 시각이 될 때까지 파티션을 멈춘다."""
+        self.consumer.seek(tp, offset)
+        self.consumer.pause(tp)
+        self.paused_until[tp] = until
+
+    def resume_due(self) -> None:
+        now = time.time()
+        for tp, until in list(self.paused_until.items()):
+            if until <= now:
+                del self.paused_until[tp]
+                if tp not in self.throttled:
+                    self.consumer.resume(tp)
+
+    def throttle(self, full_topics: set[str]) -> None:
+        """버퍼가 찬 토픽의 파티션은 멈추고, 여유가 생긴 토픽은 다시 가져온다."""
+        for tp in self.consumer.assignment():
+            if tp.topic in full_topics:
+                if tp not in self.throttled:
+                    self.consumer.pause(tp)
+                    self.throttled.add(tp)
+            elif tp in self.throttled:
+                self.throttled.discard(tp)
+                if tp not in self.paused_until:
+                    self.consumer.resume(tp)
+
+    async def on_partitions_assigned(self, assigned):
+        pass
+
+
+class _Job:
+    """스케줄러에 쌓이는 메시지 한 건 (레인/사용자 분류 포함)."""
+    __slots__ = ("msg", "tp", "lane", "user_key")
+
+    def __init__(self, msg, tp: TopicPartition):
+        payload = msg.value if isinstance(msg.value, dict) else {}
+        self.msg = msg
+        self.tp = tp
+        # 재시도 토픽에서 온 메시지도 원래 레인을 payload로 유지한다
+        lane = payload.get("lane") or lane_of_topic(tp.topic)
+        self.lane = lane if lane in LANES else DEFAULT_LANE
+        self.user_key = payload.get("user_id") or payload.get("session_id")
+
+
+async def _run_one(job: _Job, committer: _OffsetCommitter, slots: asyncio.Semaphore):
+    msg, tp = job.msg, job.tp
+    tracker = committer.tracker(tp)
+    completed = False
+    metrics.WORKER_IN_FLIGHT.inc()
+    try:
+        await handle_message(msg.value)
+        completed = True
+    except Exception as e:
+        # handle_message 내부에서 대부분 처리하지만, 여기서 죽으면 offset이 영원히 막히므로 방어
+        print(f"[music_worker] 💥 처리 중 예기치 못한 예외 (offset={msg.offset}): {e}")
+        completed = True
+    finally:
+        metrics.WORKER_IN_FLIGHT.dec()
+        slots.release()
+        # 취소된 경우(종료 등)에는 커밋하지 않아 재전달되도록 한다.
+        # 리밸런스로 파티션을 잃었다면 tracker가 교체됐으므로 커밋하지 않는다.
+        if completed and committer.partitions.get(tp) is tracker:
+            tracker.finish(msg.offset)
+            await committer.commit()
+
+
+async def _export_lane_metrics(consumer: AIOKafkaConsumer, scheduler: LaneScheduler) -> None:
+    for lane, depth in scheduler.depth().items():
+        metrics.WORKER_LANE_BUFFERED.labels(lane=lane).set(depth)
+
+    lag = Counter()
+    for tp in consumer.assignment():
+        lane = lane_of_topic(tp.topic)
+        highwater = consumer.highwater(tp)
+        if lane is None or highwater is None:
+            continue
+        lag[lane] += max(highwater - await consumer.position(tp), 0)
+    for lane in LANES:
+        metrics.WORKER_LANE_LAG.labels(lane=lane).set(lag[lane])
+
+
 async def main():
+    lane_topics = list(LANE_TOPICS.values())
     print(
         f"[music_worker] 🚀 시작 - bootstrap={KAFKA_BOOTSTRAP}, "
-        f"topic={TOPIC_REQ}, group_id={GROUP_ID}"
+        f"topics={lane_topics}, group_id={GROUP_ID}, concurrency={MAX_IN_FLIGHT}, "
+        f"lane_weights={LANE_WEIGHTS}"
     )
     consumer = AIOKafkaConsumer(
-        TOPIC_REQ,
         bootstrap_servers=KAFKA_BOOTSTRAP,
         group_id=GROUP_ID,
-        value_deserializer=lambda v: json.loads(v),
+        value_deserializer=kafka.deserialize_value,
         key_deserializer=lambda v: v.decode() if v is not None else None,
         enable_auto_commit=False,
         auto_offset_reset="earliest",
+        max_poll_interval_ms=MAX_POLL_INTERVAL_MS,
     )
+    scheduler = LaneScheduler({lane: LANE_WEIGHTS.get(lane, 1) for lane in LANES})
+    committer = _OffsetCommitter(consumer, scheduler)
+    # 레인별 요청 토픽 + 지연 재시도 토픽들을 함께 구독
+    consumer.subscribe([*lane_topics, *RETRY_TOPICS], listener=committer)
+    try:
+        await ensure_topics([*lane_topics, *RETRY_TOPICS, TOPIC_DLQ])
+    except Exception as e:
+        # 권한이 없거나 admin API를 막아둔 클러스터에서는 미리 만들어 둔 토픽을 그대로 사용
+        print(f"[music_worker] ⚠️ 토픽 확인/생성 실패 (계속 진행): {e}")
+    await start_kafka()  # 재시도/DLQ 재발행용 producer
+    await start_http_clients()
+    # 취소 알림 수신 (LISTEN track_status)
+    track_event_hub.add_listener(_on_track_event)
+    await track_event_hub.start()
     await consumer.start()
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
+
+    slots = asyncio.Semaphore(MAX_IN_FLIGHT)
+    running: set[asyncio.Task] = set()
+    reaper = asyncio.create_task(run_reaper())
+    loop = asyncio.get_running_loop()
+    next_lag_refresh = 0.0
     try:
         while True:
-            batch = await consumer.getmany(timeout_ms=1000)
+            committer.resume_due()
+            buffered = Counter(job.tp.topic for job in scheduler.items())
+            committer.throttle({t for t, n in buffered.items() if n >= BUFFER_PER_TOPIC})
+
+            # 대기 중인 작업이 있으면 슬롯이 비는 대로 꺼낼 수 있게 짧게 poll
+            batch = await consumer.getmany(
+                timeout_ms=200 if len(scheduler) else 1000,
+                max_records=BUFFER_PER_TOPIC,
+            )
             for tp, messages in batch.items():
+                tracker = committer.tracker(tp)
                 for msg in messages:
+                    retry_at = float((msg.value or {}).get("retry_at") or 0)
+                    if retry_at > time.time():
+                        # 지연 토픽마다 retry_at = 발행 시각 + 고정 지연이라 뒤 메시지가 더 늦다 → 파티션째 멈춘다
+                        committer.defer(tp, msg.offset, retry_at)
+                        break
                     print(
-                        f"[music_worker] 📩 새 메시지 수신 - offset={msg.offset}, "
+                        f"[music_worker] 📩 새 메시지 수신 - topic={tp.topic}, offset={msg.offset}, "
                         f"key={msg.key}, value={msg.value}"
                     )
-                    await handle_message(msg.value)
-                    await consumer.commit()
+                    # 버퍼에 들어간 순간부터 '시작됨'으로 보고 커밋 경계를 잡는다
+                    tracker.start(msg.offset)
+                    job = _Job(msg, tp)
+                    scheduler.push(job.lane, job.user_key, job)
+
+            # 빈 슬롯만큼 레인 가중치/사용자 공정성 순서로 꺼내 실행
+            while len(scheduler) and not slots.locked():
+                job = scheduler.pop()
+                await slots.acquire()
+                task = asyncio.create_task(_run_one(job, committer, slots))
+                running.add(task)
+                task.add_done_callback(running.discard)
+
+            if loop.time() >= next_lag_refresh:
+                next_lag_refresh = loop.time() + LAG_REFRESH_S
+                try:
+                    await _export_lane_metrics(consumer, scheduler)
+                except Exception as e:
+                    print(f"[music_worker] ⚠️ 레인 메트릭 갱신 실패: {e}")
     finally:
+        # 종료 시 진행 중인 생성은 취소한다. 커밋되지 않은 메시지는 다음 워커가 다시 처리한다.
+        reaper.cancel()
+        for task in list(running):
+            task.cancel()
+        await asyncio.gather(reaper, *running, return_exceptions=True)
+        await committer.commit()
         await consumer.stop()
+        await track_event_hub.stop()
+        await close_http_clients()
+        await stop_kafka()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,161 @@
+# app/workers/outbox_relay.py
+"""
+outbox_events → Kafka 발행 relay.
+
+- 미발행 행을 id 순으로 배치 조회 (FOR UPDATE SKIP LOCKED → API 레플리카 여러 개가 같이 돌아도 안전)
+- 배치 전체를 send()로 한꺼번에 넘기고 전송 결과를 모아 기다림 (linger 배칭이 실제로 동작)
+- 성공한 행만 published_at 기록. 실패한 행은 attempts/last_error와 next_attempt_at(지수 backoff)을
+  남기고, 그 시각 전까지는 조회 대상에서 빠진다 → 계속 실패하는 행이 배치 앞자리를 막지 않는다.
+- OUTBOX_MAX_ATTEMPTS번 실패하면 dead_at을 찍고 포기한다 (로그 + outbox_dead_events 메트릭).
+  트랙 생성 요청이었다면 그 Track을 FAILED로 돌려 QUEUED로 영원히 남지 않게 한다.
+  이벤트는 트랙마다 독립적이라, 재시도가 뒤 이벤트보다 늦게 발행돼도 처리 결과는 같다.
+
+idempotent producer + 커밋 후에만 발행 + 워커 쪽 중복 처리 방지(Track 상태 검사)로
+실질적으로 exactly-once 효과를 낸다.
+
+API lifespan에서 백그라운드 태스크로 돌거나(OUTBOX_RELAY_IN_API=true),
+단독 실행: python -m app.workers.outbox_relay
+"""
+from __future__ import annotations
+import os
+import asyncio
+import datetime as dt
+
+from sqlalchemy import select, delete, update, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import metrics
+from app.db import async_session_maker
+from app.models import OutboxEvent, Track
+from app.services.track_events import notify_track_status
+import app.kafka as kafka
+from app.kafka import start_kafka, stop_kafka
+from app.services.outbox import wait_for_wakeup
+
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+POLL_INTERVAL_S = float(os.getenv("OUTBOX_POLL_INTERVAL_S", "0.5"))
+# 발행 완료된 행 보관 기간 (디버깅용), 지나면 정리
+RETENTION_H = float(os.getenv("OUTBOX_RETENTION_H", "24"))
+PURGE_EVERY_S = 600
+# 발행 실패 시 재시도 간격: BACKOFF_BASE_S * 2^(attempts-1), 최대 BACKOFF_MAX_S
+BACKOFF_BASE_S = float(os.getenv("OUTBOX_BACKOFF_BASE_S", "1"))
+BACKOFF_MAX_S = float(os.getenv("OUTBOX_BACKOFF_MAX_S", "300"))
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+
+
+def backoff_s(attempts: int) -> float:
+    return min(BACKOFF_BASE_S * 2 ** max(attempts - 1, 0), BACKOFF_MAX_S)
+
+
+async def _give_up(db: AsyncSession, event: OutboxEvent, now: dt.datetime) -> None:
+    event.dead_at = now
+    metrics.OUTBOX_DEAD.labels(topic=event.topic).inc()
+    print(
+        f"[outbox_relay] ☠️ 발행 포기 - id={event.id}, topic={event.topic}, key={event.key}, "
+        f"attempts={event.attempts}: {event.last_error}"
+    )
+    task_id = (event.payload or {}).get("task_id") if isinstance(event.payload, dict) else None
+    if task_id is None:
+        return
+    res = await db.execute(
+        update(Track)
+        .where(Track.id == task_id, Track.status == "QUEUED")
+        .values(status="FAILED", error=f"outbox publish failed: {event.last_error}", finished_at=func.now())
+        .returning(Track.id)
+        .execution_options(synchronize_session=False)
+    )
+    if res.scalar_one_or_none() is not None:
+        await notify_track_status(db, task_id)
+
+
+async def publish_pending(limit: int = BATCH_SIZE) -> int:
+    """미발행 outbox 행을 최대 limit개 발행하고, 발행에 성공한 개수를 반환."""
+    async with async_session_maker() as db:
+        rows = (
+            await db.execute(
+                select(OutboxEvent)
+                .where(
+                    OutboxEvent.published_at.is_(None),
+                    OutboxEvent.dead_at.is_(None),
+                    or_(OutboxEvent.next_attempt_at.is_(None), OutboxEvent.next_attempt_at <= func.now()),
+                )
+                .order_by(OutboxEvent.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+        ).scalars().all()
+        if not rows:
+            await db.rollback()
+            return 0
+
+        # publish()는 즉시 전달 future를 돌려준다 → 배치 전체를 넣은 뒤 한 번에 기다림
+        futures = [kafka.publish(e.topic, e.payload, key=e.key) for e in rows]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+
+        now = dt.datetime.now(dt.timezone.utc)
+        published = dead = 0
+        for event, result in zip(rows, results):
+            if isinstance(result, Exception):
+                event.attempts += 1
+                event.last_error = str(result)[:500]
+                metrics.OUTBOX_PUBLISH_FAILURES.labels(topic=event.topic).inc()
+                if event.attempts >= MAX_ATTEMPTS:
+                    await _give_up(db, event, now)
+                    dead += 1
+                else:
+                    event.next_attempt_at = now + dt.timedelta(seconds=backoff_s(event.attempts))
+            else:
+                event.published_at = now
+                published += 1
+        await db.commit()
+
+        retrying = len(rows) - published - dead
+        if retrying:
+            print(f"[outbox_relay] ⚠️ 발행 실패 {retrying}건 (backoff 후 재시도)")
+        return published
+
+
+async def purge_published() -> None:
+    cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(hours=RETENTION_H)
+    async with async_session_maker() as db:
+        await db.execute(
+            delete(OutboxEvent).where(
+                OutboxEvent.published_at.is_not(None),
+                OutboxEvent.published_at < cutoff,
+            )
+        )
+        await db.commit()
+
+
+async def run_relay() -> None:
+    """kafka.producer가 시작된 상태에서 호출. 취소될 때까지 계속 발행한다."""
+    print(f"[outbox_relay] 🚀 시작 - batch={BATCH_SIZE}, poll={POLL_INTERVAL_S}s")
+    loop = asyncio.get_running_loop()
+    next_purge = loop.time() + PURGE_EVERY_S
+    while True:
+        try:
+            published = await publish_pending()
+            if loop.time() >= next_purge:
+                await purge_published()
+                next_purge = loop.time() + PURGE_EVERY_S
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[outbox_relay] 💥 예외 발생: {e}")
+            published = 0
+
+        # 배치가 꽉 찼으면 밀린 게 더 있다는 뜻 → 바로 다음 배치
+        if published < BATCH_SIZE:
+            await wait_for_wakeup(POLL_INTERVAL_S)
+
+
+async def main():
+    await start_kafka()
+    try:
+        await run_relay()
+    finally:
+        await stop_kafka()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+# app/workers/scheduler.py
+"""
+music_worker용 레인 가중치 + 사용자별 공정 스케줄러.
+
+- 레인 사이: smooth weighted round-robin (가중치 비율대로 섞어서 꺼냄, 한 레인이 굶지 않음)
+- 레인 안: 사용자(created_by)별 큐를 라운드로빈 → 한 명이 대량으로 넣어도 다른 사용자가 밀리지 않음
+
+Kafka에서 가져온 메시지를 여기 잠시 쌓아두고, 빈 슬롯이 생길 때마다 pop()으로 다음 작업을 고른다.
+사용자별 라운드로빈은 미리 가져온 범위(토픽당 MUSIC_WORKER_BUFFER_PER_TOPIC)에서만 효과가 있으므로,
+그 뒤 Kafka backlog에서의 공정성은 compose 시점의 사용자별 대기 상한(MUSIC_MAX_PENDING_PER_USER)이 맡는다.
+"""
+from __future__ import annotations
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+
+
+class _Lane:
+    def __init__(self, weight: int):
+        self.weight = max(weight, 1)
+        self.current = 0
+        self.queues: Dict[Hashable, deque] = {}
+        self.order: deque = deque()   # 사용자 라운드로빈 순서
+        self.size = 0
+
+    def push(self, user_key: Hashable, item: Any) -> None:
+        q = self.queues.get(user_key)
+        if q is None:
+            q = self.queues[user_key] = deque()
+            self.order.append(user_key)
+        q.append(item)
+        self.size += 1
+
+    def pop(self) -> Any:
+        user_key = self.order.popleft()
+        q = self.queues[user_key]
+        item = q.popleft()
+        if q:
+            self.order.append(user_key)
+        else:
+            del self.queues[user_key]
+        self.size -= 1
+        return item
+
+    def drop(self, predicate: Callable[[Any], bool]) -> int:
+        dropped = 0
+        for user_key in list(self.order):
+            q = self.queues[user_key]
+            kept = deque(x for x in q if not predicate(x))
+            dropped += len(q) - len(kept)
+            if kept:
+                self.queues[user_key] = kept
+            else:
+                del self.queues[user_key]
+                self.order.remove(user_key)
+        self.size -= dropped
+        return dropped
+
+
+class LaneScheduler:
+    def __init__(self, weights: Dict[str, int]):
+        self._lanes = {name: _Lane(w) for name, w in weights.items()}
+
+    def __len__(self) -> int:
+        return sum(lane.size for lane in self._lanes.values())
+
+    def push(self, lane: str, user_key: Hashable, item: Any) -> None:
+        self._lanes[lane].push(user_key, item)
+
+    def pop(self) -> Optional[Any]:
+        active = [lane for lane in self._lanes.values() if lane.size]
+        if not active:
+            return None
+        total = sum(lane.weight for lane in active)
+        for lane in active:
+            lane.current += lane.weight
+        chosen = max(active, key=lambda lane: lane.current)
+        chosen.current -= total
+        return chosen.pop()
+
+    def items(self) -> Iterator[Any]:
+        for lane in self._lanes.values():
+            for q in lane.queues.values():
+                yield from q
+
+    def drop(self, predicate: Callable[[Any], bool]) -> int:
+        """predicate가 참인 항목 제거 (리밸런스로 잃은 파티션의 메시지 등)."""
+        return sum(lane.drop(predicate) for lane in self._lanes.values())
+
+    def depth(self) -> Dict[str, int]:
+        return {name: lane.size for name, lane in self._lanes.items()}
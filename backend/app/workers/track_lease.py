@@ -0,0 +1,207 @@
+# app/workers/track_lease.py
+"""
+Track 처리 lease (중복 생성 방지 + 크래시 복구).
+
+- claim_track: `UPDATE ... WHERE status='QUEUED' (또는 lease 만료된 PROCESSING) RETURNING`
+  으로 조건부 선점. 같은 메시지가 재전달돼도 한 워커만 provider를 호출한다.
+- run_with_lease: 생성하는 동안 claimed_at을 주기적으로 갱신(heartbeat).
+  갱신이 실패하면(리퍼가 회수/삭제/취소됨) 진행 중인 생성을 중단한다.
+- cancel_inflight: 취소 알림(NOTIFY)을 받으면 heartbeat를 기다리지 않고 바로 중단한다.
+  (작업 태스크가 취소되면 진행 중인 httpx 요청도 닫힌다)
+- run_reaper: lease가 만료된 PROCESSING 트랙을 주기적으로 찾아
+  재시도 여유가 있으면 QUEUED로 되돌리고 outbox로 재발행, 아니면 FAILED 처리.
+"""
+from __future__ import annotations
+import os
+import socket
+import asyncio
+import datetime as dt
+from typing import Any, Awaitable
+
+from sqlalchemy import select, update, func, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import async_session_maker
+from app.models import Track
+from app.services import outbox
+from app.services.track_events import notify_track_status
+from app.services.music_lanes import lane_topic
+
+WORKER_ID = os.getenv("MUSIC_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+LEASE_S = int(os.getenv("MUSIC_LEASE_S", "120"))
+HEARTBEAT_S = max(LEASE_S / 3, 1.0)
+REAPER_INTERVAL_S = int(os.getenv("MUSIC_REAPER_INTERVAL_S", "60"))
+# lease 만료로 회수될 때, 이 횟수 이상 시도된 트랙은 다시 큐에 넣지 않고 FAILED
+MAX_ATTEMPTS = int(os.getenv("MUSIC_MAX_ATTEMPTS", "3"))
+REAP_BATCH = 100
+
+
+class LeaseLostError(Exception):
+    """생성 도중 lease를 잃음 (리퍼가 회수했거나 트랙이 삭제/취소됨)."""
+    pass
+
+
+class GenerationCancelledError(LeaseLostError):
+    """사용자가 트랙을 취소/삭제해서 생성을 중단함."""
+    pass
+
+
+# 이 워커에서 생성 중인 트랙 → 작업 태스크 (취소 알림이 오면 바로 cancel)
+_inflight: dict[int, asyncio.Future] = {}
+_cancel_requested: set[int] = set()
+
+
+def cancel_inflight(task_id: int) -> bool:
+    """이 워커가 task_id를 생성 중이면 중단시키고 True."""
+    task = _inflight.get(task_id)
+    if task is None or task.done():
+        return False
+    _cancel_requested.add(task_id)
+    task.cancel()
+    return True
+
+
+def _lease_expired():
+    return or_(
+        Track.claimed_at.is_(None),
+        Track.claimed_at < func.now() - dt.timedelta(seconds=LEASE_S),
+    )
+
+
+async def claim_track(db: AsyncSession, task_id: int) -> bool:
+    """QUEUED(또는 lease 만료된 PROCESSING) 트랙을 이 워커 소유의 PROCESSING으로 선점."""
+    res = await db.execute(
+        update(Track)
+        .where(
+            Track.id == task_id,
+            or_(
+                Track.status == "QUEUED",
+                and_(Track.status == "PROCESSING", _lease_expired()),
+            ),
+        )
+        .values(
+            status="PROCESSING",
+            worker_id=WORKER_ID,
+            claimed_at=func.now(),
+            started_at=func.now(),
+            attempts=Track.attempts + 1,
+        )
+        .returning(Track.id)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = res.scalar_one_or_none() is not None
+    if claimed:
+        await notify_track_status(db, task_id)
+    await db.commit()
+    return claimed
+
+
+async def renew_lease(task_id: int) -> bool:
+    async with async_session_maker() as db:
+        res = await db.execute(
+            update(Track)
+            .where(
+                Track.id == task_id,
+                Track.worker_id == WORKER_ID,
+                Track.status == "PROCESSING",
+            )
+            .values(claimed_at=func.now())
+            .returning(Track.id)
+            .execution_options(synchronize_session=False)
+        )
+        renewed = res.scalar_one_or_none() is not None
+        await db.commit()
+        return renewed
+
+
+async def run_with_lease(task_id: int, work: Awaitable[Any]) -> Any:
+    """
+    work를 실행하면서 lease를 갱신한다. lease를 잃으면 work를 취소하고 LeaseLostError,
+    cancel_inflight()로 취소되면 GenerationCancelledError.
+    """
+    task = asyncio.ensure_future(work)
+    lost = False
+    _inflight[task_id] = task
+
+    async def heartbeat():
+        nonlocal lost
+        while True:
+            await asyncio.sleep(HEARTBEAT_S)
+            try:
+                renewed = await renew_lease(task_id)
+            except Exception as e:
+                # DB 일시 장애: lease가 아직 남아 있을 수 있으니 다음 주기에 다시 시도
+                print(f"[music_worker] ⚠️ lease 갱신 실패 (id={task_id}): {e}")
+                continue
+            if not renewed:
+                lost = True
+                task.cancel()
+                return
+
+    hb = asyncio.create_task(heartbeat())
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if task_id in _cancel_requested:
+            raise GenerationCancelledError(f"track {task_id} cancelled")
+        if lost:
+            raise LeaseLostError(f"lease lost for track {task_id}")
+        raise
+    finally:
+        hb.cancel()
+        _inflight.pop(task_id, None)
+        _cancel_requested.discard(task_id)
+
+
+async def reap_expired_leases() -> int:
+    """lease 만료된 PROCESSING 트랙을 회수. 처리한 건수를 반환."""
+    async with async_session_maker() as db:
+        rows = (
+            await db.execute(
+                select(Track.id, Track.attempts, Track.request_payload)
+                .where(Track.status == "PROCESSING", _lease_expired())
+                .order_by(Track.id)
+                .limit(REAP_BATCH)
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+
+        for track_id, attempts, request_payload in rows:
+            if attempts < MAX_ATTEMPTS and request_payload:
+                await db.execute(
+                    update(Track)
+                    .where(Track.id == track_id)
+                    .values(
+                        status="QUEUED",
+                        worker_id=None,
+                        claimed_at=None,
+                        error=f"lease expired after attempt {attempts}; requeued",
+                    )
+                )
+                outbox.enqueue(
+                    db, lane_topic(request_payload.get("lane")), track_id, {**request_payload, "task_id": track_id}
+                )
+            else:
+                await db.execute(
+                    update(Track)
+                    .where(Track.id == track_id)
+                    .values(status="FAILED", error=f"lease expired after attempt {attempts}", finished_at=func.now())
+                )
+            await notify_track_status(db, track_id)
+
+        await db.commit()
+    return len(rows)
+
+
+async def run_reaper() -> None:
+    print(f"[music_worker] 🧹 lease 리퍼 시작 - lease={LEASE_S}s, interval={REAPER_INTERVAL_S}s")
+    while True:
+        await asyncio.sleep(REAPER_INTERVAL_S)
+        try:
+            reaped = await reap_expired_leases()
+            if reaped:
+                print(f"[music_worker] 🧹 lease 만료 트랙 {reaped}건 회수")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[music_worker] ⚠️ 리퍼 실행 중 예외: {e}")
@@ -0,0 +1,135 @@
+# bench/fairness.py
+"""
+사용자 간 공정성 점검: 한 사용자(A)가 곡을 대량으로 요청하는 중에 다른 사용자(B)가 한 곡을 요청하면,
+B의 곡이 A의 backlog 전체 뒤에 줄 서지 않고 곧바로 처리되는지 확인한다.
+
+    python -m bench.fairness --base-url http://localhost:8000 --burst 50 --max-ahead 8
+
+- A는 --burst 건을 가능한 한 빨리 넣는다. 429(사용자별 대기 상한)를 받으면 Retry-After 만큼 기다렸다가
+  다시 넣는다 (대량 요청 클라이언트 흉내).
+- A의 첫 요청들이 들어간 직후 B가 한 곡을 넣고 READY까지 poll 한다.
+- B보다 먼저 READY가 된 A의 곡 수가 --max-ahead 이하면 통과 (종료 코드 0), 넘으면 실패 (1).
+  기본값은 사용자별 대기 상한(MUSIC_MAX_PENDING_PER_USER=4) + 워커 동시 생성 수(4).
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+
+from bench.load import Recorder, VirtualUser, TERMINAL
+
+
+async def _compose(user: VirtualUser, rec: Recorder) -> Optional[int]:
+    """한 곡 요청. 429면 Retry-After 뒤 재시도하고, 받아들여지면 track_id를 돌려준다."""
+    while True:
+        resp = await rec.call(user.client, "music.compose", "POST", "/music/compose", json={
+            "session_id": user.session_id,
+            "music_length_ms": user.args.music_length_ms,
+            "force_instrumental": True,
+            "extra": {"no_cache": True},
+        })
+        if resp is None:
+            return None
+        if resp.status_code == 429:
+            rec.outcomes["throttled"] += 1
+            await asyncio.sleep(float(resp.headers.get("Retry-After") or 2))
+            continue
+        if resp.status_code != 200:
+            return None
+        return resp.json()["track_id"]
+
+
+async def _wait_ready(user: VirtualUser, rec: Recorder, ids: List[int], ready_at: Dict[int, float], deadline: float) -> None:
+    """ids가 모두 끝날 때까지 poll 하며 READY 시각을 기록한다."""
+    pending = set(ids)
+    while pending and time.monotonic() < deadline:
+        for chunk in [sorted(pending)[i:i + 50] for i in range(0, len(pending), 50)]:
+            resp = await rec.call(user.client, "music.tracks_status", "GET", "/music/tracks/status",
+                                  params={"ids": ",".join(map(str, chunk))})
+            if resp is None or resp.status_code != 200:
+                continue
+            for item in resp.json()["tracks"]:
+                if item["status"] in TERMINAL:
+                    pending.discard(item["id"])
+                    if item["status"] == "READY":
+                        ready_at[item["id"]] = time.monotonic()
+        await asyncio.sleep(user.args.poll_interval)
+
+
+async def run(args) -> Dict[str, Any]:
+    rec = Recorder()
+    heavy, light = VirtualUser(0, args, rec), VirtualUser(1, args, rec)
+    await asyncio.gather(heavy.setup(), light.setup())
+
+    deadline = time.monotonic() + args.timeout_total
+    heavy_ids: List[int] = []
+    heavy_ready: Dict[int, float] = {}
+    light_ready: Dict[int, float] = {}
+
+    async def burst():
+        for _ in range(args.burst):
+            track_id = await _compose(heavy, rec)
+            if track_id is not None:
+                heavy_ids.append(track_id)
+
+    burst_task = asyncio.create_task(burst())
+    # A의 요청이 먼저 쌓이도록 잠깐 기다린 뒤 B가 요청
+    await asyncio.sleep(args.light_delay)
+    light_started = time.monotonic()
+    light_id = await _compose(light, rec)
+    if light_id is None:
+        raise SystemExit("light user's compose failed")
+    await _wait_ready(light, rec, [light_id], light_ready, deadline)
+
+    burst_task.cancel()
+    await asyncio.gather(burst_task, return_exceptions=True)
+    await _wait_ready(heavy, rec, heavy_ids, heavy_ready, deadline)
+    await asyncio.gather(heavy.client.aclose(), light.client.aclose())
+
+    light_done = light_ready.get(light_id)
+    ahead = sum(1 for t in heavy_ready.values() if light_done is None or t < light_done)
+    return {
+        "run_id": args.run_id,
+        "config": {"burst": args.burst, "max_ahead": args.max_ahead, "music_length_ms": args.music_length_ms},
+        "heavy_submitted": len(heavy_ids),
+        "heavy_ready": len(heavy_ready),
+        "light_time_to_ready_s": round(light_done - light_started, 2) if light_done else None,
+        "heavy_ready_before_light": ahead,
+        "requests": rec.summary(),
+        "outcomes": dict(rec.outcomes),
+        "passed": light_done is not None and ahead <= args.max_ahead,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="per-user fairness check under one user's burst")
+    parser.add_argument("--base-url", default=os.getenv("BENCH_BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--burst", type=int, default=50, help="tracks the heavy user tries to queue")
+    parser.add_argument("--max-ahead", type=int, default=8,
+                        help="max heavy-user tracks allowed to finish before the light user's track")
+    parser.add_argument("--light-delay", type=float, default=2.0, help="seconds after the burst starts")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--music-length-ms", type=int, default=30_000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--timeout-total", type=float, default=900.0)
+    parser.add_argument("--run-id", default=uuid.uuid4().hex[:8])
+    parser.add_argument("--out", help="write JSON result to this path")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+    sys.exit(0 if result["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
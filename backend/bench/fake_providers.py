@@ -0,0 +1,280 @@
+# bench/fake_providers.py
+"""
+오프라인 부하 테스트용 가짜 외부 API 서버 (ElevenLabs / OpenAI / Kakao).
+
+실행:
+    uvicorn bench.fake_providers:app --host 0.0.0.0 --port 9000
+
+백엔드/워커를 이 서버로 향하게 하려면:
+    ELEVEN_MUSIC_BASE=http://fake-providers:9000
+    OPENAI_BASE_URL=http://fake-providers:9000/v1
+    KAKAO_AUTH_BASE=http://fake-providers:9000  KAKAO_API_BASE=http://fake-providers:9000
+
+서비스별 동작은 env로 조절한다 (FAKE_<SERVICE>_* 가 없으면 FAKE_* 공통값 사용, SERVICE = ELEVEN|OPENAI|KAKAO):
+    FAKE_LATENCY        지연 분포 "fixed:0.2" | "uniform:0.1,0.5" | "lognormal:<median>,<sigma>" (초)
+    FAKE_ERROR_RATE     500 응답 비율 (0~1)
+    FAKE_429_RATE       429 응답 비율 (0~1)
+    FAKE_RETRY_AFTER_S  429 응답의 Retry-After
+    FAKE_ELEVEN_KBPS    생성 오디오 비트레이트 → 바디 크기 = music_length_ms * kbps / 8
+    FAKE_ELEVEN_BYTES   고정 바디 크기 (설정 시 KBPS 무시)
+    FAKE_ELEVEN_STREAM_CHUNKS  오디오 바디를 이 개수로 나눠 지연 시간에 걸쳐 흘려보냄
+    FAKE_OPENAI_TOKENS  chat completion 응답 토큰(단어) 수, 스트리밍 시 토큰 간격 = 지연 / 토큰 수
+
+요청 수/상태 코드는 GET /_fake/stats 로 확인할 수 있다.
+"""
+from __future__ import annotations
+import os
+import json
+import time
+import math
+import uuid
+import random
+import asyncio
+import hashlib
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="fake-providers")
+stats: Counter = Counter()
+
+
+def _env(service: str, name: str, default: str) -> str:
+    return os.getenv(f"FAKE_{service}_{name}") or os.getenv(f"FAKE_{name}") or default
+
+
+def _sample_latency(service: str) -> float:
+    spec = _env(service, "LATENCY", "fixed:0.2")
+    kind, _, args = spec.partition(":")
+    values = [float(x) for x in args.split(",") if x]
+    if kind == "uniform":
+        return random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values
+        return random.lognormvariate(math.log(median), sigma)
+    return values[0] if values else 0.0
+
+
+def _injected_error(service: str) -> Optional[JSONResponse]:
+    """설정된 비율로 429/500을 돌려준다. 정상 처리면 None."""
+    roll = random.random()
+    rate_429 = float(_env(service, "429_RATE", "0"))
+    if roll < rate_429:
+        retry_after = _env(service, "RETRY_AFTER_S", "5")
+        return JSONResponse(
+            {"error": {"type": "rate_limit", "message": "fake rate limit"}},
+            status_code=429,
+            headers={"Retry-After": retry_after},
+        )
+    if roll < rate_429 + float(_env(service, "ERROR_RATE", "0")):
+        return JSONResponse({"error": {"type": "server_error", "message": "fake failure"}}, status_code=500)
+    return None
+
+
+def _count(service: str, status_code: int) -> None:
+    stats[f"{service}.requests"] += 1
+    stats[f"{service}.status.{status_code}"] += 1
+
+
+# ---------------------------------------------------------------------------
+# ElevenLabs music
+# ---------------------------------------------------------------------------
+
+def _audio_size(music_length_ms: int) -> int:
+    fixed = _env("ELEVEN", "BYTES", "")
+    if fixed:
+        return int(fixed)
+    kbps = float(_env("ELEVEN", "KBPS", "128"))
+    return max(int(music_length_ms * kbps / 8), 2048)
+
+
+async def _audio_body(size: int, duration_s: float, chunks: int) -> AsyncIterator[bytes]:
+    # ID3 헤더 + 0 바이트. 청크 사이에 지연을 나눠 넣어 스트리밍 응답을 흉내 낸다.
+    head = b"ID3\x04\x00\x00\x00\x00\x00\x00"
+    remaining = max(size - len(head), 0)
+    per_chunk = max(remaining // chunks, 1)
+    pause = duration_s / chunks
+    yield head
+    while remaining > 0:
+        n = min(per_chunk, remaining)
+        remaining -= n
+        if pause:
+            await asyncio.sleep(pause)
+        yield b"\x00" * n
+
+
+async def _eleven_music(request: Request, stream: bool):
+    body: Dict[str, Any] = await request.json()
+    latency = _sample_latency("ELEVEN")
+    error = _injected_error("ELEVEN")
+    if error is not None:
+        await asyncio.sleep(min(latency, 0.05))
+        _count("eleven", error.status_code)
+        return error
+    if not body.get("prompt"):
+        _count("eleven", 422)
+        return JSONResponse({"detail": "prompt is required"}, status_code=422)
+
+    music_length_ms = int(body.get("music_length_ms") or int(body.get("duration_seconds") or 30) * 1000)
+    size = _audio_size(music_length_ms)
+    _count("eleven", 200)
+    stats["eleven.bytes"] += size
+    if stream:
+        chunks = int(_env("ELEVEN", "STREAM_CHUNKS", "20"))
+        return StreamingResponse(_audio_body(size, latency, chunks), media_type="audio/mpeg")
+    # 비스트리밍: 전체 지연 후 한 번에 보냄 (바디는 그래도 청크로 전송)
+    await asyncio.sleep(latency)
+    return StreamingResponse(_audio_body(size, 0.0, 8), media_type="audio/mpeg")
+
+
+@app.post("/v1/music/generate")
+@app.post("/v1/music/compose")
+@app.post("/v1/music")
+async def eleven_generate(request: Request):
+    return await _eleven_music(request, stream=False)
+
+
+@app.post("/v1/music/stream")
+async def eleven_stream(request: Request):
+    return await _eleven_music(request, stream=True)
+
+
+# ---------------------------------------------------------------------------
+# OpenAI chat completions
+# ---------------------------------------------------------------------------
+
+_WORDS = ["괜찮아요", "천천히", "숨을", "쉬어", "보세요", "오늘", "마음이", "조금", "편안해질", "거예요"]
+
+# JSON 모드 요청(분석/프롬프트 생성)에 공통으로 쓰는 응답. 두 스키마의 필드를 모두 채운다.
+_JSON_CONTENT = {
+    "mood": "calming",
+    "keywords": ["rest", "breath"],
+    "target": "relaxation",
+    "confidence": 0.8,
+    "music_constraints": None,
+    "music_prompt": "calming ambient with soft pads, around 70 BPM, in C major, instrumental only",
+    "lyrics_text": "",
+}
+
+
+def _chat_text(n_tokens: int) -> list[str]:
+    return [random.choice(_WORDS) for _ in range(n_tokens)]
+
+
+def _usage(prompt: Any, n_tokens: int) -> Dict[str, int]:
+    prompt_tokens = len(json.dumps(prompt, ensure_ascii=False)) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": n_tokens,
+        "total_tokens": prompt_tokens + n_tokens,
+    }
+
+
+async def _chat_stream(cid: str, model: str, tokens: list[str], latency: float) -> AsyncIterator[bytes]:
+    gap = latency / max(len(tokens), 1)
+    created = int(time.time())
+
+    def chunk(delta: Dict[str, Any], finish: Optional[str] = None) -> bytes:
+        data = {
+            "id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+
+    yield chunk({"role": "assistant", "content": ""})
+    for i, tok in enumerate(tokens):
+        await asyncio.sleep(gap)
+        yield chunk({"content": tok if i == 0 else f" {tok}"})
+    yield chunk({}, "stop")
+    yield b"data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def openai_chat(request: Request):
+    body: Dict[str, Any] = await request.json()
+    latency = _sample_latency("OPENAI")
+    error = _injected_error("OPENAI")
+    if error is not None:
+        _count("openai", error.status_code)
+        return error
+
+    model = body.get("model", "gpt-4o-mini")
+    cid = f"chatcmpl-fake-{uuid.uuid4().hex[:12]}"
+    n_tokens = int(_env("OPENAI", "TOKENS", "60"))
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+    _count("openai", 200)
+
+    if body.get("stream") and not json_mode:
+        return StreamingResponse(
+            _chat_stream(cid, model, _chat_text(n_tokens), latency),
+            media_type="text/event-stream",
+        )
+
+    await asyncio.sleep(latency)
+    content = json.dumps(_JSON_CONTENT, ensure_ascii=False) if json_mode else " ".join(_chat_text(n_tokens))
+    return {
+        "id": cid,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": _usage(body.get("messages"), n_tokens),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Kakao OAuth
+# ---------------------------------------------------------------------------
+
+@app.post("/oauth/token")
+async def kakao_token(request: Request):
+    form = await request.form()
+    await asyncio.sleep(_sample_latency("KAKAO"))
+    error = _injected_error("KAKAO")
+    if error is not None:
+        _count("kakao", error.status_code)
+        return error
+    _count("kakao", 200)
+    # 같은 인가 코드 → 같은 사용자 (부하 테스트에서 로그인 반복 시 신규 가입이 쌓이지 않도록)
+    code = str(form.get("code") or uuid.uuid4().hex)
+    return {
+        "access_token": f"fake-{code}",
+        "token_type": "bearer",
+        "refresh_token": f"fake-refresh-{code}",
+        "expires_in": 21599,
+    }
+
+
+@app.get("/v2/user/me")
+async def kakao_me(request: Request):
+    await asyncio.sleep(_sample_latency("KAKAO"))
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not token:
+        _count("kakao", 401)
+        return JSONResponse({"msg": "this access token does not exist", "code": -401}, status_code=401)
+    _count("kakao", 200)
+    kakao_id = int(hashlib.sha256(token.encode()).hexdigest()[:12], 16)
+    return {
+        "id": kakao_id,
+        "properties": {"nickname": f"bench-{kakao_id % 100000}"},
+        "kakao_account": {"email": f"bench-{kakao_id}@example.com"},
+    }
+
+
+# ---------------------------------------------------------------------------
+
+@app.get("/_fake/stats")
+async def fake_stats():
+    return dict(stats)
+
+
+@app.post("/_fake/reset")
+async def fake_reset():
+    stats.clear()
+    return {"ok": True}
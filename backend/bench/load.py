@@ -0,0 +1,327 @@
+# bench/load.py
+"""
+compose → READY 처리량 벤치마크 드라이버.
+
+가상 사용자(VU)마다 환자 계정을 만들고 세션(/patient/intake)을 연 뒤, 지정한 비율로
+compose / list 요청을 보내고, 자기가 만든 트랙을 /music/tracks/status 로 poll 해서
+READY/FAILED까지 걸린 시간을 잰다. 끝나면 결과를 JSON으로 출력/저장한다.
+
+    python -m bench.load --base-url http://localhost:8000 --users 20 --duration 300 \\
+        --mix compose=1,list=3 --poll-interval 0.5 \\
+        --worker-metrics http://localhost:9102/metrics --out results/run.json
+
+지표:
+- requests: 엔드포인트별 요청 수/에러 수/지연 p50·p95·p99 (초)
+- compose: 제출/READY/FAILED/미완료 건수, 분당 READY 처리량, time-to-READY p50·p95·p99
+  (poll 간격만큼의 측정 오차가 있다)
+- kafka_lag: 워커 /metrics의 music_worker_lane_lag 샘플 (레인별 max/mean/last)
+- db_queries: API /metrics의 api_db_queries_per_request 를 실행 전후로 비교한 엔드포인트별 요청당 평균 쿼리 수
+"""
+from __future__ import annotations
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import subprocess
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+TERMINAL = {"READY", "FAILED"}
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    ordered = sorted(values)
+
+    def pick(p: float) -> float:
+        return round(ordered[min(int(len(ordered) * p), len(ordered) - 1)], 4)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+def _parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"compose", "list"}
+    if unknown:
+        raise SystemExit(f"unknown mix entries: {sorted(unknown)} (allowed: compose, list)")
+    return mix
+
+
+class Recorder:
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.time_to_ready: List[float] = []
+        self.outcomes: Dict[str, int] = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kw) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kw)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latency[name].append(time.perf_counter() - started)
+        if resp.status_code >= 400:
+            self.errors[name] += 1
+        return resp
+
+    def summary(self) -> Dict[str, Any]:
+        names = set(self.latency) | set(self.errors)
+        return {
+            name: {
+                "count": len(self.latency[name]),
+                "errors": self.errors[name],
+                "latency_s": _percentiles(self.latency[name]),
+            }
+            for name in sorted(names)
+        }
+
+
+class VirtualUser:
+    def __init__(self, idx: int, args, rec: Recorder):
+        self.idx = idx
+        self.args = args
+        self.rec = rec
+        self.session_id: Optional[int] = None
+        self.pending: Dict[int, float] = {}
+        self.client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+
+    async def setup(self) -> None:
+        email = f"bench-{self.args.run_id}-{self.idx}@example.com"
+        password = "bench-password"
+        await self.rec.call(self.client, "auth.register", "POST", "/auth/register", json={
+            "email": email, "password": password, "role": "patient", "name": f"bench {self.idx}",
+        })
+        resp = await self.rec.call(self.client, "auth.login", "POST", "/auth/login",
+                                   data={"username": email, "password": password})
+        if resp is None or resp.status_code != 200:
+            raise RuntimeError(f"login failed for {email}: {resp.status_code if resp else 'no response'}")
+        self.client.headers["Authorization"] = f"Bearer {resp.json()['access_token']}"
+
+        resp = await self.rec.call(self.client, "patient.intake", "POST", "/patient/intake", json={
+            "vas": {"anxiety": 5}, "prefs": {"genre": "ambient"}, "goal": {"text": "relax"},
+        })
+        if resp is None or resp.status_code != 200:
+            raise RuntimeError("session creation failed")
+        self.session_id = resp.json()["session_id"]
+
+    async def compose(self) -> None:
+        if len(self.pending) >= self.args.max_pending:
+            return
+        extra = {} if self.args.cache else {"no_cache": True}
+        resp = await self.rec.call(self.client, "music.compose", "POST", "/music/compose", json={
+            "session_id": self.session_id,
+            "music_length_ms": self.args.music_length_ms,
+            "force_instrumental": True,
+            "extra": extra,
+        })
+        if resp is None or resp.status_code != 200:
+            return
+        body = resp.json()
+        now = time.monotonic()
+        if body["status"] in TERMINAL:
+            self.rec.outcomes[body["status"]] += 1
+            self.rec.time_to_ready.append(0.0)
+        else:
+            self.pending[body["track_id"]] = now
+
+    async def list_tracks(self) -> None:
+        await self.rec.call(self.client, "music.my", "GET", "/music/my")
+
+    async def poll(self) -> None:
+        if not self.pending:
+            return
+        ids = ",".join(str(i) for i in list(self.pending)[:50])
+        resp = await self.rec.call(self.client, "music.tracks_status", "GET", "/music/tracks/status",
+                                   params={"ids": ids})
+        if resp is None or resp.status_code != 200:
+            return
+        now = time.monotonic()
+        for item in resp.json()["tracks"]:
+            started = self.pending.get(item["id"])
+            if started is None or item["status"] not in TERMINAL:
+                continue
+            del self.pending[item["id"]]
+            self.rec.outcomes[item["status"]] += 1
+            if item["status"] == "READY":
+                self.rec.time_to_ready.append(now - started)
+
+    async def run(self, stop_at: float, drain_until: float) -> None:
+        ops = list(self.args.mix)
+        weights = [self.args.mix[o] for o in ops]
+
+        async def poller():
+            while time.monotonic() < drain_until and (time.monotonic() < stop_at or self.pending):
+                await self.poll()
+                await asyncio.sleep(self.args.poll_interval)
+
+        poll_task = asyncio.create_task(poller())
+        while time.monotonic() < stop_at:
+            op = random.choices(ops, weights)[0]
+            if op == "compose":
+                await self.compose()
+            else:
+                await self.list_tracks()
+            await asyncio.sleep(random.expovariate(1.0 / self.args.think_time) if self.args.think_time else 0)
+        await poll_task
+        self.rec.outcomes["PENDING"] += len(self.pending)
+        await self.client.aclose()
+
+
+async def _scrape(client: httpx.AsyncClient, url: str) -> Dict[str, Any]:
+    resp = await client.get(url)
+    resp.raise_for_status()
+    return {f.name: f for f in text_string_to_metric_families(resp.text)}
+
+
+def _db_query_totals(families: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    family = families.get("api_db_queries_per_request")
+    totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"sum": 0.0, "count": 0.0})
+    if family is None:
+        return totals
+    for sample in family.samples:
+        endpoint = sample.labels.get("endpoint")
+        if sample.name.endswith("_sum"):
+            totals[endpoint]["sum"] = sample.value
+        elif sample.name.endswith("_count"):
+            totals[endpoint]["count"] = sample.value
+    return totals
+
+
+async def _sample_lag(url: str, stop: asyncio.Event, samples: Dict[str, List[float]]) -> None:
+    async with httpx.AsyncClient(timeout=5) as client:
+        while not stop.is_set():
+            try:
+                families = await _scrape(client, url)
+                family = families.get("music_worker_lane_lag")
+                for sample in family.samples if family else ():
+                    samples[sample.labels["lane"]].append(sample.value)
+            except (httpx.HTTPError, ValueError):
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+
+def _git_commit() -> Optional[str]:
+    if os.getenv("BENCH_GIT_COMMIT"):
+        return os.getenv("BENCH_GIT_COMMIT")
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> Dict[str, Any]:
+    rec = Recorder()
+    metrics_url = args.base_url.rstrip("/") + "/metrics/"
+    async with httpx.AsyncClient(timeout=10) as client:
+        db_before = _db_query_totals(await _scrape(client, metrics_url))
+
+    users = [VirtualUser(i, args, rec) for i in range(args.users)]
+    await asyncio.gather(*(u.setup() for u in users))
+
+    lag_samples: Dict[str, List[float]] = defaultdict(list)
+    stop_lag = asyncio.Event()
+    lag_task = asyncio.create_task(_sample_lag(args.worker_metrics, stop_lag, lag_samples)) if args.worker_metrics else None
+
+    started = time.monotonic()
+    stop_at = started + args.duration
+    drain_until = stop_at + args.drain
+    await asyncio.gather(*(u.run(stop_at, drain_until) for u in users))
+    elapsed = time.monotonic() - started
+
+    stop_lag.set()
+    if lag_task:
+        await lag_task
+
+    async with httpx.AsyncClient(timeout=10) as client:
+        db_after = _db_query_totals(await _scrape(client, metrics_url))
+
+    db_queries = {}
+    for endpoint, after in db_after.items():
+        before = db_before.get(endpoint, {"sum": 0.0, "count": 0.0})
+        requests = after["count"] - before["count"]
+        if requests <= 0:
+            continue
+        queries = after["sum"] - before["sum"]
+        db_queries[endpoint] = {
+            "requests": int(requests),
+            "queries": int(queries),
+            "queries_per_request": round(queries / requests, 2),
+        }
+
+    ready = rec.outcomes.get("READY", 0)
+    return {
+        "run_id": args.run_id,
+        "git_commit": _git_commit(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - elapsed)),
+        "config": {
+            "base_url": args.base_url,
+            "users": args.users,
+            "duration_s": args.duration,
+            "drain_s": args.drain,
+            "mix": args.mix,
+            "poll_interval_s": args.poll_interval,
+            "think_time_s": args.think_time,
+            "music_length_ms": args.music_length_ms,
+            "cache": args.cache,
+        },
+        "elapsed_s": round(elapsed, 2),
+        "requests": rec.summary(),
+        "compose": {
+            "submitted": sum(rec.outcomes.values()),
+            "outcomes": dict(rec.outcomes),
+            "ready_per_min": round(ready / (elapsed / 60.0), 2) if elapsed else None,
+            "time_to_ready_s": _percentiles(rec.time_to_ready),
+        },
+        "kafka_lag": {
+            lane: {"max": max(v), "mean": round(sum(v) / len(v), 2), "last": v[-1]}
+            for lane, v in lag_samples.items() if v
+        },
+        "db_queries": db_queries,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="compose → READY throughput benchmark")
+    parser.add_argument("--base-url", default=os.getenv("BENCH_BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--worker-metrics", default=os.getenv("BENCH_WORKER_METRICS"),
+                        help="music_worker Prometheus endpoint (e.g. http://localhost:9102/metrics)")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=120.0, help="seconds of load")
+    parser.add_argument("--drain", type=float, default=300.0, help="max seconds to wait for pending tracks afterwards")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix("compose=1,list=3"))
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean seconds between a user's requests")
+    parser.add_argument("--max-pending", type=int, default=3, help="max unfinished tracks per user")
+    parser.add_argument("--music-length-ms", type=int, default=30_000)
+    parser.add_argument("--cache", action="store_true", help="allow generation cache hits (default: no_cache)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--run-id", default=uuid.uuid4().hex[:8])
+    parser.add_argument("--out", help="write JSON result to this path")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
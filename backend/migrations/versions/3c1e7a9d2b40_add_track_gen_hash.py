@@ -0,0 +1,30 @@
+"""add track gen_hash for generation cache
+
+Revision ID: 3c1e7a9d2b40
+Revises: 6fc0f77f8ad2
+Create Date: 2026-10-16 10:12:04.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1e7a9d2b40'
+down_revision: Union[str, Sequence[str], None] = '6fc0f77f8ad2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tracks', sa.Column('gen_hash', sa.String(length=64), nullable=True))
+    op.create_index('idx_tracks_gen_hash_time', 'tracks', ['gen_hash', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_tracks_gen_hash_time', table_name='tracks')
+    op.drop_column('tracks', 'gen_hash')
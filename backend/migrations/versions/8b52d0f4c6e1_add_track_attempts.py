@@ -0,0 +1,28 @@
+"""add track attempts for retry topics
+
+Revision ID: 8b52d0f4c6e1
+Revises: 3c1e7a9d2b40
+Create Date: 2026-10-16 11:03:27.540912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b52d0f4c6e1'
+down_revision: Union[str, Sequence[str], None] = '3c1e7a9d2b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tracks', sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('tracks', 'attempts')
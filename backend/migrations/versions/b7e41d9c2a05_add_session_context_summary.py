@@ -0,0 +1,30 @@
+"""add rolling conversation summary to sessions
+
+Revision ID: b7e41d9c2a05
+Revises: a3c6e0b8d514
+Create Date: 2026-10-17 09:12:40.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e41d9c2a05'
+down_revision: Union[str, Sequence[str], None] = 'a3c6e0b8d514'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('sessions', sa.Column('context_summary', sa.Text(), nullable=True))
+    op.add_column('sessions', sa.Column('summary_upto_id', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('sessions', 'summary_upto_id')
+    op.drop_column('sessions', 'context_summary')
@@ -0,0 +1,31 @@
+"""add analyzed-message cursor to session_prompts
+
+Revision ID: c8f2a6d41e93
+Revises: b7e41d9c2a05
+Create Date: 2026-10-17 11:03:27.514092
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8f2a6d41e93'
+down_revision: Union[str, Sequence[str], None] = 'b7e41d9c2a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('session_prompts', sa.Column('upto_message_id', sa.BigInteger(), nullable=True))
+    op.create_index('idx_session_prompts_analyzed', 'session_prompts', ['session_id', 'id'], unique=False,
+                    postgresql_where=sa.text("stage = 'analyzed'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_session_prompts_analyzed', table_name='session_prompts')
+    op.drop_column('session_prompts', 'upto_message_id')
@@ -0,0 +1,36 @@
+"""add publish backoff and dead state to outbox_events
+
+Revision ID: d3a9b5e7f214
+Revises: c8f2a6d41e93
+Create Date: 2026-10-17 14:21:05.631907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a9b5e7f214'
+down_revision: Union[str, Sequence[str], None] = 'c8f2a6d41e93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('outbox_events', sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('outbox_events', sa.Column('dead_at', sa.DateTime(timezone=True), nullable=True))
+    op.drop_index('idx_outbox_unpublished', table_name='outbox_events')
+    op.create_index('idx_outbox_unpublished', 'outbox_events', ['id'], unique=False,
+                    postgresql_where=sa.text('published_at IS NULL AND dead_at IS NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_outbox_unpublished', table_name='outbox_events')
+    op.create_index('idx_outbox_unpublished', 'outbox_events', ['id'], unique=False,
+                    postgresql_where=sa.text('published_at IS NULL'))
+    op.drop_column('outbox_events', 'dead_at')
+    op.drop_column('outbox_events', 'next_attempt_at')
@@ -0,0 +1,36 @@
+"""add track lease fields for claim/reaper
+
+Revision ID: d91a6b3e5f27
+Revises: c47f19e8a3d5
+Create Date: 2026-10-16 13:21:40.772315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91a6b3e5f27'
+down_revision: Union[str, Sequence[str], None] = 'c47f19e8a3d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tracks', sa.Column('worker_id', sa.String(), nullable=True))
+    op.add_column('tracks', sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('tracks', sa.Column('request_payload', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.create_index('idx_tracks_processing_lease', 'tracks', ['claimed_at'], unique=False,
+                    postgresql_where=sa.text("status = 'PROCESSING'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_tracks_processing_lease', table_name='tracks')
+    op.drop_column('tracks', 'request_payload')
+    op.drop_column('tracks', 'claimed_at')
+    op.drop_column('tracks', 'worker_id')
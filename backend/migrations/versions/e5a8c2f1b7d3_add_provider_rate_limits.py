@@ -0,0 +1,42 @@
+"""add provider rate limit tables
+
+Revision ID: e5a8c2f1b7d3
+Revises: d91a6b3e5f27
+Create Date: 2026-10-16 14:05:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a8c2f1b7d3'
+down_revision: Union[str, Sequence[str], None] = 'd91a6b3e5f27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('provider_rate_limits',
+    sa.Column('provider', sa.String(), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False, server_default='0'),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('blocked_until', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('provider')
+    )
+    op.create_table('provider_slots',
+    sa.Column('provider', sa.String(), nullable=False),
+    sa.Column('slot', sa.Integer(), nullable=False),
+    sa.Column('holder', sa.String(), nullable=True),
+    sa.Column('leased_until', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('provider', 'slot')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('provider_slots')
+    op.drop_table('provider_rate_limits')
@@ -0,0 +1,38 @@
+"""add per-stage timing columns to tracks
+
+Revision ID: f2b7d94c1a68
+Revises: e5a8c2f1b7d3
+Create Date: 2026-10-16 14:52:18.603947
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b7d94c1a68'
+down_revision: Union[str, Sequence[str], None] = 'e5a8c2f1b7d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tracks', sa.Column('started_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('tracks', sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('tracks', sa.Column('provider_ms', sa.Integer(), nullable=True))
+    op.add_column('tracks', sa.Column('download_ms', sa.Integer(), nullable=True))
+    op.add_column('tracks', sa.Column('write_ms', sa.Integer(), nullable=True))
+    op.add_column('tracks', sa.Column('audio_bytes', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('tracks', 'audio_bytes')
+    op.drop_column('tracks', 'write_ms')
+    op.drop_column('tracks', 'download_ms')
+    op.drop_column('tracks', 'provider_ms')
+    op.drop_column('tracks', 'finished_at')
+    op.drop_column('tracks', 'started_at')